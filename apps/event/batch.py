@@ -0,0 +1,129 @@
+from django.db.models import Avg, Count, Sum, F, ExpressionWrapper, DecimalField, prefetch_related_objects
+from apps.event.models import Event, Bookmark, Rating, UserTicket
+from apps.payment.models import PaymentItem
+
+
+class EventBatch:
+  """
+  Counts, aggregates and the requesting user's state for a page of events,
+  loaded with one grouped query each instead of one query per event.
+
+  Counts are only loaded for `public_events` (all events by default); the
+  user's state is always loaded for every event of the page. When `fields`
+  is given, lookups behind fields outside of it are skipped.
+  """
+
+  def __init__(self, events, user=None, public_events=None, fields=None):
+    self.event_ids = [event.id for event in events]
+    self.user = user if user is not None and user.is_authenticated else None
+    self.fields = fields
+
+    self.likes_count = {}
+    self.bookmarks_count = {}
+    self.attendee_count = {}
+    self.rating_count = {}
+    self.average_rating = {}
+    public_events = events if public_events is None else public_events
+    if public_events:
+      self._load_public_state(public_events)
+
+    self.liked = set()
+    self.bookmarked = set()
+    self.ratings = {}
+    self.has_ticket = set()
+    self.has_attended = set()
+    self.total_revenue = {}
+    if self.user is not None:
+      self._load_user_state(events)
+
+  def wants(self, *names):
+    return self.fields is None or any(name in self.fields for name in names)
+
+  def _load_public_state(self, events):
+    event_ids = [event.id for event in events]
+
+    lookups = []
+    if self.wants('organizer'):
+      lookups.append('organizer___organization_profile')
+    if self.wants('hashtags'):
+      lookups.append('hashtags')
+    if self.wants('category'):
+      lookups.append('category')
+    if lookups:
+      prefetch_related_objects(events, *lookups)
+
+    if self.wants('likes_count'):
+      self.likes_count = self._grouped_counts(
+        Event.likes.through.objects.filter(event_id__in=event_ids),
+        'event_id'
+      )
+    if self.wants('bookmarks_count'):
+      self.bookmarks_count = self._grouped_counts(
+        Bookmark.objects.filter(event_id__in=event_ids),
+        'event_id'
+      )
+    if self.wants('attendee_count'):
+      self.attendee_count = self._grouped_counts(
+        UserTicket.objects.filter(ticket__event_id__in=event_ids, used=True),
+        'ticket__event_id'
+      )
+
+    if self.wants('rating_count', 'average_rating'):
+      rating_rows = (
+        Rating.objects.filter(event_id__in=event_ids)
+        .values('event_id')
+        .annotate(count=Count('id'), avg_rating=Avg('value'))
+        .order_by()
+      )
+      for row in rating_rows:
+        self.rating_count[row['event_id']] = row['count']
+        self.average_rating[row['event_id']] = row['avg_rating']
+
+  def _grouped_counts(self, queryset, key):
+    rows = queryset.values(key).annotate(count=Count('id')).order_by()
+    return {row[key]: row['count'] for row in rows}
+
+  def _load_user_state(self, events):
+    user = self.user
+    if self.wants('liked'):
+      self.liked = set(
+        Event.likes.through.objects.filter(event_id__in=self.event_ids, customuser_id=user.id)
+        .values_list('event_id', flat=True)
+      )
+    if self.wants('bookmarked'):
+      self.bookmarked = set(
+        Bookmark.objects.filter(event_id__in=self.event_ids, user=user)
+        .values_list('event_id', flat=True)
+      )
+
+    if self.wants('rated', 'rating'):
+      for rating in Rating.objects.filter(event_id__in=self.event_ids, user=user):
+        rating.user = user
+        self.ratings[rating.event_id] = rating
+
+    if self.wants('has_ticket', 'has_attended'):
+      ticket_rows = (
+        UserTicket.objects.filter(ticket__event_id__in=self.event_ids, user=user)
+        .values_list('ticket__event_id', 'used')
+      )
+      for event_id, used in ticket_rows:
+        self.has_ticket.add(event_id)
+        if used:
+          self.has_attended.add(event_id)
+
+    owned_ids = [event.id for event in events if event.organizer_id == user.id]
+    if owned_ids and self.wants('total_revenue'):
+      revenue_rows = (
+        PaymentItem.objects.filter(ticket__event_id__in=owned_ids)
+        .values('ticket__event_id')
+        .annotate(
+          total=Sum(
+            ExpressionWrapper(
+              F('unit_price') * F('quantity'),
+              output_field=DecimalField()
+            )
+          )
+        )
+        .order_by()
+      )
+      self.total_revenue = {row['ticket__event_id']: row['total'] for row in revenue_rows}
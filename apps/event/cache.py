@@ -0,0 +1,104 @@
+import logging
+import uuid
+from django.core.cache import cache
+
+logger = logging.getLogger('django')
+
+# Bump when the public part of EventSerializer output changes shape.
+FRAGMENT_SCHEMA = 1
+FRAGMENT_TIMEOUT = 60 * 60
+
+# Fields of EventSerializer that depend on the requesting user. They are
+# stored as None in the cached fragment and filled in per request.
+PERSONAL_FIELDS = ('liked', 'bookmarked', 'rated', 'rating', 'has_ticket', 'has_attended')
+
+
+def _version_key(event_id):
+  return f"event:{event_id}:version"
+
+
+def _fragment_key(event_id, version):
+  return f"event:{event_id}:fragment:{FRAGMENT_SCHEMA}:{version}"
+
+
+def _new_version():
+  return uuid.uuid4().hex
+
+
+def get_fragment_versions(event_ids):
+  """
+  Return the current fragment version of each event, assigning a fresh one to
+  events that have none yet.
+  """
+  keys = {_version_key(event_id): event_id for event_id in event_ids}
+  try:
+    found = cache.get_many(keys)
+  except Exception as e:
+    logger.warning(f"Event fragment cache unavailable: {e}")
+    return {}
+
+  versions = {keys[key]: version for key, version in found.items()}
+  missing = {key: _new_version() for key, event_id in keys.items() if event_id not in versions}
+  if missing:
+    try:
+      cache.set_many(missing, timeout=None)
+    except Exception as e:
+      logger.warning(f"Event fragment cache unavailable: {e}")
+      return {}
+    versions.update({keys[key]: version for key, version in missing.items()})
+  return versions
+
+
+def get_fragments(versions):
+  """Fetch the cached public fragments for the given {event_id: version} map."""
+  keys = {_fragment_key(event_id, version): event_id for event_id, version in versions.items()}
+  if not keys:
+    return {}
+  try:
+    found = cache.get_many(keys)
+  except Exception as e:
+    logger.warning(f"Event fragment cache unavailable: {e}")
+    return {}
+  return {keys[key]: fragment for key, fragment in found.items()}
+
+
+def set_fragments(fragments, versions):
+  """Store public fragments under the versions that were current before rendering."""
+  data = {
+    _fragment_key(event_id, versions[event_id]): fragment
+    for event_id, fragment in fragments.items()
+    if event_id in versions
+  }
+  if not data:
+    return
+  try:
+    cache.set_many(data, timeout=FRAGMENT_TIMEOUT)
+  except Exception as e:
+    logger.warning(f"Event fragment cache unavailable: {e}")
+
+
+def public_fragment(representation):
+  """Strip the per-user values out of a serialized event."""
+  fragment = dict(representation)
+  for name in PERSONAL_FIELDS:
+    if name in fragment:
+      fragment[name] = None
+  fragment.pop('total_revenue', None)
+
+  organizer = fragment.get('organizer')
+  if organizer and organizer.get('profile'):
+    organizer = dict(organizer)
+    organizer['profile'] = dict(organizer['profile'], is_following=False)
+    fragment['organizer'] = organizer
+  return fragment
+
+
+def invalidate_events(event_ids):
+  """Move the given events to a new fragment version, orphaning cached copies."""
+  event_ids = [event_id for event_id in set(event_ids) if event_id is not None]
+  if not event_ids:
+    return
+  try:
+    cache.set_many({_version_key(event_id): _new_version() for event_id in event_ids}, timeout=None)
+  except Exception as e:
+    logger.error(f"Failed to invalidate cached events {event_ids}: {e}")
@@ -9,32 +9,54 @@ from apps.event.serializers import EventSerializer
 from apps.event.rating.serializers import RatingSerializer
 from apps.event.models import Event, Ticket, UserTicket, Bookmark, Rating, Category, Hashtag
 from apps.event.ticket.serializers import TicketSerializer,UserTicketSerializer
+from apps.event.stats import update_event_stats, lock_event, order_by_popularity
+from apps.event.suggest import suggestion_index
+from apps.event.geo import nearby_events, load_nearby, view_boxes, cluster_level, cell_degrees, cluster_events
+from apps.event.spatial import spatial_index
+from apps.event.timeline import following_feed, TIMELINE_SIZE
+from apps.event.recommend import get_recommendations, request_recommendations, ArrayPosition
+from apps.event.similar import similar_event_ids
+from apps.event.search import (
+  search_events, fuzzy_search_events, fuzzy_search_threshold, has_few_results, search_facets, facets_cache_key
+)
 from commons.permisions import IsOrganization
-from commons.utils import ResponsePagination
+from commons.utils import ResponsePagination, KeysetPagination
+from commons.serializers import sparse_fieldset
+from commons.cache import cached_response
 from drf_spectacular.utils import extend_schema, OpenApiResponse, inline_serializer, OpenApiParameter
 from rest_framework.decorators import action, permission_classes
 
-from django.db.models import Q, Avg, Count,FloatField, Value
-from django.db.models.expressions import RawSQL
+from django.db import transaction
+from django.db.models import Q, FloatField, Value
 from django.utils import timezone
-from functools import reduce
-from operator import or_
+from django.utils.dateparse import parse_datetime
+
+from contextlib import nullcontext
 
 import logging
 logger = logging.getLogger('django')
 
+# Half the earth's circumference; any point is closer than that.
+MAX_NEARBY_RADIUS_KM = 20000
+MAP_NEARBY_LIMIT = 200
+
 @extend_schema(tags=["Event management"])
 class EventViewSet(viewsets.ModelViewSet):
   serializer_class = EventSerializer
   lookup_field = 'id'
   
   def get_queryset(self):
-    return Event.objects.all()
+    return Event.objects.select_related('organizer___organization_profile')
+  
+  def get_serializer(self, *args, **kwargs):
+    if self.request.method == 'GET':
+      kwargs.update(sparse_fieldset(self.request))
+    return super().get_serializer(*args, **kwargs)
   
   def get_permissions(self):
     if self.action in ['update', 'delete', 'partial_update', 'create']:
       return [permissions.IsAuthenticated(), IsOrganization()]
-    elif self.action in ['popular']:
+    elif self.action in ['popular', 'recent']:
       return [permissions.AllowAny()]
     return [permissions.IsAuthenticated()]
   
@@ -111,12 +133,16 @@ class EventViewSet(viewsets.ModelViewSet):
     if user == event.organizer:
       return Response({'detail':"can't like your event"},status=status.HTTP_400_BAD_REQUEST)
     
-    if event.is_liked(request.user):
-      event.likes.remove(user)
-      return Response({'detail':"event unliked"},status=status.HTTP_200_OK)
-    else:
-      event.likes.add(user)
-      return Response({'detail':"event Liked"},status=status.HTTP_200_OK)
+    with transaction.atomic():
+      lock_event(event.id)
+      if event.is_liked(request.user):
+        event.likes.remove(user)
+        update_event_stats(event.id, likes=-1)
+        return Response({'detail':"event unliked"},status=status.HTTP_200_OK)
+      else:
+        event.likes.add(user)
+        update_event_stats(event.id, likes=1)
+        return Response({'detail':"event Liked"},status=status.HTTP_200_OK)
     
   @extend_schema(
     description="Toggle bookmark status of the event specified by the parameter id for authenticated user.",
@@ -141,26 +167,32 @@ class EventViewSet(viewsets.ModelViewSet):
     event = self.get_object()
     user = request.user
     
-    bookmark = Bookmark.objects.filter(user=user, event=event).first()
-    if bookmark:
-      bookmark.delete()
-      return Response({'detail': 'Bookmark removed'}, status=status.HTTP_200_OK)
-    else:
-      Bookmark.objects.create(user=user, event=event)
-      return Response({'detail':'Bookmark added'}, status=status.HTTP_201_CREATED)
+    with transaction.atomic():
+      lock_event(event.id)
+      removed, _ = Bookmark.objects.filter(user=user, event=event).delete()
+      if removed:
+        update_event_stats(event.id, bookmarks=-removed)
+        return Response({'detail': 'Bookmark removed'}, status=status.HTTP_200_OK)
+      else:
+        Bookmark.objects.create(user=user, event=event)
+        update_event_stats(event.id, bookmarks=1)
+        return Response({'detail':'Bookmark added'}, status=status.HTTP_201_CREATED)
 
   @extend_schema(
     description=(
-        "Search for events by matching keywords in the title, description, or location. "
+        "Full-text search for events by keywords (prefixes match) in the title, hashtags, "
+        "categories, location and description. "
         "Filter results by categories and hashtags (comma-separated). "
-        "Results are ordered by average rating and number of likes."
+        "Results are ordered by relevance blended with popularity; without keywords, by popularity. "
+        "When few events match, typo-tolerant matching on title, location and organizer name "
+        "is used instead (reported in the X-Search-Mode header)."
     ),
     parameters=[
         OpenApiParameter(
             name='q',
             type=str,
             location=OpenApiParameter.QUERY,
-            description='Search keyword(s) to match against title, description, or location.'
+            description='Search keyword(s) to match against title, hashtags, categories, location, or description.'
         ),
         OpenApiParameter(
             name='category',
@@ -174,6 +206,15 @@ class EventViewSet(viewsets.ModelViewSet):
             location=OpenApiParameter.QUERY,
             description='Comma-separated hashtag names to filter events by hashtags.'
         ),
+        OpenApiParameter(
+            name='facets',
+            type=bool,
+            location=OpenApiParameter.QUERY,
+            description=(
+                'Also return counts over all matching events per category, per hashtag, '
+                'per start date bucket (past, today, this_week, this_month, later) and free/paid.'
+            )
+        ),
     ],
     responses={
         200: EventSerializer(many=True)
@@ -184,45 +225,77 @@ class EventViewSet(viewsets.ModelViewSet):
     query = request.query_params.get('q', '')
     hashtags_param = request.query_params.get('hashtags', '')
     category_param = request.query_params.get('category', '')
+    categories = [cat.strip() for cat in category_param.split(',')] if category_param else []
+    hashtags = [tag.strip() for tag in hashtags_param.split(',')] if hashtags_param else []
 
-    words = query.strip().split()
-    
-    search_filters = reduce(or_, [
-        Q(title__icontains=word) |
-        Q(description__icontains=word) |
-        Q(location__icontains=word)
-        for word in words
-    ]) if words else Q()
-
-    events = Event.objects.filter(search_filters)
+    events = self.get_queryset().select_related('stats')
 
-    if category_param:
-        categories = [cat.strip() for cat in category_param.split(',')]
+    if categories:
         events = events.filter(category__name__in=categories)
-    if hashtags_param:
-        hashtags = [tag.strip() for tag in hashtags_param.split(',')]
+    if hashtags:
         events = events.filter(hashtags__name__in=hashtags)
+    if categories or hashtags:
+        events = events.distinct()
 
-    events = events.annotate(
-        avg_rating=Avg('ratings__value'),
-        likes_count=Count('likes')
-    ).distinct().order_by('-avg_rating', '-likes_count')
+    matches = search_events(events, query)
+    fuzzy = bool(query.strip()) and has_few_results(matches)
+    with_facets = request.query_params.get('facets') in ('1', 'true')
     
     paginator = ResponsePagination()
-    paginated_events = paginator.paginate_queryset(events, request)
+    with fuzzy_search_threshold() if fuzzy else nullcontext():
+      if fuzzy:
+        matches = fuzzy_search_events(events, query)
+      paginated_events = paginator.paginate_queryset(matches, request)
+      if with_facets:
+        facets = search_facets(matches, facets_cache_key(query, categories, hashtags, fuzzy))
 
     serializer = self.get_serializer(paginated_events, many=True,context={"request":request})
-    return paginator.get_paginated_response(  
+    response = paginator.get_paginated_response(  
       serializer.data
     )
+    if with_facets:
+      response.data['facets'] = facets
+    response['X-Search-Mode'] = 'fuzzy' if fuzzy else 'full-text'
+    return response
       
+  @extend_schema(
+    description=(
+        "Search-as-you-type suggestions: hashtags, category names, event titles and organizer names "
+        "with a word starting with the given prefix, most popular first. "
+        "Served from an in-memory index, so results may lag recent changes by a few minutes."
+    ),
+    parameters=[
+        OpenApiParameter(name='prefix', type=str, location=OpenApiParameter.QUERY, required=True),
+        OpenApiParameter(name='limit', type=int, location=OpenApiParameter.QUERY, description='Suggestions per kind (default 5, max 20).'),
+    ],
+    responses={
+      200: inline_serializer(
+        name="SuggestResponse",
+        fields={
+          "hashtags": serializers.ListField(child=serializers.CharField()),
+          "categories": serializers.ListField(child=serializers.CharField()),
+          "events": serializers.ListField(child=serializers.DictField()),
+          "organizers": serializers.ListField(child=serializers.DictField()),
+        }
+      )
+    }
+  )
+  @action(detail=False, methods=['get'], url_path='suggest')
+  def suggest(self, request):
+    try:
+      limit = min(max(int(request.query_params.get('limit', 5)), 1), 20)
+    except ValueError:
+      return Response({"detail": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(suggestion_index.lookup(request.query_params.get('prefix', ''), limit=limit))
+
   @extend_schema(
     description="Retrieve the most recent events, ordered by creation time.",
     responses={200: EventSerializer(many=True)}
   )
   @action(detail=False, methods=['get'], url_path='filter/recent')
+  @cached_response()
   def recent(self, request):
-    events = Event.objects.all().order_by('-created_at')
+    events = self.get_queryset().order_by('-created_at')
     paginator = ResponsePagination()
     paginated_events = paginator.paginate_queryset(events, request)
 
@@ -232,18 +305,16 @@ class EventViewSet(viewsets.ModelViewSet):
     )
     
   @extend_schema(
-    description="Retrieve the most popular events based on average rating and number of likes.",
+    description=(
+        "Retrieve the most popular events, ranked by a precomputed score combining a smoothed "
+        "average rating, likes, bookmarks and ticket sales, decaying after the event starts."
+    ),
     responses={200: EventSerializer(many=True)}
   )
   @action(detail=False, methods=['get'], url_path='filter/popular')
+  @cached_response()
   def popular(self, request):
-    events = (
-        Event.objects.annotate(
-            avg_rating=Avg('ratings__value'),
-            likes_count=Count('likes')
-        )
-        .order_by('-avg_rating', '-likes_count')
-      )
+    events = order_by_popularity(self.get_queryset().select_related('stats'))
     paginator = ResponsePagination()
     paginated_events = paginator.paginate_queryset(events, request)
 
@@ -254,18 +325,13 @@ class EventViewSet(viewsets.ModelViewSet):
     
   @extend_schema(
     description="Retrieve recent events from organizers the user follows. "
-                  "Events are ordered by creation date (most recent first).",
+                  f"Events are ordered by creation date (most recent first), up to the newest {TIMELINE_SIZE}. "
+                  "Pass `cursor` (empty for the first page) to get cursor pages.",
     responses={200: EventSerializer(many=True)}
   )
   @action(detail=False, methods=['get'], url_path='filter/following')
-  def recent(self, request):
-    user = request.user
-    followed_organizer_ids = user.following.values_list('followed_id', flat=True)
-
-    events = (
-        Event.objects.filter(organizer__id__in=followed_organizer_ids)
-        .order_by('-created_at')
-    )
+  def following(self, request):
+    events = following_feed(request.user, self.get_queryset())
     paginator = ResponsePagination()
     paginated_events = paginator.paginate_queryset(events, request)
 
@@ -275,11 +341,17 @@ class EventViewSet(viewsets.ModelViewSet):
     )
     
   @extend_schema(
-      description="Filter events by geographic proximity using latitude, longitude, and radius in kilometers.",
+      description=(
+          "Filter events by geographic proximity using latitude, longitude, and radius in kilometers, "
+          "nearest first, in cursor pages: follow `next`, which carries the `cursor` of the following page."
+      ),
       parameters=[
           OpenApiParameter(name='lat', type=float, location=OpenApiParameter.QUERY, required=True, description='User latitude'),
           OpenApiParameter(name='lng', type=float, location=OpenApiParameter.QUERY, required=True, description='User longitude'),
           OpenApiParameter(name='radius', type=float, location=OpenApiParameter.QUERY, required=True, description='Radius in kilometers'),
+          OpenApiParameter(name='start_after', type=str, location=OpenApiParameter.QUERY, required=False, description='Only events starting after this ISO 8601 datetime'),
+          OpenApiParameter(name='upcoming_only', type=bool, location=OpenApiParameter.QUERY, required=False, description='Only events that have not ended yet'),
+          OpenApiParameter(name='cursor', type=str, location=OpenApiParameter.QUERY, required=False, description='Cursor of the page to fetch'),
       ],
       responses={200: EventSerializer(many=True)}
   )
@@ -291,22 +363,123 @@ class EventViewSet(viewsets.ModelViewSet):
           radius = float(request.query_params.get('radius'))
       except (TypeError, ValueError):
           return Response({'detail': 'lat, lng, and radius are required and must be floats.'}, status=400)
+      if not (-90 <= lat <= 90 and -180 <= lng <= 180 and 0 < radius <= MAX_NEARBY_RADIUS_KM):
+          return Response(
+              {'detail': f'lat must be within [-90, 90], lng within [-180, 180] and radius within (0, {MAX_NEARBY_RADIUS_KM}].'},
+              status=400
+          )
 
-      haversine_sql = """
-          6371 * acos(
-              cos(radians(%s)) * cos(radians(latitude)) *
-              cos(radians(longitude) - radians(%s)) +
-              sin(radians(%s)) * sin(radians(latitude))
+      events = nearby_events(Event.objects.all(), lat, lng, radius)
+
+      start_after = request.query_params.get('start_after')
+      if start_after:
+          try:
+              start_after = parse_datetime(start_after)
+          except ValueError:
+              start_after = None
+          if start_after is None:
+              return Response({'detail': 'start_after must be an ISO 8601 datetime.'}, status=400)
+          if timezone.is_naive(start_after):
+              start_after = timezone.make_aware(start_after)
+          events = events.filter(start_date__gt=start_after)
+      if request.query_params.get('upcoming_only', '').lower() in ['true', '1']:
+          events = events.filter(end_date__gte=timezone.now())
+
+      paginator = KeysetPagination()
+      paginated_events = load_nearby(self.get_queryset(), paginator.paginate_queryset(events, request))
+      serializer = self.get_serializer(paginated_events, many=True, context={'request': request})
+      return paginator.get_paginated_response(serializer.data)
+      
+  @extend_schema(
+      description=(
+          "Upcoming public events near a point for the map, nearest first, answered from an in-memory "
+          "grid of event coordinates. Pass `radius` for the events within it, or `k` for the k nearest."
+      ),
+      parameters=[
+          OpenApiParameter(name='lat', type=float, location=OpenApiParameter.QUERY, required=True, description='User latitude'),
+          OpenApiParameter(name='lng', type=float, location=OpenApiParameter.QUERY, required=True, description='User longitude'),
+          OpenApiParameter(name='radius', type=float, location=OpenApiParameter.QUERY, required=False, description='Radius in kilometers'),
+          OpenApiParameter(name='k', type=int, location=OpenApiParameter.QUERY, required=False, description='Number of nearest events'),
+          OpenApiParameter(name='limit', type=int, location=OpenApiParameter.QUERY, required=False, description=f'Maximum number of events (default and max {MAP_NEARBY_LIMIT})'),
+      ],
+      responses={200: EventSerializer(many=True)}
+  )
+  @action(detail=False, methods=['get'], url_path='map/nearby')
+  def map_nearby(self, request):
+      try:
+          lat = float(request.query_params.get('lat'))
+          lng = float(request.query_params.get('lng'))
+          limit = min(int(request.query_params.get('limit', MAP_NEARBY_LIMIT)), MAP_NEARBY_LIMIT)
+          radius = request.query_params.get('radius')
+          radius = float(radius) if radius is not None else None
+          k = request.query_params.get('k')
+          k = int(k) if k is not None else None
+      except (TypeError, ValueError):
+          return Response({'detail': 'lat and lng are required floats; radius must be a float and k, limit integers.'}, status=400)
+      if not (-90 <= lat <= 90 and -180 <= lng <= 180) or limit < 1:
+          return Response({'detail': 'lat must be within [-90, 90], lng within [-180, 180] and limit positive.'}, status=400)
+
+      if radius is not None:
+          if not 0 < radius <= MAX_NEARBY_RADIUS_KM:
+              return Response({'detail': f'radius must be within (0, {MAX_NEARBY_RADIUS_KM}].'}, status=400)
+          ids, distances = spatial_index.within(lat, lng, radius, limit=limit)
+      elif k is not None and k >= 1:
+          ids, distances = spatial_index.nearest(lat, lng, min(k, limit))
+      else:
+          return Response({'detail': 'Either radius or a positive k is required.'}, status=400)
+
+      events = self.get_queryset().in_bulk(ids)
+      serializer = self.get_serializer([events[id] for id in ids if id in events], many=True, context={'request': request})
+      return Response(serializer.data, status=200)
+
+  @extend_schema(
+      description=(
+          "Clusters of upcoming public events in a map view: the centroid, the number of events and "
+          "the ids of the most popular ones per grid cell. Cells are a quarter of a map tile at the "
+          "zoom level, made coarser when the view would have more than 64 of them."
+      ),
+      parameters=[
+          OpenApiParameter(name='bbox', type=str, location=OpenApiParameter.QUERY, required=True, description='west,south,east,north in degrees; west > east crosses the antimeridian'),
+          OpenApiParameter(name='zoom', type=int, location=OpenApiParameter.QUERY, required=True, description='Map zoom level, 0 to 22'),
+      ],
+      responses={
+        200: OpenApiResponse(
+          inline_serializer(
+            name="MapClustersResponse",
+            fields={
+              "cell_degrees": serializers.FloatField(),
+              "clusters": inline_serializer(
+                name="MapCluster",
+                many=True,
+                fields={
+                  "latitude": serializers.FloatField(),
+                  "longitude": serializers.FloatField(),
+                  "count": serializers.IntegerField(),
+                  "event_ids": serializers.ListField(child=serializers.IntegerField()),
+                },
+              ),
+            },
+          )
+        )
+      }
+  )
+  @action(detail=False, methods=['get'], url_path='map/clusters')
+  def map_clusters(self, request):
+      try:
+          west, south, east, north = (float(value) for value in request.query_params.get('bbox', '').split(','))
+          zoom = int(request.query_params.get('zoom'))
+      except (TypeError, ValueError):
+          return Response({'detail': 'bbox must be west,south,east,north floats and zoom an integer.'}, status=400)
+      if not (-180 <= west <= 180 and -180 <= east <= 180 and -90 <= south < north <= 90 and 0 <= zoom <= 22):
+          return Response(
+              {'detail': 'bbox must lie within [-180, 180] x [-90, 90] with south < north, and zoom within [0, 22].'},
+              status=400
           )
-      """
 
-      events = Event.objects.annotate(
-          distance=RawSQL(haversine_sql, (lat, lng, lat))
-      ).filter(distance__lte=radius).order_by('distance')
+      boxes = view_boxes(west, south, east, north)
+      level = cluster_level(zoom, boxes)
+      return Response({'cell_degrees': cell_degrees(level), 'clusters': cluster_events(boxes, level)}, status=200)
 
-      serializer = self.get_serializer(events, many=True, context={'request': request})
-      return Response(serializer.data, status=200)
-      
   @extend_schema(
     description="Retrieve upcoming events that the authenticated user has purchased tickets for.",
     responses={200: EventSerializer(many=True)}
@@ -317,7 +490,7 @@ class EventViewSet(viewsets.ModelViewSet):
     current_time = timezone.now()
 
     user_tickets = UserTicket.objects.filter(user=user).select_related('ticket__event')
-    events = Event.objects.filter(
+    events = self.get_queryset().filter(
         tickets__users_purchased__in=user_tickets,
         start_date__gte=current_time
     ).distinct().order_by('start_date')
@@ -330,6 +503,23 @@ class EventViewSet(viewsets.ModelViewSet):
       serializer.data
     )
     
+  @extend_schema(
+    description="Upcoming public events most often bought, bookmarked, liked or rated by the users who "
+                "interacted with the event specified by id, most similar first. Refreshed in the background.",
+    responses={200: EventSerializer(many=True)}
+  )
+  @action(detail=True, methods=['get'])
+  def similar(self, request, id=None):
+    event = self.get_object()
+    neighbor_ids = similar_event_ids(event.id)
+    events = (
+      self.get_queryset().filter(id__in=neighbor_ids, is_public=True, end_date__gte=timezone.now())
+      .annotate(rank=ArrayPosition(neighbor_ids, 'id'))
+      .order_by('rank')
+    ) if neighbor_ids else []
+    serializer = self.get_serializer(events, many=True, context={'request': request})
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
   @extend_schema(
     description="Retrieve paginated event ratings for event specified by id.",
     responses={200: RatingSerializer(many=True)}
@@ -358,11 +548,11 @@ class EventViewSet(viewsets.ModelViewSet):
     user_tickets = UserTicket.objects.filter(user=user, used=True).select_related('ticket__event')
 
     event_ids = user_tickets.values_list('ticket__event_id', flat=True).distinct()
-    events = Event.objects.filter(id__in=event_ids)
+    events = self.get_queryset().filter(id__in=event_ids)
 
     paginator = ResponsePagination()
     paginated_events = paginator.paginate_queryset(events, request)
-    serialized_events = EventSerializer(paginated_events, many=True, context={'request': request})
+    serialized_events = self.get_serializer(paginated_events, many=True, context={'request': request})
     
     return paginator.get_paginated_response(
       serialized_events.data
@@ -385,38 +575,40 @@ class EventViewSet(viewsets.ModelViewSet):
     - **Hashtags**: Events that contain tags matching the user's interests.
     - **Followed Organizers**: Events organized by users the current user follows.
 
-    The result is sorted by highest average rating and most likes.
+    The list is precomputed in the background from these signals plus the
+    user's likes, bookmarks and purchases, and refreshed when their interests
+    or follows change. Users without a stored list get it computed live,
+    sorted by popularity (smoothed rating, likes, bookmarks and ticket sales,
+    decaying after the event starts).
 
     **Authentication required.**
     """
     user = request.user
-    interests = user.profile.interests or {}
-    
-
-    categories = interests.get('categories', [])
-    tags = interests.get('tags', [])
-    followed_orgs = user.following.values_list('followed', flat=True)
-    logger.info(f"User {user.id} interests - Categories: {categories}, Tags: {tags}")
-
-    category_objs = Category.objects.filter(name__in=categories)
-    hashtag_objs = Hashtag.objects.filter(name__in=tags)
+    stored = get_recommendations(user.id)
+    if stored is not None:
+      events = (
+        self.get_queryset().filter(id__in=stored, end_date__gte=timezone.now())
+        .annotate(rank=ArrayPosition(stored, 'id'))
+        .order_by('rank')
+      )
+    else:
+      request_recommendations(user.id)
+      interests = getattr(user.profile, 'interests', None) or {}
+      category_objs = Category.objects.filter(name__in=interests.get('categories', []))
+      hashtag_objs = Hashtag.objects.filter(name__in=interests.get('tags', []))
+      followed_orgs = user.following.values_list('followed', flat=True)
 
-    logger.info(f"User {user.id} matching hashtags: {[h.name for h in hashtag_objs]}")
+      events = self.get_queryset().filter(
+        Q(category__in=category_objs) |
+        Q(hashtags__in=hashtag_objs) |
+        Q(organizer__in=followed_orgs)
+      ).distinct() if category_objs or hashtag_objs or followed_orgs else self.get_queryset()
 
-    events = Event.objects.filter(
-      Q(category__in=category_objs) |
-      Q(hashtags__in=hashtag_objs) |
-      Q(organizer__in=followed_orgs)
-    ).distinct() if category_objs or hashtag_objs or followed_orgs else Event.objects.all()
+      events = order_by_popularity(events.select_related('stats'))
 
-    events = events.annotate(
-        avg_rating=Avg('ratings__value'),
-        likes_count=Count('likes')
-    ).order_by('-avg_rating', '-likes_count')
-    
     paginator = ResponsePagination()
     paginated_events = paginator.paginate_queryset(events, request)
-    serialized_events = EventSerializer(paginated_events, many=True, context={'request': request})
+    serialized_events = self.get_serializer(paginated_events, many=True, context={'request': request})
     
     return paginator.get_paginated_response(
       serialized_events.data
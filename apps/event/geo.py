@@ -0,0 +1,282 @@
+import hashlib
+import heapq
+import logging
+import math
+import time
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, Count, F, Func, Q, Sum, Value
+from django.db.models.functions import ACos, Coalesce, Cos, Floor, Greatest, Least, Radians, Sin
+from django.utils import timezone
+from apps.event.models import Event, EventMapCell
+
+logger = logging.getLogger('django')
+
+EARTH_RADIUS_KM = 6371.0
+
+# Map clusters are grid cells of a quarter of a map tile at the requested zoom,
+# made coarser until a view has at most MAX_CLUSTERS of them.
+MAX_CLUSTERS = 64
+# Most popular event ids listed per cluster.
+CLUSTER_SAMPLE_SIZE = 3
+CLUSTERS_TIMEOUT = 60
+# Levels up to this one are precomputed in EventMapCell (cells of ~0.09 degrees).
+PRECOMPUTED_MAX_LEVEL = 10
+MAP_CELLS_DIRTY_KEY = 'event:map:cells:dirty'
+MAP_CELLS_REFRESHED_KEY = 'event:map:cells:refreshed_at'
+# EventMapCell is recomputed at least this often, as events end.
+MAP_CELLS_MAX_AGE = 15 * 60
+
+
+class EventPoint(Func):
+  """point(longitude, latitude) of an event, the expression the GiST location index is built on."""
+  function = 'point'
+
+  def __init__(self):
+    super().__init__(F('longitude'), F('latitude'))
+
+
+class InBox(Func):
+  """Whether the event's point lies in a longitude/latitude box, which the GiST location index serves."""
+  output_field = BooleanField()
+
+  def __init__(self, west, south, east, north):
+    super().__init__(EventPoint(), Value(west), Value(south), Value(east), Value(north))
+
+  def as_sql(self, compiler, connection, **extra_context):
+    parts, params = [], []
+    for expression in self.get_source_expressions():
+      sql, expression_params = compiler.compile(expression)
+      parts.append(sql)
+      params.extend(expression_params)
+    return "%s <@ box(point(%s, %s), point(%s, %s))" % tuple(parts), params
+
+
+class ArrayHead(Func):
+  """The first `length` elements of an array."""
+  template = '(%(expressions)s)[1:%(length)d]'
+
+  def __init__(self, expression, length):
+    super().__init__(expression, length=length)
+
+
+def in_boxes(boxes):
+  """Condition matching events in any of the (west, south, east, north) boxes."""
+  conditions = [InBox(*box) for box in boxes]
+  return conditions[0] if len(conditions) == 1 else conditions[0] | conditions[1]
+
+
+def bounding_box(lat, lng, radius):
+  """
+  Boxes of (west, south, east, north) degrees that contain every point within
+  `radius` km of (lat, lng); two boxes when the circle crosses the antimeridian.
+  """
+  delta_lat = math.degrees(radius / EARTH_RADIUS_KM)
+  south, north = lat - delta_lat, lat + delta_lat
+  if south <= -90 or north >= 90:
+    return [(-180.0, max(south, -90.0), 180.0, min(north, 90.0))]
+
+  delta_lng = math.degrees(math.asin(min(1.0, math.sin(radius / EARTH_RADIUS_KM) / math.cos(math.radians(lat)))))
+  west, east = lng - delta_lng, lng + delta_lng
+  if west < -180:
+    return [(west + 360, south, 180.0, north), (-180.0, south, east, north)]
+  if east > 180:
+    return [(west, south, 180.0, north), (-180.0, south, east - 360, north)]
+  return [(west, south, east, north)]
+
+
+def distance_km(lat, lng):
+  """Great-circle distance from (lat, lng) to the event, with the acos argument clamped to [-1, 1]."""
+  lat, lng = math.radians(lat), math.radians(lng)
+  cosine = (
+    math.cos(lat) * Cos(Radians('latitude')) * Cos(Radians('longitude') - lng)
+    + math.sin(lat) * Sin(Radians('latitude'))
+  )
+  return EARTH_RADIUS_KM * ACos(Least(Greatest(cosine, Value(-1.0)), Value(1.0)))
+
+
+def nearby_events(queryset, lat, lng, radius):
+  """
+  Events of `queryset` within `radius` km of (lat, lng), nearest first, with
+  only their id, coordinates and `distance` loaded.
+
+  The bounding box is checked first, against the GiST index on the event's
+  point, and the exact distance is only computed for events inside it. The
+  index covers every column read here, so without further filters the whole
+  lookup is an index-only scan; load the page with `load_nearby`. Events
+  without coordinates never match.
+  """
+  return (
+    queryset.filter(in_boxes(bounding_box(lat, lng, radius)), latitude__isnull=False, longitude__isnull=False)
+    .only('id', 'latitude', 'longitude')
+    .annotate(distance=distance_km(lat, lng))
+    .filter(distance__lte=radius)
+    .order_by('distance', 'id')
+  )
+
+
+def load_nearby(queryset, candidates):
+  """The events of `queryset` for the `nearby_events` rows `candidates`, in their order and with their distance."""
+  events = queryset.in_bulk([candidate.id for candidate in candidates])
+  loaded = []
+  for candidate in candidates:
+    event = events.get(candidate.id)
+    if event is not None:
+      event.distance = candidate.distance
+      loaded.append(event)
+  return loaded
+
+
+def view_boxes(west, south, east, north):
+  """The boxes of a map view; views across the antimeridian have west > east."""
+  if west <= east:
+    return [(west, south, east, north)]
+  return [(west, south, 180.0, north), (-180.0, south, east, north)]
+
+
+def cell_degrees(level):
+  """Size of the grid cells of a clustering level; level z has four cells across a map tile at zoom z."""
+  return 90 / 2 ** level
+
+
+def cluster_level(zoom, boxes):
+  """Clustering level for a map view at `zoom`, coarse enough for at most MAX_CLUSTERS cells."""
+  level = zoom
+  while level > 0 and sum(len(xs) * len(ys) for xs, ys in cell_ranges(boxes, level)) > MAX_CLUSTERS:
+    level -= 1
+  return level
+
+
+def cell_ranges(boxes, level):
+  """The x and y grid coordinates of the cells covering each box."""
+  size = cell_degrees(level)
+  return [
+    (range(math.floor(west / size), math.floor(east / size) + 1), range(math.floor(south / size), math.floor(north / size) + 1))
+    for west, south, east, north in boxes
+  ]
+
+
+def cluster_events(boxes, level):
+  """
+  Upcoming public events in the boxes grouped by grid cell of the level:
+  the centroid, count and most popular event ids of every cell touching the
+  boxes. Coarse levels are read from EventMapCell; finer ones, whose views
+  hold few events, are grouped live and cached for CLUSTERS_TIMEOUT seconds.
+  """
+  ranges = cell_ranges(boxes, level)
+  if level <= PRECOMPUTED_MAX_LEVEL:
+    cells = Q()
+    for xs, ys in ranges:
+      cells |= Q(x__range=(xs[0], xs[-1]), y__range=(ys[0], ys[-1]))
+    rows = (
+      EventMapCell.objects.filter(cells, level=level)
+      .order_by('-count', 'y', 'x')
+      .values('latitude', 'longitude', 'count', 'event_ids')
+    )
+    return [_cluster(row['latitude'], row['longitude'], row['count'], row['event_ids']) for row in rows]
+
+  cache_key = f"event:map:clusters:{hashlib.sha1(repr((boxes, level)).encode()).hexdigest()}"
+  try:
+    clusters = cache.get(cache_key)
+  except Exception as e:
+    logger.warning(f"Map cluster cache unavailable: {e}")
+    clusters = None
+  if clusters is not None:
+    return clusters
+
+  size = cell_degrees(level)
+  cell_boxes = [(xs[0] * size, ys[0] * size, (xs[-1] + 1) * size, (ys[-1] + 1) * size) for xs, ys in ranges]
+  rows = _grouped_cells(level).filter(in_boxes(cell_boxes)).order_by('-count', 'y', 'x')
+  clusters = [
+    _cluster(row['latitude_sum'] / row['count'], row['longitude_sum'] / row['count'], row['count'], row['event_ids'])
+    for row in rows
+  ]
+  try:
+    cache.set(cache_key, clusters, timeout=CLUSTERS_TIMEOUT)
+  except Exception as e:
+    logger.warning(f"Map cluster cache unavailable: {e}")
+  return clusters
+
+
+def _cluster(latitude, longitude, count, event_ids):
+  return {'latitude': round(latitude, 6), 'longitude': round(longitude, 6), 'count': count, 'event_ids': event_ids}
+
+
+def _grouped_cells(level):
+  """Upcoming public events grouped by grid cell, with their most popular ids first."""
+  size = cell_degrees(level)
+  ranking = (F('stats__popularity').desc(nulls_last=True), '-id')
+  return (
+    Event.objects.filter(
+      is_public=True, end_date__gte=timezone.now(), latitude__isnull=False, longitude__isnull=False
+    )
+    .annotate(x=Floor(F('longitude') / size), y=Floor(F('latitude') / size))
+    .values('x', 'y')
+    .annotate(
+      count=Count('id'),
+      latitude_sum=Sum('latitude'),
+      longitude_sum=Sum('longitude'),
+      event_ids=ArrayHead(ArrayAgg('id', order_by=ranking), CLUSTER_SAMPLE_SIZE),
+      popularities=ArrayHead(ArrayAgg(Coalesce('stats__popularity', 0.0), order_by=ranking), CLUSTER_SAMPLE_SIZE),
+    )
+  )
+
+
+def refresh_map_cells():
+  """
+  Recompute EventMapCell: group the events once at PRECOMPUTED_MAX_LEVEL,
+  then merge every four cells into their parent for the coarser levels.
+  The most popular ids of a parent are among those of its children. Returns
+  the number of cells written.
+  """
+  cells = {}
+  for row in _grouped_cells(PRECOMPUTED_MAX_LEVEL).order_by():
+    top = list(zip(row['popularities'], row['event_ids']))
+    cells[(int(row['x']), int(row['y']))] = (row['count'], row['latitude_sum'], row['longitude_sum'], top)
+
+  rows = []
+  for level in range(PRECOMPUTED_MAX_LEVEL, -1, -1):
+    parents = {}
+    for (x, y), (count, latitude_sum, longitude_sum, top) in cells.items():
+      rows.append(EventMapCell(
+        level=level, x=x, y=y, count=count,
+        latitude=latitude_sum / count, longitude=longitude_sum / count,
+        event_ids=[event_id for popularity, event_id in top],
+      ))
+      parent = parents.setdefault((x // 2, y // 2), [0, 0.0, 0.0, []])
+      parent[0] += count
+      parent[1] += latitude_sum
+      parent[2] += longitude_sum
+      parent[3] += top
+    cells = {
+      key: (count, latitude_sum, longitude_sum, heapq.nlargest(CLUSTER_SAMPLE_SIZE, top))
+      for key, (count, latitude_sum, longitude_sum, top) in parents.items()
+    }
+
+  with transaction.atomic():
+    EventMapCell.objects.all().delete()
+    EventMapCell.objects.bulk_create(rows, batch_size=5000)
+  _cache_call('set', MAP_CELLS_REFRESHED_KEY, time.time(), timeout=None)
+  return len(rows)
+
+
+def mark_map_cells_dirty():
+  """Have the next refresh_event_map_cells run recompute the cells."""
+  _cache_call('set', MAP_CELLS_DIRTY_KEY, True, timeout=None)
+
+
+def map_cells_need_refresh():
+  """Whether events changed since the last refresh, or it is older than MAP_CELLS_MAX_AGE."""
+  refreshed_at = _cache_call('get', MAP_CELLS_REFRESHED_KEY)
+  if refreshed_at is None or time.time() - refreshed_at > MAP_CELLS_MAX_AGE:
+    return True
+  return bool(_cache_call('delete', MAP_CELLS_DIRTY_KEY))
+
+
+def _cache_call(method, *args, **kwargs):
+  try:
+    return getattr(cache, method)(*args, **kwargs)
+  except Exception as e:
+    logger.warning(f"Map cell cache unavailable: {e}")
+    return None
@@ -0,0 +1,66 @@
+import asyncio
+import time
+import numpy as np
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+from apps.notification.consumers import user_group, followers_group
+
+
+class Command(BaseCommand):
+  help = (
+    "Load test new-event broadcasts on the in-memory channel layer: delivery latency to simulated "
+    "follower sockets with one send per follower, awaited one by one or all at once, and with one "
+    "send to the organizer's followers group."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('--sockets', type=int, default=10000, help="Connected followers (default 10000).")
+    parser.add_argument('--rounds', type=int, default=1, help="Broadcasts per strategy; the best is reported (default 1).")
+
+  def handle(self, *args, **options):
+    asyncio.run(self.run(options['sockets'], options['rounds']))
+
+  async def run(self, sockets, rounds):
+    organizer_id = 1
+    layer = InMemoryChannelLayer(capacity=rounds * 3 + 1)
+    # A socket is a channel in its user's group and its organizer's followers group, as NotificationConsumer joins them.
+    channels = [await layer.new_channel() for _ in range(sockets)]
+    for user_id, channel in enumerate(channels):
+      await layer.group_add(user_group(user_id), channel)
+      await layer.group_add(followers_group(organizer_id), channel)
+    message = {"type": "notify", "content": {"event_id": 1, "message": "New event"}}
+
+    async def one_by_one():
+      for user_id in range(sockets):
+        await layer.group_send(user_group(user_id), message)
+
+    async def gathered():
+      await asyncio.gather(*(layer.group_send(user_group(user_id), message) for user_id in range(sockets)))
+
+    async def group():
+      await layer.group_send(followers_group(organizer_id), message)
+
+    self.stdout.write(f"{sockets} sockets following one organizer")
+    for name, send in (("per follower, sequential", one_by_one), ("per follower, gathered", gathered), ("followers group", group)):
+      results = [await self.broadcast(layer, channels, send) for _ in range(rounds)]
+      sent, latencies = min(results, key=lambda result: result[1].max())
+      self.stdout.write(
+        f"{name:>25}: sent in {sent * 1000:8.1f} ms, delivered p50 {np.percentile(latencies, 50) * 1000:8.1f} ms, "
+        f"p99 {np.percentile(latencies, 99) * 1000:8.1f} ms, last {latencies.max() * 1000:8.1f} ms"
+      )
+
+  async def broadcast(self, layer, channels, send):
+    """Time of the send and of each socket's receipt, from the start of the send."""
+    received = np.empty(len(channels))
+
+    async def receive(index, channel):
+      await layer.receive(channel)
+      received[index] = time.perf_counter()
+
+    receivers = [asyncio.create_task(receive(index, channel)) for index, channel in enumerate(channels)]
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await send()
+    sent = time.perf_counter() - start
+    await asyncio.gather(*receivers)
+    return sent, received - start
@@ -0,0 +1,105 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from apps.event.geo import nearby_events, load_nearby
+from apps.event.models import Event
+from apps.event.management.commands.bench_search import BENCH_ORGANIZER_EMAIL
+from apps.user.models import CustomUser
+
+# Events are spread over this (south, west, north, east) box, roughly Ethiopia.
+REGION = (3.0, 33.0, 15.0, 48.0)
+RADII = [1, 5, 10, 25, 50]
+
+
+def legacy_nearby(events, lat, lng, radius):
+  """The unbounded haversine filter that events/filter/nearby used before the bounding box."""
+  haversine_sql = """
+    6371 * acos(
+      cos(radians(%s)) * cos(radians(latitude)) *
+      cos(radians(longitude) - radians(%s)) +
+      sin(radians(%s)) * sin(radians(latitude))
+    )
+  """
+  return events.annotate(distance=RawSQL(haversine_sql, (lat, lng, lat))).filter(distance__lte=radius).order_by('distance')
+
+
+class Command(BaseCommand):
+  help = "Benchmark events/filter/nearby: the unbounded haversine filter against the indexed bounding box."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--seed', type=int, default=0, help="Create this many synthetic events with coordinates first.")
+    parser.add_argument('--runs', type=int, default=20, help="Runs per radius (default 20).")
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--skip-legacy', action='store_true', help="Only time the bounding box query.")
+
+  def handle(self, *args, **options):
+    if options['seed']:
+      self.seed(options['seed'])
+
+    page_size = options['page_size']
+    events = Event.objects.select_related('organizer___organization_profile')
+    south, west, north, east = REGION
+    self.stdout.write(f"{Event.objects.filter(latitude__isnull=False).count()} events with coordinates")
+    self.stdout.write(f"{'radius':>7}   {'matches':>8}   {'haversine p50':>14}   {'bbox p50':>9}   {'bbox p95':>9}")
+    rng = random.Random(7)
+    for radius in RADII:
+      points = [(rng.uniform(south + 1, north - 1), rng.uniform(west + 1, east - 1)) for _ in range(options['runs'])]
+      timings = {'legacy': [], 'bbox': []}
+      matches = []
+      for lat, lng in points:
+        for name, query in (
+          ('legacy', lambda: list(legacy_nearby(events, lat, lng, radius)[:page_size])),
+          ('bbox', lambda: load_nearby(events, nearby_events(Event.objects.all(), lat, lng, radius)[:page_size])),
+        ):
+          if name == 'legacy' and options['skip_legacy']:
+            continue
+          start = time.perf_counter()
+          query()
+          timings[name].append((time.perf_counter() - start) * 1000)
+        matches.append(nearby_events(Event.objects.all(), lat, lng, radius).count())
+
+      legacy = f"{statistics.median(timings['legacy']):11.2f} ms" if timings['legacy'] else f"{'-':>14}"
+      bbox = sorted(timings['bbox'])
+      p95 = bbox[int(len(bbox) * 0.95) - 1]
+      self.stdout.write(
+        f"{radius:>4} km   {statistics.median(matches):>8.0f}   {legacy}   {statistics.median(bbox):6.2f} ms   {p95:6.2f} ms"
+      )
+
+  def seed(self, count, batch_size=10000):
+    organizer, _ = CustomUser.objects.get_or_create(
+      email=BENCH_ORGANIZER_EMAIL,
+      defaults={'role': 'organization', 'username': 'bench-search', 'is_active': False},
+    )
+    south, west, north, east = REGION
+    located = Event.objects.filter(organizer=organizer, latitude__isnull=True).update(
+      latitude=RawSQL("%s + random() * %s", (south, north - south)),
+      longitude=RawSQL("%s + random() * %s", (west, east - west)),
+    )
+    self.stdout.write(f"Placed {located} existing synthetic events.")
+
+    now = timezone.now()
+    created = 0
+    while created < count:
+      size = min(batch_size, count - created)
+      Event.objects.bulk_create([
+        Event(
+          organizer=organizer,
+          title=f"Nearby bench event {created + i}",
+          description="",
+          location="Ethiopia",
+          latitude=random.uniform(south, north),
+          longitude=random.uniform(west, east),
+          start_time=now + timedelta(days=random.randint(0, 365)),
+          end_time=now + timedelta(days=random.randint(0, 365), hours=2),
+          start_date=now,
+          end_date=now,
+        )
+        for i in range(size)
+      ])
+      created += size
+      self.stdout.write(f"Seeded {created}/{count} events", ending='\r')
+    self.stdout.write('')
@@ -0,0 +1,50 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from apps.event.models import Event
+from commons.utils import ResponsePagination
+
+DEPTHS = [1, 10, 100, 1000, 10000]
+
+
+class Command(BaseCommand):
+  help = (
+    "Benchmark filter/recent pages at increasing depth: page number (OFFSET) "
+    "against keyset pagination. Seed events first with bench_search --seed."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('--runs', type=int, default=20, help="Runs per depth (default 20).")
+    parser.add_argument('--depths', type=int, nargs='+', default=DEPTHS, help="Page numbers to fetch.")
+
+  def handle(self, *args, **options):
+    factory = APIRequestFactory()
+    events = Event.objects.select_related('organizer___organization_profile').order_by('-created_at')
+    page_size = ResponsePagination.page_size
+    if not events[page_size * (max(options['depths']) - 1):].exists():
+      raise CommandError(f"Not enough events for page {max(options['depths'])}; seed some with bench_search --seed.")
+
+    def fetch(params):
+      paginator = ResponsePagination()
+      list(paginator.paginate_queryset(events, Request(factory.get('/', params))))
+
+    self.stdout.write(f"{'page':>6}   {'page number p50':>16}   {'keyset p50':>11}")
+    for depth in options['depths']:
+      cursor = ''
+      if depth > 1:
+        paginator = ResponsePagination()
+        paginator.ordering = ['-created_at', '-pk']
+        last = events.order_by('-created_at', '-pk')[page_size * (depth - 1) - 1]
+        cursor = paginator.encode_cursor(paginator.sort_key(last))
+
+      timings = {'page': [], 'cursor': []}
+      for _ in range(options['runs']):
+        for name, params in (('page', {'page': depth}), ('cursor', {'cursor': cursor})):
+          start = time.perf_counter()
+          fetch(params)
+          timings[name].append((time.perf_counter() - start) * 1000)
+      self.stdout.write(
+        f"{depth:>6}   {statistics.median(timings['page']):13.2f} ms   {statistics.median(timings['cursor']):8.2f} ms"
+      )
@@ -0,0 +1,111 @@
+import resource
+import time
+import numpy as np
+from scipy import sparse
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from apps.event.models import Event, Category, Hashtag
+from apps.event.recommend import RECOMMENDATIONS_SIZE, RECOMMENDATIONS_CHUNK_SIZE, active_user_ids
+from apps.event.scoring import FeatureSpace, ScoringEngine
+from apps.user.models import CustomUser
+
+
+class Command(BaseCommand):
+  help = (
+    "Benchmark the sparse recommendation scoring: users scored per second and peak memory, "
+    "on the active users or on a synthetic catalogue, and check it against the recomendations filter."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('--users', type=int, default=0, help="Score at most this many active users (default all).")
+    parser.add_argument('--synthetic', nargs=2, type=int, metavar=('USERS', 'EVENTS'), help="Score random users and events instead of the database.")
+    parser.add_argument('--check', type=int, default=0, help="Compare the scored events of this many users with the recomendations filter.")
+
+  def handle(self, *args, **options):
+    if options['synthetic']:
+      self.synthetic(*options['synthetic'])
+    else:
+      self.database(options['users'])
+    if options['check']:
+      self.check_filter(options['check'])
+
+  def measure(self, engine, preferences, purchased=None):
+    if not preferences.shape[0]:
+      self.stdout.write("No users to score.")
+      return
+    # In chunks of stored lists, as refresh_recommendations scores them.
+    lengths = []
+    start = time.perf_counter()
+    for first in range(0, preferences.shape[0], RECOMMENDATIONS_CHUNK_SIZE):
+      last = first + RECOMMENDATIONS_CHUNK_SIZE
+      top = engine.top_events(preferences[first:last], RECOMMENDATIONS_SIZE, purchased and purchased[first:last])
+      lengths += [len(events) for events in top]
+    elapsed = time.perf_counter() - start
+    # Peak resident memory of the whole process, in KiB on Linux.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    users = preferences.shape[0]
+    self.stdout.write(
+      f"Scored {users} users against {len(engine.event_ids)} events in {elapsed:.2f} s: "
+      f"{users / elapsed:.0f} users/s, peak RSS {peak / 1024:.0f} MiB, "
+      f"{np.mean(lengths):.0f} events per list"
+    )
+
+  def database(self, limit):
+    start = time.perf_counter()
+    engine = ScoringEngine.build()
+    self.stdout.write(f"Loaded {len(engine.event_ids)} upcoming events in {time.perf_counter() - start:.2f} s")
+    user_ids = list(active_user_ids()[:limit] if limit else active_user_ids())
+    start = time.perf_counter()
+    preferences, purchased = engine.preferences(user_ids)
+    self.stdout.write(f"Loaded preferences of {len(user_ids)} users in {time.perf_counter() - start:.2f} s")
+    self.measure(engine, preferences, purchased)
+
+  def synthetic(self, users, events, organizers=2000, categories=50, hashtags=1000):
+    """Events with an organizer, 1-3 categories and 0-4 hashtags; users with about 20 weighted preferences."""
+    rng = np.random.default_rng(7)
+    space = FeatureSpace(organizers - 1, categories - 1, hashtags - 1)
+    per_event = [np.ones(events, dtype=np.int64), rng.integers(1, 4, events), rng.integers(0, 5, events)]
+    rows = np.concatenate([np.repeat(np.arange(events), counts) for counts in per_event])
+    columns = np.concatenate([
+      space.organizers(rng.integers(0, organizers, per_event[0].sum())),
+      space.categories(rng.integers(0, categories, per_event[1].sum())),
+      space.hashtags(rng.zipf(1.5, per_event[2].sum()) % hashtags),
+    ])
+    engine = ScoringEngine(space, np.arange(1, events + 1), rng.random(events), space.matrix(rows, columns, np.ones(len(rows)), events))
+
+    entries = users * 20
+    preferences = sparse.csr_matrix(
+      (rng.random(entries) * 4, (rng.integers(0, users, entries), rng.integers(0, space.size, entries))),
+      shape=(users, space.size),
+    )
+    self.measure(engine, preferences)
+
+  def check_filter(self, count):
+    """
+    Every upcoming public event the recomendations filter matches for a user
+    must get a score; events scored beyond it come from likes, bookmarks,
+    ratings and purchases, which the filter ignores.
+    """
+    engine = ScoringEngine.build()
+    users = CustomUser.objects.filter(id__in=list(active_user_ids()[:count])).select_related('_user_profile')
+    missing = extra = 0
+    for user in users:
+      interests = getattr(user.profile, 'interests', None) or {}
+      expected = set(
+        Event.objects.filter(
+          Q(category__in=Category.objects.filter(name__in=interests.get('categories', [])))
+          | Q(hashtags__in=Hashtag.objects.filter(name__in=interests.get('tags', [])))
+          | Q(organizer__in=user.following.values_list('followed', flat=True)),
+          is_public=True, end_date__gte=timezone.now(),
+        ).values_list('id', flat=True)
+      )
+      preferences, _ = engine.preferences([user.id])
+      scored = set(engine.top_events(preferences, len(engine.event_ids))[0])
+      missing += len(expected - scored)
+      extra += len(scored - expected)
+    style = self.style.SUCCESS if not missing else self.style.ERROR
+    self.stdout.write(style(
+      f"Checked {len(users)} users: {missing} filtered events without a score "
+      f"(negative ratings can cause these), {extra} scored from engagement only"
+    ))
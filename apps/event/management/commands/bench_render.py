@@ -0,0 +1,97 @@
+import datetime
+import decimal
+import timeit
+import uuid
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from commons.renderers import OrjsonRenderer
+
+
+def sample_event(i):
+  """An EventSerializer-shaped payload, with the raw types JSONEncoder handles."""
+  now = datetime.datetime(2025, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+  return {
+    'id': i,
+    'organizer': {
+      'id': 1000 + i,
+      'email': f'org{i}@example.com',
+      'role': 'organization',
+      'first_name': 'Abebe',
+      'last_name': 'Kebede',
+      'is_active': True,
+      'date_joined': now,
+      'username': f'org{i}',
+      'profile': {
+        'id': 2000 + i,
+        'is_following': i % 2 == 0,
+        'name': f'Organizer {i} — Addis',
+        'description': 'Live music, theatre and community events ' * 3,
+        'logo_url': None,
+        'social_media_links': {'telegram': f'https://t.me/org{i}'},
+        'verification_status': 'approved',
+        'created_at': now,
+        'updated_at': now,
+      },
+    },
+    'category': [1, 2, 3],
+    'title': f'Ethio-jazz night #{i}',
+    'description': 'An evening of Ethio-jazz at the national theatre. ' * 6,
+    'start_time': now,
+    'end_time': now + datetime.timedelta(hours=3),
+    'start_date': now.date(),
+    'end_date': now.date(),
+    'location': 'Bole, Addis Ababa',
+    'latitude': 8.9806 + i / 1000,
+    'longitude': 38.7578 + i / 1000,
+    'cover_image_url': [f'https://cdn.example.com/events/{i}/{n}.jpg' for n in range(3)],
+    'is_public': True,
+    'onsite_payement': False,
+    'hashtags': [{'name': 'jazz'}, {'name': 'addis'}, {'name': 'live'}],
+    'likes_count': 120 + i,
+    'liked': bool(i % 3),
+    'rated': False,
+    'average_rating': 4.25,
+    'rating_count': 17,
+    'bookmarks_count': 9,
+    'rating': None,
+    'attendee_count': 55,
+    'has_attended': False,
+    'has_ticket': True,
+    'bookmarked': False,
+    'total_revenue': decimal.Decimal('15250.50'),
+    'reference': uuid.UUID(int=i),
+    'created_at': now,
+    'updated_at': now,
+  }
+
+
+class Command(BaseCommand):
+  help = "Compare JSONRenderer and OrjsonRenderer render time for a page of events."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--events', type=int, default=100, help="Events per page (default 100).")
+    parser.add_argument('--repeat', type=int, default=200, help="Renders per measurement (default 200).")
+
+  def handle(self, *args, **options):
+    page = {
+      'count': options['events'],
+      'next': None,
+      'previous': None,
+      'results': [sample_event(i) for i in range(options['events'])],
+    }
+    repeat = options['repeat']
+
+    results = {}
+    outputs = {}
+    for renderer in (JSONRenderer(), OrjsonRenderer()):
+      name = type(renderer).__name__
+      outputs[name] = renderer.render(page)
+      best = min(timeit.repeat(lambda: renderer.render(page), number=repeat, repeat=5))
+      results[name] = best / repeat * 1000
+      self.stdout.write(f"{name:<16} {results[name]:8.3f} ms/page  ({len(outputs[name])} bytes)")
+
+    self.stdout.write(f"speedup          {results['JSONRenderer'] / results['OrjsonRenderer']:8.2f}x")
+    if outputs['JSONRenderer'] == outputs['OrjsonRenderer']:
+      self.stdout.write(self.style.SUCCESS("Outputs are byte-identical."))
+    else:
+      self.stdout.write(self.style.ERROR("Outputs differ."))
@@ -0,0 +1,112 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from apps.event.models import Event, EventStats
+from apps.event.search import search_events, fuzzy_search_events, fuzzy_search_threshold, rebuild_search_vectors
+from apps.user.models import CustomUser
+
+BENCH_ORGANIZER_EMAIL = 'bench-search@pulcity.local'
+WORDS = (
+  'jazz concert festival theatre comedy workshop startup conference marathon charity '
+  'exhibition gallery coffee ceremony football basketball film screening poetry book '
+  'fashion market food tasting meetup hackathon church choir traditional dance music '
+  'bole piassa merkato kazanchis sarbet megenagna summit launch party networking'
+).split()
+QUERIES = ['jazz', 'coffee ceremony', 'hackathon', 'bole market', 'fest', 'traditional dance music']
+TYPO_QUERIES = ['hakathon', 'megenaga', 'kazanchiz', 'marathn', 'poetri night', 'exibition']
+# Filler vocabulary, so that topic words are as selective as in real descriptions.
+_rng = random.Random(42)
+FILLER = [
+  ''.join(_rng.choice('bcdfghjklmnprstvwz') + _rng.choice('aeiou') for _ in range(_rng.randint(2, 4)))
+  for _ in range(20000)
+]
+
+
+def legacy_search(text):
+  """The per-word icontains search that events/search used before full-text search."""
+  words = text.strip().split()
+  filters = reduce(or_, [
+    Q(title__icontains=word) | Q(description__icontains=word) | Q(location__icontains=word)
+    for word in words
+  ])
+  return (
+    Event.objects.filter(filters).select_related('stats')
+    .distinct().order_by('-stats__rating_average', '-stats__like_count')
+  )
+
+
+class Command(BaseCommand):
+  help = "Benchmark events/search: per-word icontains against full-text search, and the fuzzy fallback."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--seed', type=int, default=0, help="Create this many synthetic events first.")
+    parser.add_argument('--runs', type=int, default=20, help="Runs per query (default 20).")
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--cleanup', action='store_true', help="Delete the synthetic events and exit.")
+
+  def handle(self, *args, **options):
+    if options['cleanup']:
+      deleted, _ = CustomUser.objects.filter(email=BENCH_ORGANIZER_EMAIL).delete()
+      self.stdout.write(f"Deleted {deleted} rows.")
+      return
+    if options['seed']:
+      self.seed(options['seed'])
+
+    page_size = options['page_size']
+    events = Event.objects.select_related('stats', 'organizer___organization_profile')
+
+    def fuzzy(text):
+      with fuzzy_search_threshold():
+        return list(fuzzy_search_events(events, text)[:page_size])
+
+    for name, run, queries in (
+      ('icontains', lambda text: list(legacy_search(text)[:page_size]), QUERIES),
+      ('full-text', lambda text: list(search_events(events, text)[:page_size]), QUERIES),
+      ('fuzzy', fuzzy, TYPO_QUERIES),
+    ):
+      timings = []
+      for _ in range(options['runs']):
+        for text in queries:
+          start = time.perf_counter()
+          run(text)
+          timings.append((time.perf_counter() - start) * 1000)
+      timings.sort()
+      p95 = timings[int(len(timings) * 0.95) - 1]
+      self.stdout.write(f"{name:<10} p50 {statistics.median(timings):9.2f} ms   p95 {p95:9.2f} ms")
+
+  def seed(self, count, batch_size=5000):
+    organizer, _ = CustomUser.objects.get_or_create(
+      email=BENCH_ORGANIZER_EMAIL,
+      defaults={'role': 'organization', 'username': 'bench-search', 'is_active': False},
+    )
+    now = timezone.now()
+    created = 0
+    while created < count:
+      size = min(batch_size, count - created)
+      events = Event.objects.bulk_create([
+        Event(
+          organizer=organizer,
+          title=' '.join(random.sample(WORDS, 2) + random.sample(FILLER, 1)).title(),
+          description=' '.join(random.choices(FILLER, k=60) + random.sample(WORDS, 2)),
+          location=f"{random.choice(WORDS).title()}, Addis Ababa",
+          start_time=now + timedelta(days=random.randint(0, 365)),
+          end_time=now + timedelta(days=random.randint(0, 365), hours=2),
+          start_date=now,
+          end_date=now,
+        )
+        for _ in range(size)
+      ])
+      EventStats.objects.bulk_create([
+        EventStats(event=event, like_count=random.randint(0, 500), rating_average=random.uniform(1, 5))
+        for event in events
+      ])
+      created += size
+      self.stdout.write(f"Seeded {created}/{count} events", ending='\r')
+    self.stdout.write('')
+    self.stdout.write(f"Indexed {rebuild_search_vectors()} events.")
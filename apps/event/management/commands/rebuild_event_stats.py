@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from apps.event.stats import rebuild_event_stats
+
+
+class Command(BaseCommand):
+  help = "Rebuild the EventStats counters from the likes, bookmarks, ratings, tickets and payments tables."
+
+  def add_arguments(self, parser):
+    parser.add_argument(
+      '--event',
+      type=int,
+      action='append',
+      dest='event_ids',
+      help="Only rebuild the given event id (repeatable).",
+    )
+
+  def handle(self, *args, **options):
+    written = rebuild_event_stats(options['event_ids'])
+    self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {written} event(s)."))
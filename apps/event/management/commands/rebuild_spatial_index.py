@@ -0,0 +1,21 @@
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from apps.event.spatial import spatial_index, REBUILD_REQUEST_KEY, REBUILD_CHECK_INTERVAL
+
+
+class Command(BaseCommand):
+  help = (
+    "Rebuild the in-process grid of upcoming event coordinates behind events/map/nearby. "
+    "Running processes pick up the request within a few seconds."
+  )
+
+  def handle(self, *args, **options):
+    start = time.perf_counter()
+    indexed = spatial_index.rebuild()
+    elapsed = (time.perf_counter() - start) * 1000
+    cache.set(REBUILD_REQUEST_KEY, time.time(), timeout=None)
+    self.stdout.write(self.style.SUCCESS(
+      f"Indexed {indexed} upcoming event(s) in {spatial_index.stats()['cells']} cells in {elapsed:.0f} ms; "
+      f"running processes rebuild within {REBUILD_CHECK_INTERVAL} s."
+    ))
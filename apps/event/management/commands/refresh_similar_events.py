@@ -0,0 +1,15 @@
+import time
+from django.core.management.base import BaseCommand
+from apps.event.similar import refresh_similar_events
+
+
+class Command(BaseCommand):
+  help = "Recompute the similar events of events with new tickets, bookmarks, likes or ratings since the last run."
+
+  def add_arguments(self, parser):
+    parser.add_argument('--full', action='store_true', help="Recompute every event and drop the lists of events without interactions.")
+
+  def handle(self, *args, **options):
+    start = time.perf_counter()
+    written = refresh_similar_events(full=options['full'])
+    self.stdout.write(self.style.SUCCESS(f"Refreshed similar events of {written} event(s) in {time.perf_counter() - start:.2f} s."))
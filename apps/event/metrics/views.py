@@ -0,0 +1,26 @@
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from commons.cache import response_cache_stats
+from apps.event.spatial import spatial_index
+from apps.event.recommend import recommendation_stats
+from apps.event.notify import fanout_stats
+from drf_spectacular.utils import extend_schema, OpenApiResponse
+
+
+@extend_schema(tags=["Monitoring"])
+class MetricsView(APIView):
+  permission_classes = [permissions.IsAdminUser]
+
+  @extend_schema(
+    description="Operational counters for monitoring. Staff only.",
+    responses={200: OpenApiResponse(description="Counters grouped by subsystem.")}
+  )
+  def get(self, request):
+    return Response({
+      "response_cache": response_cache_stats(),
+      # Of the process serving this request; each process keeps its own index.
+      "spatial_index": spatial_index.stats(),
+      "recommendations": recommendation_stats(),
+      "follower_fanout": fanout_stats(),
+    })
@@ -0,0 +1,81 @@
+# Generated by Django 5.2 on 2026-10-18 12:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Avg, Count, Sum, F, DecimalField, ExpressionWrapper
+
+# Events whose counters are aggregated with one grouped query per source table.
+CHUNK_SIZE = 2000
+
+
+def _grouped(queryset, key, **aggregates):
+    return {row[key]: row for row in queryset.values(key).annotate(**aggregates).order_by()}
+
+
+def populate_event_stats(apps, schema_editor):
+    Event = apps.get_model('event', 'Event')
+    EventStats = apps.get_model('event', 'EventStats')
+    Bookmark = apps.get_model('event', 'Bookmark')
+    Rating = apps.get_model('event', 'Rating')
+    UserTicket = apps.get_model('event', 'UserTicket')
+    PaymentItem = apps.get_model('payment', 'PaymentItem')
+    Likes = Event._meta.get_field('likes').remote_field.through
+
+    event_ids = list(Event.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(event_ids), CHUNK_SIZE):
+        chunk = event_ids[start:start + CHUNK_SIZE]
+        likes = _grouped(Likes.objects.filter(event_id__in=chunk), 'event_id', count=Count('id'))
+        bookmarks = _grouped(Bookmark.objects.filter(event_id__in=chunk), 'event_id', count=Count('id'))
+        ratings = _grouped(
+            Rating.objects.filter(event_id__in=chunk), 'event_id',
+            count=Count('id'), total=Sum('value'), average=Avg('value'),
+        )
+        attendees = _grouped(
+            UserTicket.objects.filter(ticket__event_id__in=chunk, used=True), 'ticket__event_id', count=Count('id'),
+        )
+        revenue = _grouped(
+            PaymentItem.objects.filter(ticket__event_id__in=chunk, payment__status='success'), 'ticket__event_id',
+            total=Sum(ExpressionWrapper(F('unit_price') * F('quantity'), output_field=DecimalField())),
+        )
+        EventStats.objects.bulk_create([
+            EventStats(
+                event_id=event_id,
+                like_count=likes.get(event_id, {}).get('count', 0),
+                bookmark_count=bookmarks.get(event_id, {}).get('count', 0),
+                rating_count=ratings.get(event_id, {}).get('count', 0),
+                rating_sum=ratings.get(event_id, {}).get('total') or 0,
+                rating_average=ratings.get(event_id, {}).get('average'),
+                attendee_count=attendees.get(event_id, {}).get('count', 0),
+                revenue=revenue.get(event_id, {}).get('total') or 0,
+            )
+            for event_id in chunk
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0013_ticket_active'),
+        ('payment', '0008_alter_payment_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventStats',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='event.event')),
+                ('like_count', models.IntegerField(default=0)),
+                ('bookmark_count', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('rating_sum', models.FloatField(default=0)),
+                ('rating_average', models.FloatField(blank=True, null=True)),
+                ('attendee_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-rating_average', '-like_count'], name='eventstats_rating_likes_idx'), models.Index(fields=['-like_count'], name='eventstats_likes_idx')],
+            },
+        ),
+        migrations.RunPython(populate_event_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2 on 2026-10-18 12:35
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_search_vector(apps, schema_editor):
+    Event = apps.get_model('event', 'Event')
+
+    def names_of(through, field):
+        return Coalesce(
+            Subquery(
+                through.objects.filter(event_id=OuterRef('pk'))
+                .values('event_id')
+                .annotate(names=StringAgg(f'{field}__name', ' '))
+                .values('names')
+            ),
+            Value(''),
+            output_field=TextField()
+        )
+
+    vector = (
+        SearchVector('title', weight='A', config='english')
+        + SearchVector(names_of(Event.hashtags.through, 'hashtag'), weight='A', config='english')
+        + SearchVector(names_of(Event.category.through, 'category'), weight='B', config='english')
+        + SearchVector('location', weight='C', config='english')
+        + SearchVector('description', weight='D', config='english')
+    )
+    last_id = 0
+    while True:
+        ids = list(Event.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:5000])
+        if not ids:
+            return
+        Event.objects.filter(id__gte=ids[0], id__lte=ids[-1]).update(search_vector=vector)
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0014_eventstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='event_search_vector_idx'),
+        ),
+    ]
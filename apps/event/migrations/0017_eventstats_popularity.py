@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+def populate_popularity(apps, schema_editor):
+    # Same formula as apps.event.stats.popularity_expression at the time of writing.
+    schema_editor.execute("""
+        UPDATE event_eventstats s SET ticket_count = (
+            SELECT COUNT(*) FROM event_userticket ut
+            JOIN event_ticket t ON t.id = ut.ticket_id
+            WHERE t.event_id = s.event_id
+        )
+    """)
+    schema_editor.execute("""
+        UPDATE event_eventstats s SET popularity = (
+            (s.rating_sum + 15.0) / (s.rating_count + 5.0) / 5
+            + ln(s.like_count + 1.0)
+            + 0.5 * ln(s.bookmark_count + 1.0)
+            + 1.5 * ln(s.ticket_count + 1.0)
+        ) * power(0.5, greatest(
+            extract(epoch FROM now() - e.start_date) / 86400.0, 0.0
+        ) / 14.0)
+        FROM event_event e WHERE e.id = s.event_id
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0016_event_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='eventstats',
+            name='eventstats_rating_likes_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='eventstats',
+            name='eventstats_likes_idx',
+        ),
+        migrations.AddField(
+            model_name='eventstats',
+            name='popularity',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='eventstats',
+            name='ticket_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='eventstats',
+            index=models.Index(fields=['-popularity', '-event'], name='eventstats_popularity_idx'),
+        ),
+        migrations.RunPython(populate_popularity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 13:44
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0019_event_point_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventMapCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('x', models.IntegerField()),
+                ('y', models.IntegerField()),
+                ('count', models.IntegerField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('event_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=list, size=None)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('level', 'y', 'x'), name='eventmapcell_level_cell_uniq')],
+            },
+        ),
+    ]
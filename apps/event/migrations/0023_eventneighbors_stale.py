@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0022_eventneighbors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventneighbors',
+            name='stale',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='eventneighbors',
+            index=models.Index(condition=models.Q(('stale', True)), fields=['event'], name='eventneighbors_stale_idx'),
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
+from django.db.models import F, Func
 from apps.user.models import CustomUser
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVectorField
 
 class Category(models.Model):
     organizer = models.ForeignKey(CustomUser, related_name='categories', on_delete=models.SET_NULL, null=True, blank=True)
@@ -56,9 +59,26 @@ class Event(models.Model):
   hashtags = models.ManyToManyField(Hashtag, related_name='events')
   likes = models.ManyToManyField(CustomUser,related_name='likes')
   
+  # Weighted title/hashtags/categories/location/description, kept up to date by signals.
+  search_vector = SearchVectorField(null=True, editable=False)
+
   created_at = models.DateTimeField(auto_now_add=True)
   updated_at = models.DateTimeField(auto_now=True)
 
+  class Meta:
+    indexes = [
+      GinIndex(fields=['search_vector'], name='event_search_vector_idx'),
+      GinIndex(fields=['title'], name='event_title_trgm_idx', opclasses=['gin_trgm_ops']),
+      GinIndex(fields=['location'], name='event_location_trgm_idx', opclasses=['gin_trgm_ops']),
+      models.Index(fields=['-created_at', '-id'], name='event_created_idx'),
+      models.Index(fields=['organizer', '-created_at', '-id'], name='event_organizer_created_idx'),
+      # point(longitude, latitude), covering what events/filter/nearby reads for an index-only scan.
+      GistIndex(
+        Func(F('longitude'), F('latitude'), function='point'),
+        name='event_point_idx', include=['id', 'latitude', 'longitude']
+      ),
+    ]
+
   def __str__(self):
       return self.title
     
@@ -93,6 +113,9 @@ class UserTicket(models.Model):
   
   class Meta:
     ordering =['-purchase_date']
+    indexes = [
+      models.Index(fields=['user', '-purchase_date', '-id'], name='userticket_user_purchase_idx'),
+    ]
   
 class Bookmark(models.Model):
   user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='bookmarks')
@@ -101,6 +124,9 @@ class Bookmark(models.Model):
   
   class Meta:
     ordering = ['-created_at']
+    indexes = [
+      models.Index(fields=['user', '-created_at', '-id'], name='bookmark_user_created_idx'),
+    ]
     
 class Rating(models.Model):
   event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='ratings')
@@ -112,7 +138,102 @@ class Rating(models.Model):
   comment = models.TextField(blank=True,null=True, help_text="Optional comment about the event")
   created_at = models.DateTimeField(auto_now_add=True)
   updated_at = models.DateTimeField(auto_now=True)
-  
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['user', '-created_at', '-id'], name='rating_user_created_idx'),
+      models.Index(fields=['event', '-created_at', '-id'], name='rating_event_created_idx'),
+    ]
+
+  def __str__(self):
+      return f"{self.event.title} - {self.value}/5"
+
+class EventStats(models.Model):
+  """Denormalized per-event counters, kept in step with the source tables by apps.event.stats."""
+  event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='stats', primary_key=True)
+  like_count = models.IntegerField(default=0)
+  bookmark_count = models.IntegerField(default=0)
+  rating_count = models.IntegerField(default=0)
+  rating_sum = models.FloatField(default=0)
+  rating_average = models.FloatField(blank=True, null=True)
+  attendee_count = models.IntegerField(default=0)
+  ticket_count = models.IntegerField(default=0)
+  revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+  # Ranking score of the event, see apps.event.stats.popularity_expression.
+  popularity = models.FloatField(default=0)
+  updated_at = models.DateTimeField(auto_now=True)
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['-popularity', '-event'], name='eventstats_popularity_idx'),
+    ]
+
+  def __str__(self):
+    return f"Stats for event {self.event_id}"
+
+
+class EventMapCell(models.Model):
+  """Precomputed map cluster of upcoming public events in one grid cell of a level, see apps.event.geo."""
+  level = models.PositiveSmallIntegerField()
+  x = models.IntegerField()
+  y = models.IntegerField()
+  count = models.IntegerField()
+  latitude = models.FloatField()
+  longitude = models.FloatField()
+  # The most popular events of the cell, most popular first.
+  event_ids = ArrayField(models.IntegerField(), default=list)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=['level', 'y', 'x'], name='eventmapcell_level_cell_uniq'),
+    ]
+
+  def __str__(self):
+    return f"Map cell {self.x},{self.y} at level {self.level}"
+
+
+class HomeTimeline(models.Model):
+  """Marks a user whose TimelineEntry rows are kept up to date, see apps.event.timeline."""
+  user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='home_timeline', primary_key=True)
+  built_at = models.DateTimeField(auto_now_add=True)
+
+  def __str__(self):
+    return f"Home timeline of {self.user_id}"
+
+
+class TimelineEntry(models.Model):
+  """An event of an organizer the user follows, in the user's `filter/following` feed."""
+  user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='timeline_entries')
+  event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='timeline_entries')
+  # The event's creation time, copied so the feed is one range of the index.
+  created_at = models.DateTimeField()
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=['user', 'event'], name='timelineentry_user_event_uniq'),
+    ]
+    indexes = [
+      models.Index(fields=['user', '-created_at', '-event'], name='timelineentry_user_created_idx'),
+    ]
+
+  def __str__(self):
+    return f"Event {self.event_id} in the timeline of {self.user_id}"
+
+
+class EventNeighbors(models.Model):
+  """The upcoming events most often interacted with by the same users as an event, see apps.event.similar."""
+  event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='neighbors', primary_key=True)
+  # Most similar first, with their cosine similarity at the same position.
+  neighbor_ids = ArrayField(models.IntegerField(), default=list)
+  scores = ArrayField(models.FloatField(), default=list)
+  # Interactions with the event were removed or changed since the list was computed.
+  stale = models.BooleanField(default=False)
+  updated_at = models.DateTimeField(auto_now=True)
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['event'], condition=models.Q(stale=True), name='eventneighbors_stale_idx'),
+    ]
 
   def __str__(self):
-      return f"{self.event.title} - {self.value}/5"
\ No newline at end of file
+    return f"Neighbors of event {self.event_id}"
@@ -0,0 +1,144 @@
+import logging
+import time
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from apps.event.models import Event
+from apps.event.timeline import fan_out_event
+from apps.notification.models import Notification
+from apps.notification.consumers import user_group, followers_group
+from apps.notification.unread import adjust_unread_counts
+from apps.user.models import Follow
+
+logger = logging.getLogger('django')
+
+# Followers whose notifications are inserted in one statement.
+FANOUT_CHUNK_SIZE = 1000
+LAST_FANOUT_KEY = 'notifications:fanout:last'
+
+NOTIFICATION_TABLE = Notification._meta.db_table
+
+
+def schedule_follower_notifications(event_id):
+  """Notify the followers of a new event's organizer in the background once the transaction commits."""
+  from apps.event.tasks import notify_followers_of_event
+
+  def enqueue():
+    try:
+      notify_followers_of_event.apply_async((event_id,), retry=False)
+    except Exception as e:
+      logger.warning(f"Could not schedule follower notifications of event {event_id}: {e}")
+
+  transaction.on_commit(enqueue)
+
+
+def update_follower_groups(follower_id, organizer_id, following):
+  """
+  Once the transaction commits, have the open sockets of a user join or
+  leave the followers group of an organizer they just followed or unfollowed.
+  """
+  def send():
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+      return
+    try:
+      async_to_sync(channel_layer.group_send)(
+        user_group(follower_id),
+        {"type": "followers.join" if following else "followers.leave", "organizer_id": organizer_id},
+      )
+    except Exception as e:
+      logger.warning(f"Could not update the follower groups of user {follower_id}: {e}")
+
+  transaction.on_commit(send)
+
+
+def notify_followers(event_id, progress=None):
+  """
+  Add a new event to the warm home timelines of its organizer's followers,
+  store a notification for every follower, then push it to the sockets of
+  those online with a single send to the organizer's followers group.
+
+  Follower ids are streamed in chunks of FANOUT_CHUNK_SIZE, each inserted
+  with one statement. `progress` is called with the number of followers
+  done and the total after each chunk. Returns the number of followers
+  notified.
+  """
+  started = time.perf_counter()
+  event = Event.objects.select_related('organizer___organization_profile').filter(pk=event_id).first()
+  if event is None:
+    return 0
+  fan_out_event(event)
+  name = event.organizer.profile.name
+  message = f"{name} has created a new event: {event.title}"
+
+  followers = Follow.objects.filter(followed_id=event.organizer_id)
+  total = followers.count()
+  done = 0
+  chunk = []
+  for follower_id in followers.order_by('follower_id').values_list('follower_id', flat=True).iterator(chunk_size=FANOUT_CHUNK_SIZE):
+    chunk.append(follower_id)
+    if len(chunk) == FANOUT_CHUNK_SIZE:
+      done += _store_chunk(event, chunk, message)
+      chunk = []
+      if progress:
+        progress(done, total)
+  if chunk:
+    done += _store_chunk(event, chunk, message)
+    if progress:
+      progress(done, total)
+
+  if done:
+    broadcast(event.organizer_id, {"message": message, "event_id": event.id, "organizer": name})
+  _record_fanout(event.id, done, time.perf_counter() - started)
+  return done
+
+
+def _store_chunk(event, follower_ids, message):
+  # One statement per chunk, without building a model instance per row.
+  with connection.cursor() as cursor:
+    cursor.execute(
+      f"""
+      INSERT INTO {NOTIFICATION_TABLE} (user_id, message, event_id, read, sent_at, created_at)
+      SELECT user_id, %s, %s, false, now(), now() FROM unnest(%s::integer[]) AS user_id
+      """,
+      [message, event.id, follower_ids],
+    )
+  adjust_unread_counts(follower_ids, 1)
+  return len(follower_ids)
+
+
+def broadcast(organizer_id, content):
+  """Push a notification to the connected followers of an organizer."""
+  channel_layer = get_channel_layer()
+  if channel_layer is None:
+    return
+  try:
+    async_to_sync(channel_layer.group_send)(followers_group(organizer_id), {"type": "notify", "content": content})
+  except Exception as e:
+    logger.warning(f"Could not push notifications of organizer {organizer_id}: {e}")
+
+
+def _record_fanout(event_id, followers, seconds):
+  stats = {
+    'event_id': event_id,
+    'followers': followers,
+    'seconds': round(seconds, 3),
+    'followers_per_second': round(followers / seconds, 1) if seconds else None,
+    'finished_at': timezone.now().isoformat(),
+  }
+  logger.info(f"Notified {followers} followers of event {event_id} in {seconds:.2f} s")
+  try:
+    cache.set(LAST_FANOUT_KEY, stats, timeout=None)
+  except Exception as e:
+    logger.warning(f"Notification fan-out cache unavailable: {e}")
+
+
+def fanout_stats():
+  """Size, duration and throughput of the last follower fan-out."""
+  try:
+    return cache.get(LAST_FANOUT_KEY)
+  except Exception as e:
+    logger.warning(f"Notification fan-out cache unavailable: {e}")
+    return None
@@ -5,12 +5,14 @@ from rest_framework import (
   status,
 )
 from apps.event.models import Event, Rating
+from apps.event.stats import update_event_stats, lock_event
 from commons.utils import ResponsePagination
 from .serializers import RatingSerializer
 from rest_framework.response import Response # full update: partial=False
 from drf_spectacular.utils import extend_schema
 from rest_framework.exceptions import MethodNotAllowed
 from rest_framework.decorators import action
+from django.db import transaction
 
 
 @extend_schema(tags=["Rating management"])
@@ -51,15 +53,22 @@ class RatingViewSet(viewsets.ModelViewSet):
   def create(self, request, event_id=None):
     """Create a new rating or overwrite an existing rating for the event. The user can rate the event for the first time or update their previous rating. no event id required to pass because only one rating exists per user for event """
     event = self.get_event()
-    existing = Rating.objects.filter(event=event, user=request.user).first()
+    with transaction.atomic():
+      lock_event(event.id)
+      existing = Rating.objects.filter(event=event, user=request.user).first()
 
-    if existing:
-        serializer = RatingSerializer(existing, data=request.data, partial=True)
-    else:
-        serializer = RatingSerializer(data=request.data)
+      if existing:
+          serializer = RatingSerializer(existing, data=request.data, partial=True)
+      else:
+          serializer = RatingSerializer(data=request.data)
 
-    serializer.is_valid(raise_exception=True)
-    serializer.save(user=request.user, event=event)
+      serializer.is_valid(raise_exception=True)
+      previous_value = existing.value if existing else None
+      rating = serializer.save(user=request.user, event=event)
+      if previous_value is None:
+        update_event_stats(event.id, ratings=1, rating_sum=rating.value)
+      else:
+        update_event_stats(event.id, rating_sum=rating.value - previous_value)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
   
   @action(detail=False, methods=['get', 'patch', 'delete', 'put'], url_path='me')
@@ -79,21 +88,41 @@ class RatingViewSet(viewsets.ModelViewSet):
       elif request.method == 'PATCH':
           serializer = self.get_serializer(rating, data=request.data, partial=True)
           serializer.is_valid(raise_exception=True)
-          serializer.save()
+          self._save_rating(serializer)
           return Response(serializer.data, status=status.HTTP_200_OK)
       
       elif request.method == 'PUT':
         serializer = self.get_serializer(rating, data=request.data) 
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        self._save_rating(serializer)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
       elif request.method == 'DELETE':
-          rating.delete()
+          with transaction.atomic():
+            value = self._locked_value(rating)
+            rating.delete()
+            update_event_stats(rating.event_id, ratings=-1, rating_sum=-value)
           return Response(status=status.HTTP_204_NO_CONTENT)
 
       return Response({"detail": "Method not allowed."}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
   
+  def _locked_value(self, rating):
+    """
+    Lock the rating's event and read the rating's current value again, so
+    that concurrent writes of the same rating apply their deltas in turn.
+    """
+    lock_event(rating.event_id)
+    value = Rating.objects.filter(pk=rating.pk).values_list('value', flat=True).first()
+    if value is None:
+      raise exceptions.NotFound("Rating not found.")
+    return value
+
+  def _save_rating(self, serializer):
+    with transaction.atomic():
+      previous_value = self._locked_value(serializer.instance)
+      rating = serializer.save()
+      update_event_stats(rating.event_id, rating_sum=rating.value - previous_value)
+  
   @extend_schema(exclude=True)
   def retrieve(self,request, *args, **kwargs):
       raise MethodNotAllowed("DELETE")
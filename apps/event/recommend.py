@@ -0,0 +1,175 @@
+import logging
+import time
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import F, Func, IntegerField, Value
+from django.utils import timezone
+from apps.event.scoring import get_engine
+from apps.user.models import CustomUser
+
+logger = logging.getLogger('django')
+
+# Event ids stored per user, and how long a stored list is served.
+RECOMMENDATIONS_SIZE = 200
+RECOMMENDATIONS_TIMEOUT = 6 * 60 * 60
+# Users who logged in this recently get their list precomputed.
+ACTIVE_USER_DAYS = 30
+RECOMMENDATIONS_CHUNK_SIZE = 500
+# Every this many positions of a list, one goes to an event similar to what
+# the user engaged with (see apps.event.similar).
+COLLABORATIVE_EVERY = 4
+# A user without a list gets it computed at most once per this many seconds
+# however often they read the feed meanwhile.
+RECOMMENDATIONS_REQUEST_INTERVAL = 60
+LAST_RUN_KEY = 'recommendations:last_run'
+
+
+class ArrayPosition(Func):
+  """Position (from 1) of a field's value in a list of integers, to keep the order of a stored list."""
+  function = 'array_position'
+  output_field = IntegerField()
+
+  def __init__(self, values, field):
+    super().__init__(Value(list(values), output_field=ArrayField(IntegerField())), F(field))
+
+
+def _key(user_id):
+  return f"recommendations:{user_id}"
+
+
+def get_recommendations(user_id):
+  """The stored event ids recommended to a user, best first, or None when there is no list."""
+  try:
+    return cache.get(_key(user_id))
+  except Exception as e:
+    logger.warning(f"Recommendation cache unavailable: {e}")
+    return None
+
+
+def forget_recommendations(user_id):
+  try:
+    cache.delete(_key(user_id))
+  except Exception as e:
+    logger.warning(f"Recommendation cache unavailable: {e}")
+
+
+def _enqueue(user_id):
+  from apps.event.tasks import refresh_user_recommendations
+
+  try:
+    refresh_user_recommendations.apply_async((user_id,), retry=False)
+  except Exception as e:
+    logger.warning(f"Could not schedule recommendations of user {user_id}: {e}")
+
+
+def schedule_recommendations(user_id):
+  """Drop the stored list of a user and recompute it in the background once the transaction commits."""
+  def enqueue():
+    forget_recommendations(user_id)
+    _enqueue(user_id)
+
+  transaction.on_commit(enqueue)
+
+
+def request_recommendations(user_id):
+  """
+  Compute the list of a user who has none in the background once the
+  transaction commits, unless that was already requested in the last
+  RECOMMENDATIONS_REQUEST_INTERVAL seconds.
+  """
+  try:
+    first = cache.add(f"recommendations:scheduled:{user_id}", True, timeout=RECOMMENDATIONS_REQUEST_INTERVAL)
+  except Exception as e:
+    logger.warning(f"Recommendation cache unavailable: {e}")
+    return
+  if first:
+    transaction.on_commit(lambda: _enqueue(user_id))
+
+
+def active_user_ids():
+  since = timezone.now() - timedelta(days=ACTIVE_USER_DAYS)
+  return CustomUser.objects.filter(is_active=True, role='user', last_login__gte=since).order_by('id').values_list('id', flat=True)
+
+
+def refresh_recommendations(user_ids=None):
+  """
+  Score the upcoming public events for the given users, or every active
+  user, with the sparse scoring engine, blend in events similar to those
+  they engaged with, and store the top
+  RECOMMENDATIONS_SIZE ids of each for RECOMMENDATIONS_TIMEOUT seconds.
+  Full runs load the events afresh; single users reuse the process's
+  engine. The throughput of full runs is kept for the metrics endpoint.
+  Returns the number of users processed.
+  """
+  started = time.perf_counter()
+  full_run = user_ids is None
+  user_ids = list(active_user_ids() if full_run else user_ids)
+  engine = get_engine(fresh=full_run)
+  popular = engine.popular(RECOMMENDATIONS_SIZE)
+  for start in range(0, len(user_ids), RECOMMENDATIONS_CHUNK_SIZE):
+    chunk = user_ids[start:start + RECOMMENDATIONS_CHUNK_SIZE]
+    engagements = engine.engagements(chunk)
+    preferences, purchased = engine.preferences(chunk, engagements)
+    top = engine.top_events(preferences, RECOMMENDATIONS_SIZE, purchased)
+    similar = engine.collaborative(engagements, RECOMMENDATIONS_SIZE // COLLABORATIVE_EVERY)
+    lists = {
+      _key(user_id): _fill(_blend(events, similar[row]), popular, purchased[row])
+      for row, (user_id, events) in enumerate(zip(chunk, top))
+    }
+    try:
+      cache.set_many(lists, timeout=RECOMMENDATIONS_TIMEOUT)
+    except Exception as e:
+      logger.warning(f"Recommendation cache unavailable: {e}")
+      break
+
+  if full_run:
+    _record_run(len(user_ids), time.perf_counter() - started)
+  return len(user_ids)
+
+
+def _blend(events, similar):
+  """Put a similar event at every COLLABORATIVE_EVERY-th position, keeping the first occurrence of each id."""
+  blended, seen = [], set()
+  events, similar = iter(events), iter(similar)
+  while len(blended) < RECOMMENDATIONS_SIZE:
+    source = similar if len(blended) % COLLABORATIVE_EVERY == COLLABORATIVE_EVERY - 1 else events
+    event_id = next((event_id for event_id in source if event_id not in seen), None)
+    if event_id is None:
+      other = events if source is similar else similar
+      event_id = next((event_id for event_id in other if event_id not in seen), None)
+      if event_id is None:
+        break
+    blended.append(event_id)
+    seen.add(event_id)
+  return blended
+
+
+def _fill(events, popular, purchased):
+  """Top up a list with few matches with popular events."""
+  seen = set(events) | purchased
+  return events + [event_id for event_id in popular if event_id not in seen][:RECOMMENDATIONS_SIZE - len(events)]
+
+
+def _record_run(users, seconds):
+  stats = {
+    'users': users,
+    'seconds': round(seconds, 3),
+    'users_per_second': round(users / seconds, 1) if seconds else None,
+    'finished_at': timezone.now().isoformat(),
+  }
+  logger.info(f"Recommendations refreshed for {users} users in {seconds:.2f} s")
+  try:
+    cache.set(LAST_RUN_KEY, stats, timeout=None)
+  except Exception as e:
+    logger.warning(f"Recommendation cache unavailable: {e}")
+
+
+def recommendation_stats():
+  """Size, duration and throughput of the last full refresh."""
+  try:
+    return cache.get(LAST_RUN_KEY)
+  except Exception as e:
+    logger.warning(f"Recommendation cache unavailable: {e}")
+    return None
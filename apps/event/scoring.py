@@ -0,0 +1,292 @@
+import logging
+import threading
+import time
+import numpy as np
+from scipy import sparse
+from django.db.models import Max
+from django.utils import timezone
+from apps.event.models import Event, EventNeighbors, Category, Hashtag, Bookmark, Rating, UserTicket
+from apps.user.models import CustomUser, Follow
+
+logger = logging.getLogger('django')
+
+# Preference weight of a feature per signal of the user. Engaging with an
+# event counts towards its organizer with the engagement's weight, and
+# towards its categories and hashtags with ENGAGED_TOPIC_SHARE of it.
+INTEREST_CATEGORY_WEIGHT = 3.0
+INTEREST_TAG_WEIGHT = 2.0
+FOLLOW_WEIGHT = 4.0
+LIKE_WEIGHT = 1.0
+BOOKMARK_WEIGHT = 2.0
+PURCHASE_WEIGHT = 3.0
+# A 5-star rating weighs this much, a 0-star one as much against.
+RATING_WEIGHT = 2.0
+ENGAGED_TOPIC_SHARE = 0.5
+
+# Users are scored in chunks of at most this many, and of at most this many
+# (user, event) scores, which bounds the memory of one product.
+SCORING_CHUNK_SIZE = 1000
+SCORING_CHUNK_ENTRIES = 5_000_000
+# A process reuses its event matrix for single-user scoring this long.
+ENGINE_MAX_AGE = 15 * 60
+
+
+class FeatureSpace:
+  """
+  Columns of the feature matrices: organizers, then categories, then
+  hashtags, each at its id past the offset of its kind.
+  """
+
+  def __init__(self, max_user_id, max_category_id, max_hashtag_id):
+    self.category_offset = max_user_id + 1
+    self.hashtag_offset = self.category_offset + max_category_id + 1
+    self.size = self.hashtag_offset + max_hashtag_id + 1
+
+  @classmethod
+  def current(cls):
+    return cls(
+      CustomUser.objects.aggregate(id=Max('id'))['id'] or 0,
+      Category.objects.aggregate(id=Max('id'))['id'] or 0,
+      Hashtag.objects.aggregate(id=Max('id'))['id'] or 0,
+    )
+
+  def organizers(self, ids):
+    return np.asarray(ids, dtype=np.int64)
+
+  def categories(self, ids):
+    return self.category_offset + np.asarray(ids, dtype=np.int64)
+
+  def hashtags(self, ids):
+    return self.hashtag_offset + np.asarray(ids, dtype=np.int64)
+
+  def matrix(self, rows, columns, weights, row_count):
+    """
+    A CSR matrix of `row_count` rows over the features, summing duplicate
+    entries. Features created after the space was sized are left out.
+    """
+    rows, columns = np.asarray(rows, dtype=np.int64), np.asarray(columns, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    known = columns < self.size
+    return sparse.csr_matrix((weights[known], (rows[known], columns[known])), shape=(row_count, self.size))
+
+  def event_features(self, event_ids, topic_weight=1.0):
+    """Features of events by row, in the order of the sorted `event_ids`: organizer, categories and hashtags."""
+    organizers = dict(Event.objects.filter(id__in=event_ids.tolist()).values_list('id', 'organizer_id'))
+    categories = list(Event.category.through.objects.filter(event_id__in=event_ids.tolist()).values_list('event_id', 'category_id'))
+    hashtags = list(Event.hashtags.through.objects.filter(event_id__in=event_ids.tolist()).values_list('event_id', 'hashtag_id'))
+    return self._event_matrix(event_ids, organizers, categories, hashtags, topic_weight)
+
+  def _event_matrix(self, event_ids, organizers, categories, hashtags, topic_weight):
+    rows, columns, weights = [], [], []
+    known = [(event_id, organizer_id) for event_id, organizer_id in organizers.items()]
+    if known:
+      ids, organizer_ids = zip(*known)
+      rows.append(np.searchsorted(event_ids, ids))
+      columns.append(self.organizers(organizer_ids))
+      weights.append(np.ones(len(ids)))
+    for pairs, columns_of in ((categories, self.categories), (hashtags, self.hashtags)):
+      if pairs:
+        ids, feature_ids = zip(*pairs)
+        rows.append(np.searchsorted(event_ids, ids))
+        columns.append(columns_of(feature_ids))
+        weights.append(np.full(len(ids), topic_weight))
+    if not rows:
+      return self.matrix([], [], [], len(event_ids))
+    return self.matrix(np.concatenate(rows), np.concatenate(columns), np.concatenate(weights), len(event_ids))
+
+
+class ScoringEngine:
+  """
+  Scores upcoming public events for users as sparse matrix products.
+
+  Events are rows of a binary event-feature matrix (organizer, categories,
+  hashtags); users are rows of a weighted user-preference matrix over the
+  same features. A user's score for an event is the dot product of the two
+  rows, so the scores of a chunk of users are one sparse product. Only
+  events sharing a feature with the user get a score, which makes every
+  event the `recomendations` filter matches a candidate and nothing else.
+  The top k per user are picked with argpartition, ties broken by
+  popularity and then by newest id.
+  """
+
+  def __init__(self, space, event_ids, popularity, event_features):
+    self.space = space
+    self.event_ids = event_ids
+    self.popularity = popularity
+    # Features x events, so that a product with user rows needs no transposing.
+    self.feature_events = event_features.T.tocsr()
+    self.built_at = time.time()
+
+  @classmethod
+  def build(cls):
+    """Load the upcoming public events and their features."""
+    space = FeatureSpace.current()
+    upcoming = Event.objects.filter(is_public=True, end_date__gte=timezone.now())
+    rows = list(upcoming.order_by('id').values_list('id', 'organizer_id', 'stats__popularity'))
+    event_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    popularity = np.fromiter((row[2] or 0.0 for row in rows), dtype=np.float64, count=len(rows))
+    organizers = {row[0]: row[1] for row in rows}
+    categories = list(Event.category.through.objects.filter(event__in=upcoming).values_list('event_id', 'category_id'))
+    hashtags = list(Event.hashtags.through.objects.filter(event__in=upcoming).values_list('event_id', 'hashtag_id'))
+    return cls(space, event_ids, popularity, space._event_matrix(event_ids, organizers, categories, hashtags, 1.0))
+
+  def engagements(self, user_ids):
+    """
+    The users x events matrix of the likes, bookmarks, ratings and purchases
+    of `user_ids`, one row each, the sorted event ids of its columns, and
+    the event ids each user has bought tickets for.
+    """
+    index = {user_id: row for row, user_id in enumerate(user_ids)}
+    engagements = [
+      (user_id, event_id, LIKE_WEIGHT)
+      for user_id, event_id in Event.likes.through.objects.filter(customuser_id__in=user_ids).values_list('customuser_id', 'event_id')
+    ]
+    engagements += [
+      (user_id, event_id, BOOKMARK_WEIGHT)
+      for user_id, event_id in Bookmark.objects.filter(user_id__in=user_ids).values_list('user_id', 'event_id')
+    ]
+    engagements += [
+      (user_id, event_id, RATING_WEIGHT * (value - 2.5) / 2.5)
+      for user_id, event_id, value in Rating.objects.filter(user_id__in=user_ids).values_list('user_id', 'event_id', 'value')
+    ]
+    purchased = [set() for _ in user_ids]
+    for user_id, event_id in UserTicket.objects.filter(user_id__in=user_ids).values_list('user_id', 'ticket__event_id'):
+      purchased[index[user_id]].add(event_id)
+      engagements.append((user_id, event_id, PURCHASE_WEIGHT))
+
+    if not engagements:
+      return sparse.csr_matrix((len(user_ids), 0)), np.empty(0, dtype=np.int64), purchased
+    users, events, amounts = zip(*engagements)
+    engaged_ids = np.unique(np.asarray(events, dtype=np.int64))
+    engaged = sparse.csr_matrix(
+      (np.asarray(amounts, dtype=np.float64), ([index[user_id] for user_id in users], np.searchsorted(engaged_ids, events))),
+      shape=(len(user_ids), len(engaged_ids)),
+    )
+    return engaged, engaged_ids, purchased
+
+  def preferences(self, user_ids, engagements=None):
+    """
+    The user-preference matrix of `user_ids`, one row each, from their
+    interests, follows, likes, bookmarks, ratings and purchases, and the
+    event ids each has bought tickets for. `engagements` reuses the result
+    of engagements() for the same users.
+    """
+    space = self.space
+    index = {user_id: row for row, user_id in enumerate(user_ids)}
+    rows, columns, weights = [], [], []
+
+    interests = CustomUser.objects.filter(id__in=user_ids).values_list('id', '_user_profile__interests')
+    names = [(index[user_id], value if isinstance(value, dict) else {}) for user_id, value in interests]
+    category_ids = dict(Category.objects.filter(name__in={n for _, i in names for n in i.get('categories') or []}).values_list('name', 'id'))
+    hashtag_ids = dict(Hashtag.objects.filter(name__in={n for _, i in names for n in i.get('tags') or []}).values_list('name', 'id'))
+    for row, value in names:
+      for name in value.get('categories') or []:
+        if name in category_ids:
+          rows.append(row)
+          columns.append(space.category_offset + category_ids[name])
+          weights.append(INTEREST_CATEGORY_WEIGHT)
+      for name in value.get('tags') or []:
+        if name in hashtag_ids:
+          rows.append(row)
+          columns.append(space.hashtag_offset + hashtag_ids[name])
+          weights.append(INTEREST_TAG_WEIGHT)
+
+    for user_id, organizer_id in Follow.objects.filter(follower_id__in=user_ids).values_list('follower_id', 'followed_id'):
+      rows.append(index[user_id])
+      columns.append(organizer_id)
+      weights.append(FOLLOW_WEIGHT)
+    preferences = space.matrix(rows, columns, weights, len(user_ids))
+
+    engaged, engaged_ids, purchased = engagements or self.engagements(user_ids)
+    if len(engaged_ids):
+      preferences = preferences + engaged @ space.event_features(engaged_ids, topic_weight=ENGAGED_TOPIC_SHARE)
+    return preferences, purchased
+
+  def collaborative(self, engagements, k):
+    """
+    The ids of the `k` upcoming events most similar to what each user
+    engaged with, from the EventNeighbors of their engaged events weighted
+    by the engagement (negative ratings count against). Events the user
+    already engaged with are left out.
+    """
+    engaged, engaged_ids, _ = engagements
+    top = [[] for _ in range(engaged.shape[0])]
+    if not len(engaged_ids):
+      return top
+    rows, columns, scores = [], [], []
+    neighbors = EventNeighbors.objects.filter(event_id__in=engaged_ids.tolist()).values_list('event_id', 'neighbor_ids', 'scores')
+    for event_id, neighbor_ids, similarity in neighbors:
+      positions = np.searchsorted(self.event_ids, neighbor_ids)
+      known = (positions < len(self.event_ids)) & (self.event_ids[np.minimum(positions, len(self.event_ids) - 1)] == neighbor_ids)
+      rows.append(np.full(known.sum(), np.searchsorted(engaged_ids, event_id)))
+      columns.append(positions[known])
+      scores.append(np.asarray(similarity, dtype=np.float64)[known])
+    if not rows:
+      return top
+    similar = sparse.csr_matrix(
+      (np.concatenate(scores), (np.concatenate(rows), np.concatenate(columns))),
+      shape=(len(engaged_ids), len(self.event_ids)),
+    )
+    totals = (engaged @ similar).tocsr()
+    for row in range(totals.shape[0]):
+      begin, end = totals.indptr[row], totals.indptr[row + 1]
+      columns, values = totals.indices[begin:end], totals.data[begin:end]
+      seen = engaged_ids[engaged[row].indices]
+      keep = (values > 0) & ~np.isin(self.event_ids[columns], seen)
+      columns, values = columns[keep], values[keep]
+      order = np.lexsort((-self.event_ids[columns], -self.popularity[columns], -values))[:k]
+      top[row] = self.event_ids[columns[order]].tolist()
+    return top
+
+  def chunks(self, preferences):
+    """Row ranges of `preferences` whose product with the events stays within the chunk limits."""
+    matches = (preferences != 0).astype(np.float64) @ np.diff(self.feature_events.indptr).astype(np.float64)
+    start = 0
+    while start < preferences.shape[0]:
+      end = min(start + SCORING_CHUNK_SIZE, preferences.shape[0])
+      total = np.cumsum(matches[start:end])
+      end = start + max(1, int(np.searchsorted(total, SCORING_CHUNK_ENTRIES, side='right')))
+      yield start, end
+      start = end
+
+  def top_events(self, preferences, k, purchased=None):
+    """The ids of the `k` best scoring events for each row of `preferences`, leaving out purchased ones."""
+    top = []
+    for start, end in self.chunks(preferences):
+      scores = (preferences[start:end] @ self.feature_events).tocsr()
+      for row in range(end - start):
+        begin, finish = scores.indptr[row], scores.indptr[row + 1]
+        columns, values = scores.indices[begin:finish], scores.data[begin:finish]
+        keep = values > 0
+        if purchased is not None and purchased[start + row]:
+          keep &= ~np.isin(self.event_ids[columns], list(purchased[start + row]))
+        columns, values = columns[keep], values[keep]
+        if len(values) > k:
+          kth = values[np.argpartition(-values, k - 1)[:k]].min()
+          columns, values = columns[values >= kth], values[values >= kth]
+        order = np.lexsort((-self.event_ids[columns], -self.popularity[columns], -values))[:k]
+        top.append(self.event_ids[columns[order]].tolist())
+    return top
+
+  def popular(self, k):
+    """The ids of the `k` most popular events, newest first among equals."""
+    if len(self.event_ids) > k:
+      candidates = np.argpartition(-self.popularity, k - 1)[:k]
+      candidates = np.flatnonzero(self.popularity >= self.popularity[candidates].min())
+    else:
+      candidates = np.arange(len(self.event_ids))
+    order = np.lexsort((-self.event_ids[candidates], -self.popularity[candidates]))[:k]
+    return self.event_ids[candidates[order]].tolist()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(fresh=False):
+  """This process's scoring engine, rebuilt when `fresh` or older than ENGINE_MAX_AGE."""
+  global _engine
+  with _engine_lock:
+    if fresh or _engine is None or time.time() - _engine.built_at > ENGINE_MAX_AGE:
+      _engine = ScoringEngine.build()
+    return _engine
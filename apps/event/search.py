@@ -0,0 +1,276 @@
+import hashlib
+import logging
+import re
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connection, transaction
+from django.db.models import F, Q, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from apps.event.models import Event, Category, Hashtag, Ticket
+from apps.event.stats import order_by_popularity
+from apps.user.models import OrganizationProfile
+
+logger = logging.getLogger('django')
+
+SEARCH_CONFIG = 'english'
+REBUILD_CHUNK_SIZE = 5000
+
+# How much EventStats.popularity weighs against the text rank (SearchRank is ~0..1).
+POPULARITY_WEIGHT = 0.05
+
+# Organizer names considered by the fuzzy search, best matches first.
+FUZZY_ORGANIZER_LIMIT = 50
+
+FACETS_TIMEOUT = 60
+# Categories and hashtags listed per facet, most frequent first.
+FACET_VALUES_LIMIT = 20
+DATE_BUCKETS = ('past', 'today', 'this_week', 'this_month', 'later')
+
+
+def _names_of(through, field):
+  """Space-joined names of an event's hashtags or categories, as a subquery."""
+  return Coalesce(
+    Subquery(
+      through.objects.filter(event_id=OuterRef('pk'))
+      .values('event_id')
+      .annotate(names=StringAgg(f'{field}__name', ' '))
+      .values('names')
+    ),
+    Value(''),
+    output_field=TextField()
+  )
+
+
+def search_vector():
+  """The weighted tsvector of an event, computed in the database."""
+  return (
+    SearchVector('title', weight='A', config=SEARCH_CONFIG)
+    + SearchVector(_names_of(Event.hashtags.through, 'hashtag'), weight='A', config=SEARCH_CONFIG)
+    + SearchVector(_names_of(Event.category.through, 'category'), weight='B', config=SEARCH_CONFIG)
+    + SearchVector('location', weight='C', config=SEARCH_CONFIG)
+    + SearchVector('description', weight='D', config=SEARCH_CONFIG)
+  )
+
+
+def update_search_vectors(event_ids):
+  """Recompute the stored search vector of the given events with one UPDATE."""
+  event_ids = [event_id for event_id in set(event_ids) if event_id is not None]
+  if event_ids:
+    Event.objects.filter(id__in=event_ids).update(search_vector=search_vector())
+
+
+def rebuild_search_vectors():
+  """Recompute every stored search vector, in id ranges. Returns the number of rows updated."""
+  updated = 0
+  last_id = 0
+  while True:
+    ids = list(
+      Event.objects.filter(id__gt=last_id).order_by('id')
+      .values_list('id', flat=True)[:REBUILD_CHUNK_SIZE]
+    )
+    if not ids:
+      return updated
+    updated += Event.objects.filter(id__gte=ids[0], id__lte=ids[-1]).update(search_vector=search_vector())
+    last_id = ids[-1]
+
+
+def parse_search_query(text):
+  """
+  Turn free text into a prefix-matching tsquery that matches any of its words,
+  like the old per-word icontains filter did. Returns None for text without words.
+  """
+  terms = re.findall(r'\w+', text)
+  if not terms:
+    return None
+  return SearchQuery(' | '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG)
+
+
+def search_events(queryset, text):
+  """
+  Filter `queryset` to events matching `text` and order them by text rank
+  blended with the event's popularity.
+  """
+  query = parse_search_query(text)
+  if query is None:
+    return order_by_popularity(queryset)
+
+  return (
+    queryset.filter(search_vector=query)
+    .annotate(
+      search_rank=SearchRank(F('search_vector'), query),
+      search_score=F('search_rank') + POPULARITY_WEIGHT * Coalesce(F('stats__popularity'), Value(0.0)),
+    )
+    .order_by('-search_score', '-id')
+  )
+
+
+def has_few_results(events):
+  """Whether `events` has fewer matches than the fuzzy fallback kicks in at."""
+  minimum = settings.EVENT_SEARCH_FUZZY_MIN_RESULTS
+  return len(events.order_by().values_list('id', flat=True)[:minimum]) < minimum
+
+
+@contextmanager
+def fuzzy_search_threshold(threshold=None):
+  """
+  Run the enclosed queries with the given pg_trgm word similarity threshold,
+  which is what the index-backed `%>` operator compares against.
+  """
+  if threshold is None:
+    threshold = settings.EVENT_SEARCH_FUZZY_THRESHOLD
+  with transaction.atomic():
+    with connection.cursor() as cursor:
+      cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", [str(threshold)])
+    yield
+
+
+def fuzzy_search_events(queryset, text):
+  """
+  Typo-tolerant search: events whose title, location or organizer name contains
+  a word similar to `text`, plus the full-text matches, ordered by similarity.
+
+  Every condition is an indexed operator (trigram GIN indexes, the search
+  vector GIN index and the organizer foreign key), so Postgres can combine
+  them with a BitmapOr instead of scanning the table. Run it inside
+  fuzzy_search_threshold().
+  """
+  words = ' '.join(re.findall(r'\w+', text))
+  if not words:
+    return search_events(queryset, text)
+
+  organizer_ids = list(
+    OrganizationProfile.objects.filter(name__trigram_word_similar=words)
+    .annotate(similarity=TrigramWordSimilarity(words, 'name'))
+    .order_by('-similarity')
+    .values_list('user_id', flat=True)[:FUZZY_ORGANIZER_LIMIT]
+  )
+  matches = Q(title__trigram_word_similar=words) | Q(location__trigram_word_similar=words)
+  if organizer_ids:
+    matches |= Q(organizer_id__in=organizer_ids)
+  query = parse_search_query(text)
+  matches |= Q(search_vector=query)
+
+  return (
+    queryset.filter(matches)
+    .annotate(
+      search_similarity=Greatest(
+        TrigramWordSimilarity(words, 'title'),
+        TrigramWordSimilarity(words, 'location'),
+        Coalesce(TrigramWordSimilarity(words, 'organizer___organization_profile__name'), Value(0.0)),
+      ),
+      search_rank=SearchRank(F('search_vector'), query),
+      search_score=F('search_similarity') + F('search_rank'),
+    )
+    .order_by('-search_score', '-id')
+  )
+
+
+def facets_cache_key(text, categories, hashtags, fuzzy):
+  """Cache key of the facets of a search, the same for equivalent queries."""
+  normalized = '|'.join([
+    ' '.join(re.findall(r'\w+', text.lower())),
+    ','.join(sorted({name.lower() for name in categories})),
+    ','.join(sorted({name.lower() for name in hashtags})),
+    'fuzzy' if fuzzy else 'full-text',
+  ])
+  return f"event:search:facets:{hashlib.sha1(normalized.encode()).hexdigest()}"
+
+
+def search_facets(events, cache_key):
+  """
+  Category, hashtag, start date and free/paid counts over the events of a
+  search, computed with one UNION ALL of grouped queries over the matching
+  ids and cached for FACETS_TIMEOUT seconds.
+  """
+  try:
+    facets = cache.get(cache_key)
+  except Exception as e:
+    logger.warning(f"Search facet cache unavailable: {e}")
+    facets = None
+  if facets is not None:
+    return facets
+
+  facets = _count_facets(events)
+  try:
+    cache.set(cache_key, facets, timeout=FACETS_TIMEOUT)
+  except Exception as e:
+    logger.warning(f"Search facet cache unavailable: {e}")
+  return facets
+
+
+def _count_facets(events):
+  matched_sql, matched_params = events.order_by().values('id').query.sql_with_params()
+  today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+  tables = {
+    'event': Event._meta.db_table,
+    'category': Category._meta.db_table,
+    'event_category': Event.category.through._meta.db_table,
+    'hashtag': Hashtag._meta.db_table,
+    'event_hashtag': Event.hashtags.through._meta.db_table,
+    'ticket': Ticket._meta.db_table,
+  }
+  sql = f"""
+    WITH matched AS ({matched_sql})
+    (
+      SELECT 'categories' AS facet, c.name AS value, COUNT(DISTINCT ec.event_id) AS count
+      FROM {tables['event_category']} ec JOIN {tables['category']} c ON c.id = ec.category_id
+      WHERE ec.event_id IN (SELECT id FROM matched)
+      GROUP BY c.name ORDER BY count DESC, c.name LIMIT %s
+    )
+    UNION ALL
+    (
+      SELECT 'hashtags', h.name, COUNT(*) AS count
+      FROM {tables['event_hashtag']} eh JOIN {tables['hashtag']} h ON h.id = eh.hashtag_id
+      WHERE eh.event_id IN (SELECT id FROM matched)
+      GROUP BY h.name ORDER BY count DESC, h.name LIMIT %s
+    )
+    UNION ALL
+    SELECT 'dates',
+      CASE
+        WHEN e.end_date < %s THEN 'past'
+        WHEN e.start_date < %s THEN 'today'
+        WHEN e.start_date < %s THEN 'this_week'
+        WHEN e.start_date < %s THEN 'this_month'
+        ELSE 'later'
+      END,
+      COUNT(*)
+    FROM {tables['event']} e WHERE e.id IN (SELECT id FROM matched)
+    GROUP BY 2
+    UNION ALL
+    SELECT 'price',
+      CASE WHEN EXISTS (
+        SELECT 1 FROM {tables['ticket']} t WHERE t.event_id = matched.id AND t.price > 0 AND t.active
+      ) THEN 'paid' ELSE 'free' END,
+      COUNT(*)
+    FROM matched
+    GROUP BY 2
+  """
+  params = [
+    *matched_params,
+    FACET_VALUES_LIMIT,
+    FACET_VALUES_LIMIT,
+    timezone.now(),
+    today + timedelta(days=1),
+    today + timedelta(days=7),
+    today + timedelta(days=30),
+  ]
+
+  facets = {
+    'categories': [],
+    'hashtags': [],
+    'dates': dict.fromkeys(DATE_BUCKETS, 0),
+    'price': {'free': 0, 'paid': 0},
+  }
+  with connection.cursor() as cursor:
+    cursor.execute(sql, params)
+    for facet, value, count in cursor.fetchall():
+      if facet in ('categories', 'hashtags'):
+        facets[facet].append({'name': value, 'count': count})
+      else:
+        facets[facet][value] = count
+  return facets
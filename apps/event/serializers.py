@@ -2,11 +2,20 @@ import logging
 from rest_framework import serializers
 from .models import Category, Event, Hashtag, Bookmark, Rating, UserTicket
 from apps.community.models import Community
-from apps.user.serializers import UserWithOrganizationProfileDocSerializer
+from apps.user.serializers import UserWithOrganizationProfileDocSerializer, get_following_ids
 from drf_spectacular.utils import extend_schema_field
 from django.db.models import Avg, Sum, F, ExpressionWrapper,DecimalField
 from apps.event.rating.serializers import RatingSerializer
 from apps.payment.models import PaymentItem
+from apps.event.batch import EventBatch
+from commons.serializers import SparseFieldsetMixin
+from apps.event.cache import (
+  PERSONAL_FIELDS,
+  get_fragment_versions,
+  get_fragments,
+  set_fragments,
+  public_fragment,
+)
 
 
 logger = logging.getLogger("django")
@@ -38,7 +47,50 @@ class HashtagSerializer(serializers.ModelSerializer):
     model = Hashtag
     fields = ['name']
 
-class EventSerializer(serializers.ModelSerializer):
+class EventListSerializer(serializers.ListSerializer):
+  """
+  Serializes a page of events with the per-event lookups of EventSerializer
+  resolved for the whole page at once (see EventBatch).
+
+  The viewer-independent part of each event is served from the fragment
+  cache; only cache misses are rendered, and the requesting user's fields
+  are merged in on top.
+  """
+
+  def to_representation(self, data):
+    events = list(data.all() if hasattr(data, 'all') else data)
+    request = self.context.get('request')
+    user = request.user if request else None
+
+    versions = get_fragment_versions([event.id for event in events])
+    fragments = get_fragments(versions)
+    misses = [event for event in events if event.id not in fragments]
+
+    fields = set(self.child.fields)
+    if self.child.wants_field('total_revenue'):
+      fields.add('total_revenue')
+
+    self.child._batch = EventBatch(events, user, public_events=misses, fields=fields)
+    try:
+      rendered = {event.id: self.child.to_representation(event) for event in misses}
+      if not self.child.is_sparse:
+        # Sparse renders lack fields, so only full renders are cached.
+        set_fragments(
+          {event_id: public_fragment(rep) for event_id, rep in rendered.items()},
+          versions
+        )
+      return [
+        rendered[event.id] if event.id in rendered
+        else self.child.apply_personal_fields(self.child.project(fragments[event.id]), event)
+        for event in events
+      ]
+    finally:
+      self.child._batch = None
+
+
+class EventSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+  _batch = None
+
   category = serializers.PrimaryKeyRelatedField(
     many=True,
     queryset=Category.objects.all()
@@ -106,16 +158,57 @@ class EventSerializer(serializers.ModelSerializer):
       'updated_at',
     ]
     read_only_fields = ['id', 'organizer', 'created_at', 'updated_at']
+    list_serializer_class = EventListSerializer
+    field_presets = {
+      'compact': [
+        'id',
+        'title',
+        'cover_image_url',
+        'start_date',
+        'start_time',
+        'end_date',
+        'location',
+        'likes_count',
+      ],
+    }
     
   def to_representation(self, instance):
     rep = super().to_representation(instance)
     request = self.context.get('request')
-    if request and request.user.is_authenticated and instance.organizer == request.user:
+    if (
+      request and request.user.is_authenticated
+      and instance.organizer_id == request.user.id
+      and self.wants_field('total_revenue')
+    ):
         rep['total_revenue'] = self.get_total_revenue(instance)
     return rep
 
+  def project(self, fragment):
+    """Reduce a cached full fragment to the fields of this serializer."""
+    if not self.is_sparse:
+      return fragment
+    return {name: value for name, value in fragment.items() if name in self.fields}
+
+  def apply_personal_fields(self, fragment, instance):
+    """Fill the requesting user's fields into a cached public fragment."""
+    for name in PERSONAL_FIELDS:
+      if name in fragment:
+        fragment[name] = getattr(self, f'get_{name}')(instance)
+
+    request = self.context.get('request')
+    user = request.user if request else None
+    if user is not None and user.is_authenticated:
+      profile = (fragment.get('organizer') or {}).get('profile')
+      if profile:
+        profile['is_following'] = instance.organizer_id in get_following_ids(request)
+      if instance.organizer_id == user.id and self.wants_field('total_revenue'):
+        fragment['total_revenue'] = self.get_total_revenue(instance)
+    return fragment
+
   @extend_schema_field(serializers.IntegerField())
   def get_likes_count(self, obj):
+    if self._batch:
+      return self._batch.likes_count.get(obj.id, 0)
     return obj.likes.all().count()
   
   @extend_schema_field(serializers.BooleanField())
@@ -123,10 +216,14 @@ class EventSerializer(serializers.ModelSerializer):
     request = self.context.get('request')
     if not request.user.is_authenticated:
       return False
+    if self._batch:
+      return obj.id in self._batch.liked
     return obj.is_liked(request.user)
   
   @extend_schema_field(serializers.IntegerField())
   def get_bookmarks_count(self, obj):
+    if self._batch:
+      return self._batch.bookmarks_count.get(obj.id, 0)
     return Bookmark.objects.filter(event=obj).count()  
   
   @extend_schema_field(serializers.BooleanField())
@@ -134,6 +231,8 @@ class EventSerializer(serializers.ModelSerializer):
     request = self.context.get('request')
     if not request.user.is_authenticated:
       return False
+    if self._batch:
+      return obj.id in self._batch.bookmarked
     return Bookmark.objects.filter(user=request.user, event=obj).exists()
   
   @extend_schema_field(serializers.BooleanField())
@@ -141,14 +240,20 @@ class EventSerializer(serializers.ModelSerializer):
     request = self.context.get('request')
     if not request.user.is_authenticated:
       return False
+    if self._batch:
+      return obj.id in self._batch.ratings
     return Rating.objects.filter(user=request.user, event=obj).exists()
   
   @extend_schema_field(serializers.IntegerField())
   def get_rating_count(self, obj):
+    if self._batch:
+      return self._batch.rating_count.get(obj.id, 0)
     return Rating.objects.filter(event=obj).count()
   
   @extend_schema_field(serializers.FloatField(allow_null=True))
   def get_average_rating(self, obj):
+    if self._batch:
+      return self._batch.average_rating.get(obj.id)
     result = Rating.objects.filter(event=obj).aggregate(avg_rating=Avg('value'))
     return result['avg_rating']
   
@@ -157,6 +262,9 @@ class EventSerializer(serializers.ModelSerializer):
       request = self.context.get('request')
       if not request.user.is_authenticated:
         return None
+      if self._batch:
+        rating = self._batch.ratings.get(obj.id)
+        return RatingSerializer(rating, context=self.context).data if rating else None
       try:
           rating = Rating.objects.get(event=obj, user=request.user)
           return RatingSerializer(rating, context=self.context).data
@@ -165,6 +273,8 @@ class EventSerializer(serializers.ModelSerializer):
         
   @extend_schema_field(serializers.IntegerField())
   def get_attendee_count(self, obj):
+    if self._batch:
+      return self._batch.attendee_count.get(obj.id, 0)
     return UserTicket.objects.filter(ticket__event=obj, used= True).count()
   
   @extend_schema_field(serializers.BooleanField())
@@ -172,10 +282,14 @@ class EventSerializer(serializers.ModelSerializer):
     user = self.context['request'].user
     if not user.is_authenticated:
       return False
+    if self._batch:
+      return obj.id in self._batch.has_ticket
     return UserTicket.objects.filter(ticket__event=obj, user=user).exists()
   
   @extend_schema_field(serializers.IntegerField())
   def get_total_revenue(self, obj):
+    if self._batch:
+      return self._batch.total_revenue.get(obj.id) or 0
     total_revenue = PaymentItem.objects.filter(ticket__event = obj).aggregate(
       total=Sum(
         ExpressionWrapper(
@@ -191,6 +305,8 @@ class EventSerializer(serializers.ModelSerializer):
       user = self.context['request'].user
       if not user.is_authenticated:
         return False
+      if self._batch:
+        return obj.id in self._batch.has_attended
       return UserTicket.objects.filter(user=user, ticket__event=obj,used=True).exists()
          
   def validate_hashtags_list(self, value):
@@ -1,36 +1,226 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Event
-from apps.notification.models import Notification
+from django.utils import timezone
+from .models import Event, EventStats, Category, Hashtag, Ticket, UserTicket, Bookmark, Rating
+from .cache import invalidate_events
+from .stats import refresh_popularity
+from .search import update_search_vectors
+from .suggest import suggestion_index, normalize
+from .spatial import spatial_index
+from .geo import mark_map_cells_dirty
+from .timeline import backfill_organizer, prune_organizer
+from .recommend import schedule_recommendations
+from .similar import mark_neighbors_stale
+from .notify import schedule_follower_notifications, update_follower_groups
 import logging
-from apps.user.models import CustomUser
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from apps.user.models import CustomUser, OrganizationProfile, Profile, Follow
 
 logger = logging.getLogger('django')
 
+@receiver(post_save, sender=Event)
+def create_event_stats(sender, instance, created, **kwargs):
+    if created:
+        EventStats.objects.get_or_create(event=instance)
+    # The score decays from the start date, which may have changed.
+    refresh_popularity([instance.pk])
+
 @receiver(post_save, sender=Event)
 def notify_followers_on_new_event(sender, instance, created, **kwargs):
     if created:
-        organizer = instance.organizer
-        follower_users = CustomUser.objects.filter(following__followed=organizer).distinct()
-        
-        notifications = [
-            Notification(user=follower, message=f"{organizer.profile.name} has created a new event: {instance.title}", event=instance)
-            for follower in follower_users
-        ]
-        Notification.objects.bulk_create(notifications)
-
-        channel_layer = get_channel_layer()
-        for follower in follower_users:
-            async_to_sync(channel_layer.group_send)(
-                f"user_{follower.id}",
-                {
-                    "type": "notify",
-                    "content": {
-                        "message": f"{organizer.profile.name} has created a new event: {instance.title}",
-                        "event_id": instance.id,
-                        "organizer": organizer.profile.name,
-                    },
-                },
-            )
\ No newline at end of file
+        schedule_follower_notifications(instance.pk)
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline_on_follow(sender, instance, created, **kwargs):
+    if created:
+        backfill_organizer(instance.follower_id, instance.followed_id)
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline_on_unfollow(sender, instance, **kwargs):
+    prune_organizer(instance.follower_id, instance.followed_id)
+
+@receiver(post_save, sender=Follow)
+def join_followers_group_on_follow(sender, instance, created, **kwargs):
+    if created:
+        update_follower_groups(instance.follower_id, instance.followed_id, following=True)
+
+@receiver(post_delete, sender=Follow)
+def leave_followers_group_on_unfollow(sender, instance, **kwargs):
+    update_follower_groups(instance.follower_id, instance.followed_id, following=False)
+
+@receiver([post_save, post_delete], sender=Follow)
+def recommend_on_follow_change(sender, instance, **kwargs):
+    schedule_recommendations(instance.follower_id)
+
+@receiver(post_save, sender=Profile)
+def recommend_on_interests_change(sender, instance, **kwargs):
+    schedule_recommendations(instance.user_id)
+
+
+def invalidate_on_commit(event_ids):
+    event_ids = list(event_ids)
+    transaction.on_commit(lambda: invalidate_events(event_ids))
+
+@receiver([post_save, post_delete], sender=Event)
+def invalidate_event(sender, instance, **kwargs):
+    invalidate_on_commit([instance.pk])
+
+@receiver([post_save, post_delete], sender=Rating)
+@receiver([post_save, post_delete], sender=Bookmark)
+@receiver([post_save, post_delete], sender=Ticket)
+def invalidate_event_of_related(sender, instance, **kwargs):
+    invalidate_on_commit([instance.event_id])
+
+@receiver([post_save, post_delete], sender=UserTicket)
+def invalidate_event_of_user_ticket(sender, instance, **kwargs):
+    event_id = Ticket.objects.filter(id=instance.ticket_id).values_list('event_id', flat=True).first()
+    invalidate_on_commit([event_id])
+
+@receiver(m2m_changed, sender=Event.likes.through)
+@receiver(m2m_changed, sender=Event.hashtags.through)
+@receiver(m2m_changed, sender=Event.category.through)
+def invalidate_event_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_on_commit([instance.pk])
+    elif action == 'pre_clear':
+        field = next(f.name for f in sender._meta.fields if f.related_model is type(instance))
+        invalidate_on_commit(sender.objects.filter(**{field: instance}).values_list('event_id', flat=True))
+    else:
+        invalidate_on_commit(pk_set)
+
+@receiver(post_save, sender=Hashtag)
+def invalidate_events_of_hashtag(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_on_commit(instance.events.values_list('id', flat=True))
+
+@receiver(post_save, sender=OrganizationProfile)
+@receiver(post_save, sender=CustomUser)
+def invalidate_events_of_organizer(sender, instance, **kwargs):
+    if sender is CustomUser and instance.role != 'organization':
+        return
+    user_id = instance.user_id if sender is OrganizationProfile else instance.pk
+    invalidate_on_commit(Event.objects.filter(organizer_id=user_id).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Event)
+def update_event_search_vector(sender, instance, **kwargs):
+    update_search_vectors([instance.pk])
+
+@receiver(m2m_changed, sender=Event.hashtags.through)
+@receiver(m2m_changed, sender=Event.category.through)
+def update_search_vector_of_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            update_search_vectors([instance.pk])
+    elif action == 'pre_clear':
+        # The rows are gone by post_clear, so remember which events to update.
+        field = next(f.name for f in sender._meta.fields if f.related_model is type(instance))
+        instance._search_event_ids = list(sender.objects.filter(**{field: instance}).values_list('event_id', flat=True))
+    elif action == 'post_clear':
+        update_search_vectors(getattr(instance, '_search_event_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        update_search_vectors(pk_set)
+
+@receiver(post_save, sender=Hashtag)
+@receiver(post_save, sender=Category)
+def update_search_vector_of_renamed(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vectors(instance.events.values_list('id', flat=True))
+
+@receiver(pre_delete, sender=Hashtag)
+@receiver(pre_delete, sender=Category)
+def collect_events_of_deleted(sender, instance, **kwargs):
+    instance._search_event_ids = list(instance.events.values_list('id', flat=True))
+
+@receiver(post_delete, sender=Hashtag)
+@receiver(post_delete, sender=Category)
+def update_search_vector_of_deleted(sender, instance, **kwargs):
+    update_search_vectors(getattr(instance, '_search_event_ids', []))
+
+
+@receiver(post_save, sender=Event)
+def suggest_event(sender, instance, **kwargs):
+    if instance.is_public:
+        transaction.on_commit(lambda: suggestion_index.upsert('events', instance.pk, instance.title))
+    else:
+        transaction.on_commit(lambda: suggestion_index.remove('events', instance.pk))
+
+@receiver(post_save, sender=Hashtag)
+def suggest_hashtag(sender, instance, **kwargs):
+    transaction.on_commit(lambda: suggestion_index.upsert('hashtags', instance.pk, instance.name))
+
+@receiver(post_save, sender=Category)
+def suggest_category(sender, instance, **kwargs):
+    transaction.on_commit(lambda: suggestion_index.upsert('categories', normalize(instance.name), instance.name))
+
+@receiver(post_save, sender=OrganizationProfile)
+def suggest_organizer(sender, instance, **kwargs):
+    transaction.on_commit(lambda: suggestion_index.upsert('organizers', instance.user_id, instance.name))
+
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Hashtag)
+@receiver(post_delete, sender=OrganizationProfile)
+def unsuggest(sender, instance, **kwargs):
+    kind, ref = {
+        Event: ('events', instance.pk),
+        Hashtag: ('hashtags', instance.pk),
+        OrganizationProfile: ('organizers', getattr(instance, 'user_id', None)),
+    }[sender]
+    transaction.on_commit(lambda: suggestion_index.remove(kind, ref))
+
+@receiver(post_delete, sender=Category)
+def unsuggest_category(sender, instance, **kwargs):
+    # Categories are suggested by name, which other organizers may still use.
+    if not Category.objects.filter(name__iexact=instance.name).exists():
+        transaction.on_commit(lambda: suggestion_index.remove('categories', normalize(instance.name)))
+
+
+@receiver(post_save, sender=Event)
+def index_event_location(sender, instance, **kwargs):
+    located = instance.latitude is not None and instance.longitude is not None
+    if instance.is_public and located and instance.end_date >= timezone.now():
+        transaction.on_commit(lambda: spatial_index.upsert(
+            instance.pk, instance.latitude, instance.longitude, instance.end_date
+        ))
+    else:
+        transaction.on_commit(lambda: spatial_index.remove(instance.pk))
+
+@receiver(post_delete, sender=Event)
+def unindex_event_location(sender, instance, **kwargs):
+    event_id = instance.pk
+    transaction.on_commit(lambda: spatial_index.remove(event_id))
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def outdate_map_cells(sender, instance, **kwargs):
+    if instance.latitude is not None and instance.longitude is not None:
+        transaction.on_commit(mark_map_cells_dirty)
+
+
+@receiver(post_delete, sender=Rating)
+@receiver(post_delete, sender=Bookmark)
+def outdate_neighbors_of_removed(sender, instance, **kwargs):
+    mark_neighbors_stale([instance.event_id])
+
+@receiver(post_save, sender=Rating)
+def outdate_neighbors_of_rerated(sender, instance, created, **kwargs):
+    # A changed value changes the rating's weight, which its id does not reveal.
+    if not created:
+        mark_neighbors_stale([instance.event_id])
+
+@receiver(post_delete, sender=UserTicket)
+def outdate_neighbors_of_refunded(sender, instance, **kwargs):
+    mark_neighbors_stale(Ticket.objects.filter(id=instance.ticket_id).values_list('event_id', flat=True))
+
+@receiver(m2m_changed, sender=Event.likes.through)
+def outdate_neighbors_of_unliked(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        mark_neighbors_stale([instance.pk])
+    elif action == 'pre_clear':
+        mark_neighbors_stale(sender.objects.filter(customuser=instance).values_list('event_id', flat=True))
+    else:
+        mark_neighbors_stale(pk_set)
@@ -0,0 +1,176 @@
+import logging
+import numpy as np
+from scipy import sparse
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max, Value
+from django.utils import timezone
+from apps.event.models import Event, EventNeighbors, Bookmark, Rating, UserTicket
+
+logger = logging.getLogger('django')
+
+# Neighbors kept per event.
+NEIGHBOR_COUNT = 20
+# Implicit feedback of one user on one event; several kinds add up.
+PURCHASE_WEIGHT = 3.0
+BOOKMARK_WEIGHT = 2.0
+LIKE_WEIGHT = 1.0
+# A rating counts in proportion to its value, up to RATING_WEIGHT for 5 stars;
+# ratings below RATING_MIN_VALUE are not a sign of shared taste and are left out.
+RATING_WEIGHT = 1.0
+RATING_MIN_VALUE = 3.0
+# Events whose neighbors are computed in one product.
+SIMILARITY_CHUNK_SIZE = 1000
+# Highest interaction id of each source seen by the last refresh, or the
+# latest update time for ratings, whose value can change.
+WATERMARK_KEY = 'event:similarity:watermark:v2'
+
+
+def _sources():
+  """(name, queryset, user field, event field, weight expression, watermark field) of every kind of interaction."""
+  return [
+    ('tickets', UserTicket.objects.filter(user__isnull=False), 'user_id', 'ticket__event_id', Value(PURCHASE_WEIGHT), 'id'),
+    ('bookmarks', Bookmark.objects.all(), 'user_id', 'event_id', Value(BOOKMARK_WEIGHT), 'id'),
+    ('likes', Event.likes.through.objects.all(), 'customuser_id', 'event_id', Value(LIKE_WEIGHT), 'id'),
+    (
+      'ratings', Rating.objects.filter(value__gte=RATING_MIN_VALUE), 'user_id', 'event_id',
+      F('value') * (RATING_WEIGHT / 5), 'updated_at',
+    ),
+  ]
+
+
+def interactions(since=None, until=None):
+  """
+  (user id, event id, weight) arrays of the interactions up to the `until`
+  watermark (the latest by default), or of those after the `since` one, and
+  the watermark they end at.
+  """
+  users, events, weights, watermark = [], [], [], {}
+  for name, queryset, user_field, event_field, weight, field in _sources():
+    watermark[name] = until[name] if until else queryset.aggregate(last=Max(field))['last']
+    if watermark[name] is None:
+      queryset = queryset.none()
+    else:
+      queryset = queryset.filter(**{f'{field}__lte': watermark[name]})
+    if since is not None and since.get(name) is not None:
+      queryset = queryset.filter(**{f'{field}__gt': since[name]})
+    rows = list(queryset.annotate(weight=weight).values_list(user_field, event_field, 'weight'))
+    users.append(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+    events.append(np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows)))
+    weights.append(np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows)))
+  return np.concatenate(users), np.concatenate(events), np.concatenate(weights), watermark
+
+
+def refresh_similar_events(full=False):
+  """
+  Recompute EventNeighbors from tickets, bookmarks, likes and ratings.
+
+  The similarity of two events is the cosine of their columns in the
+  user-event interaction matrix, so events shared by the same users score
+  high. Neighbors are limited to upcoming public events; any event, past
+  ones included, gets neighbors.
+
+  Unless `full`, or no previous run is recorded, only some lists are
+  written again: those of the events of users with interactions since the
+  last run, of the events marked stale because an interaction with them was
+  removed or a rating changed (see `mark_neighbors_stale`), and of the
+  events listing a stale one. Other events keep their lists until the next
+  full run, although the norms of their neighbors may have moved slightly.
+  Only the write set is incremental: every run still loads all interactions
+  and builds the whole matrix and its norms. Returns the number of events
+  recomputed.
+  """
+  since = None if full else _cache_call('get', WATERMARK_KEY)
+  stale_ids = _take_stale_event_ids()
+  user_ids, event_ids, weights, watermark = interactions()
+  if not len(event_ids):
+    if since is None:
+      EventNeighbors.objects.all().delete()
+    else:
+      EventNeighbors.objects.filter(event_id__in=stale_ids).delete()
+    _cache_call('set', WATERMARK_KEY, watermark, timeout=None)
+    return 0
+
+  users, user_rows = np.unique(user_ids, return_inverse=True)
+  events, event_columns = np.unique(event_ids, return_inverse=True)
+  matrix = sparse.csr_matrix((weights, (user_rows, event_columns)), shape=(len(users), len(events)))
+  norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+  normalized = (matrix @ sparse.diags(1 / norms)).tocsc()
+
+  candidates = np.isin(
+    events,
+    list(Event.objects.filter(id__in=events.tolist(), is_public=True, end_date__gte=timezone.now()).values_list('id', flat=True)),
+  )
+  candidate_columns = np.flatnonzero(candidates)
+  neighbors = normalized[:, candidate_columns].tocsr()
+
+  if since is None:
+    sources = np.arange(len(events))
+  else:
+    new_users, _, _, _ = interactions(since, watermark)
+    touched = np.flatnonzero(np.isin(users, new_users))
+    listing = EventNeighbors.objects.filter(neighbor_ids__overlap=stale_ids).values_list('event_id', flat=True)
+    outdated = np.union1d(stale_ids, list(listing)) if stale_ids else np.empty(0, dtype=np.int64)
+    sources = np.union1d(matrix[touched].indices, np.flatnonzero(np.isin(events, outdated)))
+
+  rows = []
+  for start in range(0, len(sources), SIMILARITY_CHUNK_SIZE):
+    chunk = sources[start:start + SIMILARITY_CHUNK_SIZE]
+    similarity = (normalized[:, chunk].T @ neighbors).tocsr()
+    for row, column in enumerate(chunk):
+      begin, end = similarity.indptr[row], similarity.indptr[row + 1]
+      found, scores = candidate_columns[similarity.indices[begin:end]], similarity.data[begin:end]
+      keep = found != column
+      found, scores = found[keep], scores[keep]
+      if len(scores) > NEIGHBOR_COUNT:
+        top = np.argpartition(-scores, NEIGHBOR_COUNT - 1)[:NEIGHBOR_COUNT]
+        found, scores = found[top], scores[top]
+      order = np.lexsort((-events[found], -scores))
+      rows.append(EventNeighbors(
+        event_id=int(events[column]),
+        neighbor_ids=events[found[order]].tolist(),
+        scores=np.round(scores[order], 6).tolist(),
+      ))
+
+  with transaction.atomic():
+    if since is None:
+      EventNeighbors.objects.exclude(event_id__in=events.tolist()).delete()
+    else:
+      # Stale events left without any interaction have no neighbors any more.
+      EventNeighbors.objects.filter(event_id__in=np.setdiff1d(stale_ids, events).tolist()).delete()
+    EventNeighbors.objects.bulk_create(
+      rows, batch_size=1000,
+      update_conflicts=True, unique_fields=['event'], update_fields=['neighbor_ids', 'scores', 'updated_at'],
+    )
+  _cache_call('set', WATERMARK_KEY, watermark, timeout=None)
+  return len(rows)
+
+
+def mark_neighbors_stale(event_ids):
+  """
+  Have the next incremental refresh recompute the neighbors of `event_ids`,
+  and the lists they appear in, after interactions with them were removed or
+  changed; new interactions are found by their ids instead.
+  """
+  EventNeighbors.objects.filter(event_id__in=list(event_ids), stale=False).update(stale=True)
+
+
+def _take_stale_event_ids():
+  """The events marked stale, unmarked at once so that marks set while the refresh runs are kept for the next one."""
+  with transaction.atomic():
+    stale_ids = list(EventNeighbors.objects.select_for_update().filter(stale=True).values_list('event_id', flat=True))
+    EventNeighbors.objects.filter(event_id__in=stale_ids).update(stale=False)
+  return stale_ids
+
+
+def similar_event_ids(event_id):
+  """The neighbor ids of an event, most similar first."""
+  return EventNeighbors.objects.filter(event_id=event_id).values_list('neighbor_ids', flat=True).first() or []
+
+
+def _cache_call(method, *args, **kwargs):
+  try:
+    return getattr(cache, method)(*args, **kwargs)
+  except Exception as e:
+    logger.warning(f"Event similarity cache unavailable: {e}")
+    return None
@@ -0,0 +1,218 @@
+import logging
+import math
+import threading
+import time
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from apps.event.geo import EARTH_RADIUS_KM, bounding_box
+from apps.event.models import Event
+
+logger = logging.getLogger('django')
+
+# Grid cells span this many degrees of latitude and longitude (~11 km at the equator).
+CELL_DEGREES = 0.1
+# k-nearest lookups widen their radius up to this before giving up.
+MAX_NEAREST_RADIUS_KM = 1000
+# `rebuild_spatial_index` sets this key; processes check it at most every
+# REBUILD_CHECK_INTERVAL seconds and rebuild when it is newer than their index.
+REBUILD_REQUEST_KEY = 'spatial_index:rebuild_requested_at'
+REBUILD_CHECK_INTERVAL = 5
+
+
+def cell_of(lat, lng):
+  return (math.floor(lat / CELL_DEGREES), math.floor(lng / CELL_DEGREES))
+
+
+def haversine_km(lat, lng, lats, lngs):
+  """Great-circle distances from (lat, lng) to arrays of points, all in radians."""
+  a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+  return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _empty_cell():
+  return (np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0))
+
+
+class SpatialIndex:
+  """
+  Per-process grid of the coordinates of upcoming public events.
+
+  Events are bucketed into CELL_DEGREES cells, each holding NumPy arrays of
+  ids, latitudes and longitudes (radians) and end times. A lookup gathers the
+  cells overlapping the bounding box of the radius and filters them with
+  vectorized distance math, without a database round trip. Updates replace a
+  cell's arrays instead of changing them, so lookups can read them outside of
+  the lock. Signals of the writing process apply changes incrementally; every
+  process also rebuilds from the database in a background thread once its
+  index is SPATIAL_INDEX_REFRESH_INTERVAL seconds old, or when a rebuild was
+  requested with the `rebuild_spatial_index` command.
+  """
+
+  def __init__(self):
+    self._lock = threading.RLock()
+    self._cells = None
+    self._where = {}
+    self._built_at = 0.0
+    self._updates = 0
+    self._checked_at = 0.0
+    self._rebuild_requested = False
+    self._rebuilding = False
+
+  def reset(self):
+    """Drop the index; the next lookup rebuilds it."""
+    with self._lock:
+      self._cells = None
+      self._where = {}
+
+  def within(self, lat, lng, radius, limit=None):
+    """Ids and distances (km) of events within `radius` km of (lat, lng), nearest first."""
+    self._ensure_fresh()
+    with self._lock:
+      cells = self._cells_in(bounding_box(lat, lng, radius))
+    if not cells:
+      return [], []
+
+    ids, lats, lngs, ends = (np.concatenate(arrays) for arrays in zip(*cells))
+    distances = haversine_km(math.radians(lat), math.radians(lng), lats, lngs)
+    matches = np.flatnonzero((distances <= radius) & (ends >= time.time()))
+    if limit is not None and len(matches) > limit:
+      matches = matches[np.argpartition(distances[matches], limit - 1)[:limit]]
+    matches = matches[np.lexsort((ids[matches], distances[matches]))]
+    return ids[matches].tolist(), distances[matches].tolist()
+
+  def nearest(self, lat, lng, k):
+    """Ids and distances (km) of the `k` events nearest to (lat, lng), nearest first."""
+    radius = CELL_DEGREES * 111
+    while True:
+      ids, distances = self.within(lat, lng, radius, limit=k)
+      if len(ids) >= k or radius >= MAX_NEAREST_RADIUS_KM:
+        return ids, distances
+      radius = min(radius * 2, MAX_NEAREST_RADIUS_KM)
+
+  def _cells_in(self, boxes):
+    keys = set()
+    for west, south, east, north in boxes:
+      (low_row, low_col), (high_row, high_col) = cell_of(south, west), cell_of(north, east)
+      if (high_row - low_row + 1) * (high_col - low_col + 1) > len(self._cells):
+        keys.update(
+          (row, col) for row, col in self._cells
+          if low_row <= row <= high_row and low_col <= col <= high_col
+        )
+      else:
+        keys.update((row, col) for row in range(low_row, high_row + 1) for col in range(low_col, high_col + 1))
+    return [self._cells[key] for key in keys if key in self._cells]
+
+  def upsert(self, event_id, latitude, longitude, end_date):
+    with self._lock:
+      if self._cells is None:
+        return
+      self._remove(event_id)
+      key = cell_of(latitude, longitude)
+      ids, lats, lngs, ends = self._cells.get(key, _empty_cell())
+      self._cells[key] = (
+        np.append(ids, event_id),
+        np.append(lats, math.radians(latitude)),
+        np.append(lngs, math.radians(longitude)),
+        np.append(ends, end_date.timestamp()),
+      )
+      self._where[event_id] = key
+      self._updates += 1
+
+  def remove(self, event_id):
+    with self._lock:
+      if self._cells is None:
+        return
+      if self._remove(event_id):
+        self._updates += 1
+
+  def _remove(self, event_id):
+    key = self._where.pop(event_id, None)
+    if key is None:
+      return False
+    keep = self._cells[key][0] != event_id
+    if keep.any():
+      self._cells[key] = tuple(array[keep] for array in self._cells[key])
+    else:
+      del self._cells[key]
+    return True
+
+  def stats(self):
+    """Size and staleness of this process's index."""
+    with self._lock:
+      built = self._cells is not None
+      return {
+        'events': len(self._where),
+        'cells': len(self._cells) if built else 0,
+        'age_seconds': round(time.time() - self._built_at, 1) if built else None,
+        'updates_since_build': self._updates,
+        'rebuild_requested': self._rebuild_requested,
+      }
+
+  def _ensure_fresh(self):
+    if self._cells is None:
+      self.rebuild()
+      return
+    now = time.time()
+    if now - self._checked_at > REBUILD_CHECK_INTERVAL:
+      self._checked_at = now
+      try:
+        requested_at = cache.get(REBUILD_REQUEST_KEY)
+      except Exception as e:
+        logger.warning(f"Spatial index rebuild requests unavailable: {e}")
+        requested_at = None
+      self._rebuild_requested = requested_at is not None and requested_at > self._built_at
+    stale = now - self._built_at > settings.SPATIAL_INDEX_REFRESH_INTERVAL
+    if (stale or self._rebuild_requested) and not self._rebuilding:
+      self._rebuilding = True
+      threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+  def _rebuild_in_background(self):
+    from django.db import connection
+    try:
+      self.rebuild()
+    except Exception as e:
+      logger.error(f"Failed to rebuild spatial index: {e}")
+    finally:
+      self._rebuilding = False
+      connection.close()
+
+  def rebuild(self):
+    """Load the upcoming public events from the database and swap in a fresh index."""
+    built_at = time.time()
+    rows = list(
+      Event.objects.filter(
+        is_public=True, end_date__gte=timezone.now(), latitude__isnull=False, longitude__isnull=False
+      ).values_list('id', 'latitude', 'longitude', 'end_date')
+    )
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    lats = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    lngs = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+    ends = np.fromiter((row[3].timestamp() for row in rows), dtype=np.float64, count=len(rows))
+
+    cell_rows = np.floor(lats / CELL_DEGREES).astype(np.int64)
+    cell_cols = np.floor(lngs / CELL_DEGREES).astype(np.int64)
+    order = np.lexsort((cell_cols, cell_rows))
+    ids, lats, lngs, ends = ids[order], np.radians(lats[order]), np.radians(lngs[order]), ends[order]
+    cell_rows, cell_cols = cell_rows[order], cell_cols[order]
+    starts = np.flatnonzero(np.r_[True, (cell_rows[1:] != cell_rows[:-1]) | (cell_cols[1:] != cell_cols[:-1])][:len(ids)])
+    bounds = np.r_[starts, len(ids)]
+
+    cells = {}
+    where = {}
+    for start, end in zip(bounds[:-1], bounds[1:]):
+      key = (int(cell_rows[start]), int(cell_cols[start]))
+      cells[key] = (ids[start:end].copy(), lats[start:end].copy(), lngs[start:end].copy(), ends[start:end].copy())
+      where.update(dict.fromkeys(ids[start:end].tolist(), key))
+
+    with self._lock:
+      self._cells = cells
+      self._where = where
+      self._built_at = built_at
+      self._updates = 0
+      self._rebuild_requested = False
+    return len(where)
+
+
+spatial_index = SpatialIndex()
@@ -0,0 +1,217 @@
+from decimal import Decimal
+from django.db.models import Avg, Count, Sum, F, FloatField, DecimalField, ExpressionWrapper, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Extract, Greatest, Ln, NullIf, Power
+from django.utils import timezone
+from apps.event.models import Event, EventStats, Bookmark, Rating, UserTicket
+from apps.payment.models import PaymentItem
+
+REBUILD_CHUNK_SIZE = 1000
+
+# Ratings are smoothed towards PRIOR_MEAN as if every event had PRIOR_WEIGHT
+# extra ratings of that value, so one 5-star rating does not top the list.
+POPULARITY_PRIOR_MEAN = 3.0
+POPULARITY_PRIOR_WEIGHT = 5
+POPULARITY_LIKES_WEIGHT = 1.0
+POPULARITY_BOOKMARKS_WEIGHT = 0.5
+POPULARITY_TICKETS_WEIGHT = 1.5
+# Events lose half their score for every this many days since they started.
+POPULARITY_HALF_LIFE_DAYS = 14
+
+
+def popularity_expression(like_count=None, bookmark_count=None, rating_count=None, rating_sum=None, ticket_count=None):
+  """
+  The popularity score of an EventStats row as a database expression: a
+  Bayesian-smoothed rating plus log-scaled likes, bookmarks and ticket sales,
+  decayed by the time since the event started.
+
+  Column values default to the row's own; pass expressions to score the row
+  as it will be after an UPDATE that changes them.
+  """
+  like_count = F('like_count') if like_count is None else like_count
+  bookmark_count = F('bookmark_count') if bookmark_count is None else bookmark_count
+  rating_count = F('rating_count') if rating_count is None else rating_count
+  rating_sum = F('rating_sum') if rating_sum is None else rating_sum
+  ticket_count = F('ticket_count') if ticket_count is None else ticket_count
+
+  rating = (
+    (rating_sum + POPULARITY_PRIOR_WEIGHT * POPULARITY_PRIOR_MEAN)
+    / (rating_count + float(POPULARITY_PRIOR_WEIGHT))
+  )
+  engagement = (
+    rating / 5
+    + POPULARITY_LIKES_WEIGHT * Ln(like_count + 1.0)
+    + POPULARITY_BOOKMARKS_WEIGHT * Ln(bookmark_count + 1.0)
+    + POPULARITY_TICKETS_WEIGHT * Ln(ticket_count + 1.0)
+  )
+  start_date = Subquery(Event.objects.filter(pk=OuterRef('event_id')).values('start_date'))
+  days_since_start = Greatest(
+    (Value(timezone.now().timestamp()) - Extract(start_date, 'epoch')) / 86400.0,
+    Value(0.0)
+  )
+  decay = Power(Value(0.5), days_since_start / float(POPULARITY_HALF_LIFE_DAYS))
+  return ExpressionWrapper(engagement * decay, output_field=FloatField())
+
+
+def refresh_popularity(event_ids=None):
+  """
+  Recompute the popularity of the given events, or of all of them in id
+  ranges, so that recency decay keeps up with time. Returns the rows updated.
+  """
+  if event_ids is not None:
+    return EventStats.objects.filter(event_id__in=event_ids).update(popularity=popularity_expression())
+
+  updated = 0
+  last_id = 0
+  while True:
+    ids = list(
+      EventStats.objects.filter(event_id__gt=last_id).order_by('event_id')
+      .values_list('event_id', flat=True)[:REBUILD_CHUNK_SIZE]
+    )
+    if not ids:
+      return updated
+    updated += EventStats.objects.filter(event_id__gte=ids[0], event_id__lte=ids[-1]).update(
+      popularity=popularity_expression()
+    )
+    last_id = ids[-1]
+
+
+def order_by_popularity(queryset):
+  """
+  Order events by popularity, most popular first. Events without an
+  EventStats row rank last rather than being left out; the score is
+  annotated as `popularity` so that keyset pages can sort on it.
+  """
+  return queryset.annotate(popularity=Coalesce(F('stats__popularity'), Value(-1.0))).order_by('-popularity', '-pk')
+
+
+def lock_event(event_id):
+  """
+  Lock an event's row until the end of the transaction, so that concurrent
+  toggles of the same like or bookmark see each other's writes and every
+  counter delta matches a row actually added or removed.
+  """
+  list(Event.objects.select_for_update().filter(pk=event_id).values_list('pk', flat=True))
+
+
+def update_event_stats(event_id, likes=0, bookmarks=0, ratings=0, rating_sum=0.0, attendees=0, tickets=0, revenue=0):
+  """
+  Apply counter deltas to the EventStats row of an event, and rescore it,
+  with a single UPDATE. A missing row is rebuilt from the source tables instead.
+  """
+  updates = {}
+  if likes:
+    updates['like_count'] = F('like_count') + likes
+  if bookmarks:
+    updates['bookmark_count'] = F('bookmark_count') + bookmarks
+  if ratings or rating_sum:
+    updates['rating_count'] = F('rating_count') + ratings
+    updates['rating_sum'] = F('rating_sum') + rating_sum
+    updates['rating_average'] = ExpressionWrapper(
+      (F('rating_sum') + rating_sum) / NullIf(F('rating_count') + ratings, 0),
+      output_field=FloatField()
+    )
+  if attendees:
+    updates['attendee_count'] = F('attendee_count') + attendees
+  if tickets:
+    updates['ticket_count'] = F('ticket_count') + tickets
+  if revenue:
+    updates['revenue'] = F('revenue') + revenue
+  if not updates:
+    return
+  if likes or bookmarks or ratings or rating_sum or tickets:
+    updates['popularity'] = popularity_expression(
+      like_count=updates.get('like_count'),
+      bookmark_count=updates.get('bookmark_count'),
+      rating_count=updates.get('rating_count'),
+      rating_sum=updates.get('rating_sum'),
+      ticket_count=updates.get('ticket_count'),
+    )
+
+  if not EventStats.objects.filter(event_id=event_id).update(**updates):
+    rebuild_event_stats([event_id])
+
+
+def update_revenue_stats(payment):
+  """Add the items of a successful payment to the ticket sales and revenue of their events."""
+  rows = (
+    payment.items.values('ticket__event_id')
+    .annotate(
+      tickets=Sum('quantity'),
+      total=Sum(
+        ExpressionWrapper(F('unit_price') * F('quantity'), output_field=DecimalField())
+      )
+    )
+    .order_by()
+  )
+  for row in rows:
+    update_event_stats(row['ticket__event_id'], tickets=row['tickets'] or 0, revenue=row['total'] or 0)
+
+
+def _grouped(queryset, key, **aggregates):
+  rows = queryset.values(key).annotate(**aggregates).order_by()
+  return {row[key]: row for row in rows}
+
+
+def rebuild_event_stats(event_ids=None):
+  """
+  Recompute EventStats from the source tables, for the given events or for all
+  of them. Returns the number of rows written.
+  """
+  if event_ids is None:
+    event_ids = Event.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=REBUILD_CHUNK_SIZE)
+
+  written = 0
+  chunk = []
+  for event_id in event_ids:
+    chunk.append(event_id)
+    if len(chunk) >= REBUILD_CHUNK_SIZE:
+      written += _rebuild_chunk(chunk)
+      chunk = []
+  if chunk:
+    written += _rebuild_chunk(chunk)
+  return written
+
+
+def _rebuild_chunk(event_ids):
+  likes = _grouped(Event.likes.through.objects.filter(event_id__in=event_ids), 'event_id', count=Count('id'))
+  bookmarks = _grouped(Bookmark.objects.filter(event_id__in=event_ids), 'event_id', count=Count('id'))
+  ratings = _grouped(
+    Rating.objects.filter(event_id__in=event_ids), 'event_id',
+    count=Count('id'), total=Sum('value'), average=Avg('value')
+  )
+  attendees = _grouped(
+    UserTicket.objects.filter(ticket__event_id__in=event_ids, used=True), 'ticket__event_id',
+    count=Count('id')
+  )
+  tickets = _grouped(UserTicket.objects.filter(ticket__event_id__in=event_ids), 'ticket__event_id', count=Count('id'))
+  revenue = _grouped(
+    PaymentItem.objects.filter(ticket__event_id__in=event_ids, payment__status='success'), 'ticket__event_id',
+    total=Sum(ExpressionWrapper(F('unit_price') * F('quantity'), output_field=DecimalField()))
+  )
+
+  rows = []
+  for event_id in Event.objects.filter(id__in=event_ids).values_list('id', flat=True):
+    rating = ratings.get(event_id, {})
+    rows.append(EventStats(
+      event_id=event_id,
+      like_count=likes.get(event_id, {}).get('count', 0),
+      bookmark_count=bookmarks.get(event_id, {}).get('count', 0),
+      rating_count=rating.get('count', 0),
+      rating_sum=rating.get('total') or 0,
+      rating_average=rating.get('average'),
+      attendee_count=attendees.get(event_id, {}).get('count', 0),
+      ticket_count=tickets.get(event_id, {}).get('count', 0),
+      revenue=revenue.get(event_id, {}).get('total') or Decimal('0'),
+    ))
+
+  EventStats.objects.bulk_create(
+    rows,
+    update_conflicts=True,
+    unique_fields=['event'],
+    update_fields=[
+      'like_count', 'bookmark_count', 'rating_count', 'rating_sum',
+      'rating_average', 'attendee_count', 'ticket_count', 'revenue', 'updated_at',
+    ],
+  )
+  refresh_popularity(event_ids)
+  return len(rows)
@@ -0,0 +1,195 @@
+import heapq
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from django.conf import settings
+from django.db.models import Count
+from apps.event.models import Event, Category, Hashtag
+from apps.user.models import OrganizationProfile
+
+logger = logging.getLogger('django')
+
+KINDS = ('hashtags', 'categories', 'events', 'organizers')
+MAX_LIMIT = 20
+# Prefixes matching more index keys than this get their top suggestions
+# memoized, so that short prefixes are not re-ranked on every keystroke.
+MEMO_MIN_RANGE = 200
+MEMO_MAX_SIZE = 10000
+# Prefixes up to this length are ranked when the index is built.
+WARM_PREFIX_LENGTH = 3
+
+
+def normalize(text):
+  return ' '.join(re.findall(r'\w+', (text or '').lower()))
+
+
+def index_keys(label):
+  """Every word-start suffix of a label, so "jazz night" is found by "nig" too."""
+  words = normalize(label).split()
+  return {' '.join(words[i:]) for i in range(len(words))}
+
+
+def _rank(items, entries, prefix):
+  """The MAX_LIMIT most popular ids with a key starting with `prefix`, and how many keys matched."""
+  start = bisect_left(items, (prefix,))
+  end = bisect_left(items, (prefix + '\uffff',), start)
+  refs = {ref for key, ref in items[start:end]}
+  top = heapq.nlargest(MAX_LIMIT, refs, key=lambda ref: (entries[ref][1], -len(entries[ref][0])))
+  return top, end - start
+
+
+class SuggestionIndex:
+  """
+  Per-process prefix index of hashtag, category, event and organizer names.
+
+  Each kind is a sorted list of (key, id) tuples; a lookup bisects to the
+  range of keys starting with the prefix and ranks it by popularity, without
+  a database round trip. The top suggestions of broad prefixes are memoized
+  until a name under them changes. Signals of the writing process apply
+  changes incrementally; every process also rebuilds from the database in a
+  background thread once its index is SUGGEST_REFRESH_INTERVAL seconds old,
+  which picks up changes made by other processes.
+  """
+
+  def __init__(self):
+    self._lock = threading.RLock()
+    self._items = None
+    self._entries = {}
+    self._memo = {}
+    self._built_at = 0.0
+    self._rebuilding = False
+
+  def reset(self):
+    """Drop the index; the next lookup rebuilds it."""
+    with self._lock:
+      self._items = None
+      self._entries = {}
+      self._memo = {}
+
+  def lookup(self, prefix, limit=5):
+    prefix = normalize(prefix)
+    limit = min(limit, MAX_LIMIT)
+    if not prefix:
+      return {kind: [] for kind in KINDS}
+    self._ensure_fresh()
+
+    with self._lock:
+      return {
+        kind: [self._format(kind, ref) for ref in self._top(kind, prefix)[:limit]]
+        for kind in KINDS
+      }
+
+  def _top(self, kind, prefix):
+    memo = self._memo.get((kind, prefix))
+    if memo is not None:
+      return memo
+
+    top, size = _rank(self._items[kind], self._entries[kind], prefix)
+    if size > MEMO_MIN_RANGE:
+      if len(self._memo) >= MEMO_MAX_SIZE:
+        self._memo.clear()
+      self._memo[(kind, prefix)] = top
+    return top
+
+  def _format(self, kind, ref):
+    label = self._entries[kind][ref][0]
+    if kind == 'events':
+      return {'id': ref, 'title': label}
+    if kind == 'organizers':
+      return {'id': ref, 'name': label}
+    return label
+
+  def upsert(self, kind, ref, label, score=None):
+    with self._lock:
+      if self._items is None:
+        return
+      old = self._entries[kind].get(ref)
+      if old is not None:
+        self._remove_keys(kind, ref, old[0])
+        if score is None:
+          score = old[1]
+      self._entries[kind][ref] = (label, score or 0)
+      keys = index_keys(label)
+      for key in keys:
+        insort(self._items[kind], (key, ref))
+      self._forget(kind, keys)
+
+  def remove(self, kind, ref):
+    with self._lock:
+      if self._items is None:
+        return
+      old = self._entries[kind].pop(ref, None)
+      if old is not None:
+        self._remove_keys(kind, ref, old[0])
+
+  def _remove_keys(self, kind, ref, label):
+    items = self._items[kind]
+    keys = index_keys(label)
+    for key in keys:
+      i = bisect_left(items, (key, ref))
+      if i < len(items) and items[i] == (key, ref):
+        del items[i]
+    self._forget(kind, keys)
+
+  def _forget(self, kind, keys):
+    """Drop memoized results of prefixes of the given keys."""
+    stale = [
+      memo_key for memo_key in self._memo
+      if memo_key[0] == kind and any(key.startswith(memo_key[1]) for key in keys)
+    ]
+    for memo_key in stale:
+      del self._memo[memo_key]
+
+  def _ensure_fresh(self):
+    if self._items is None:
+      self.rebuild()
+    elif time.monotonic() - self._built_at > settings.SUGGEST_REFRESH_INTERVAL and not self._rebuilding:
+      self._rebuilding = True
+      threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+  def _rebuild_in_background(self):
+    from django.db import connection
+    try:
+      self.rebuild()
+    except Exception as e:
+      logger.error(f"Failed to rebuild suggestion index: {e}")
+    finally:
+      self._rebuilding = False
+      connection.close()
+
+  def rebuild(self):
+    """Load every name from the database and swap in a fresh index."""
+    entries = {kind: {} for kind in KINDS}
+    for ref, name, count in Hashtag.objects.annotate(count=Count('events')).values_list('id', 'name', 'count'):
+      entries['hashtags'][ref] = (name, count)
+    for row in Category.objects.values('name').annotate(count=Count('events')).order_by():
+      ref = normalize(row['name'])
+      label, count = entries['categories'].get(ref, (row['name'], 0))
+      entries['categories'][ref] = (label, count + row['count'])
+    for ref, title, likes in Event.objects.filter(is_public=True).values_list('id', 'title', 'stats__like_count'):
+      entries['events'][ref] = (title, likes or 0)
+    organizers = OrganizationProfile.objects.annotate(count=Count('user__followers')).values_list('user_id', 'name', 'count')
+    for ref, name, count in organizers:
+      entries['organizers'][ref] = (name, count)
+
+    items = {
+      kind: sorted((key, ref) for ref, (label, score) in entries[kind].items() for key in index_keys(label))
+      for kind in KINDS
+    }
+    memo = {}
+    for kind in KINDS:
+      for prefix in {key[:length] for key, ref in items[kind] for length in range(1, WARM_PREFIX_LENGTH + 1)}:
+        top, size = _rank(items[kind], entries[kind], prefix)
+        if size > MEMO_MIN_RANGE:
+          memo[(kind, prefix)] = top
+    with self._lock:
+      self._items = items
+      self._entries = entries
+      self._memo = memo
+      self._built_at = time.monotonic()
+    return sum(len(kind_entries) for kind_entries in entries.values())
+
+
+suggestion_index = SuggestionIndex()
@@ -0,0 +1,66 @@
+import logging
+from celery import shared_task
+from apps.event.stats import refresh_popularity
+from apps.event.geo import refresh_map_cells, map_cells_need_refresh
+from apps.event.timeline import trim_timelines
+from apps.event.recommend import refresh_recommendations
+from apps.event.similar import refresh_similar_events
+from apps.event.notify import notify_followers
+
+logger = logging.getLogger('django')
+
+
+@shared_task
+def refresh_event_popularity():
+  """Rescore every event, so that recency decay applies to events nobody interacts with."""
+  updated = refresh_popularity()
+  logger.info(f"Refreshed popularity of {updated} events")
+  return updated
+
+
+@shared_task
+def refresh_event_map_cells():
+  """Recompute the precomputed map clusters when events changed or they are getting old."""
+  if not map_cells_need_refresh():
+    return 0
+  written = refresh_map_cells()
+  logger.info(f"Refreshed {written} map cells")
+  return written
+
+
+@shared_task
+def trim_home_timelines():
+  """Cut the home timelines that fan-out grew past TIMELINE_SIZE entries."""
+  deleted = trim_timelines()
+  logger.info(f"Trimmed {deleted} timeline entries")
+  return deleted
+
+
+@shared_task
+def refresh_all_recommendations():
+  """Recompute the stored recommendation lists of all active users before they expire."""
+  return refresh_recommendations()
+
+
+@shared_task
+def refresh_user_recommendations(user_id):
+  """Recompute one user's recommendations after their interests or follows changed."""
+  return refresh_recommendations([user_id])
+
+
+@shared_task
+def refresh_event_neighbors(full=False):
+  """Recompute the similar events of those with new, removed or changed interactions, or of every event when `full`."""
+  updated = refresh_similar_events(full=full)
+  logger.info(f"Refreshed the similar events of {updated} events")
+  return updated
+
+
+@shared_task(bind=True)
+def notify_followers_of_event(self, event_id):
+  """Fan a new event out to its organizer's followers, reporting PROGRESS with the followers done so far."""
+  def progress(done, total):
+    if self.request.id:
+      self.update_state(state='PROGRESS', meta={'event_id': event_id, 'done': done, 'total': total})
+
+  return notify_followers(event_id, progress=progress)
@@ -0,0 +1,14 @@
+from datetime import timedelta
+from django.utils import timezone
+from apps.event.models import Event
+
+
+def make_event(organizer, title, days=1, **overrides):
+  """An event of `organizer` starting `days` from now, for tests; any field can be overridden."""
+  start = timezone.now() + timedelta(days=days)
+  fields = {
+    'organizer': organizer, 'title': title, 'description': "An evening out", 'location': "Addis Ababa",
+    'start_time': start, 'end_time': start + timedelta(hours=2), 'start_date': start, 'end_date': start,
+  }
+  fields.update(overrides)
+  return Event.objects.create(**fields)
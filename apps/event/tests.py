@@ -1,13 +1,49 @@
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory
 from django.urls import reverse
 from rest_framework import status
-from apps.user.models import CustomUser, OrganizationProfile
-from apps.event.models import Event, Category, Hashtag, Ticket, UserTicket
+import json
+import time
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from apps.user.models import CustomUser, OrganizationProfile, Profile, Follow
+from apps.event.models import (
+    Event, Category, Hashtag, Ticket, UserTicket, Bookmark, Rating, EventStats, EventNeighbors, HomeTimeline, TimelineEntry
+)
+from apps.event.serializers import EventSerializer
 from django.utils import timezone
 from datetime import timedelta
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.db.models import Q
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from decimal import Decimal
+import uuid
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from apps.event.stats import rebuild_event_stats, refresh_popularity
+from apps.event.suggest import suggestion_index
+from apps.event.spatial import spatial_index
+from apps.event.geo import nearby_events, refresh_map_cells, MAX_CLUSTERS, cluster_level, view_boxes, cell_ranges
+from apps.event.tasks import refresh_event_map_cells
+from apps.event.recommend import refresh_recommendations, get_recommendations, recommendation_stats, _blend
+from apps.event.scoring import ScoringEngine
+from apps.event.notify import notify_followers, fanout_stats
+from apps.event.timeline import trim_timelines
+from apps.event.similar import refresh_similar_events
+from apps.event.testing import make_event
+from apps.notification.models import Notification
+from apps.notification.consumers import NotificationConsumer
+from commons.utils import ApproximateCountPagination
+from commons.renderers import OrjsonRenderer
+from commons.parsers import OrjsonParser
 
 
 class EventModelTest(TestCase):
@@ -232,3 +268,1057 @@ class EventViewSetTest(APITestCase):
         response = self.user_client.delete(self.event_url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class EventListSerializationTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="user@example.com", password="testpass123", role="user", username="user1")
+        self.other = CustomUser.objects.create_user(email="other@example.com", password="testpass123", role="user", username="user2")
+        self.org_user = CustomUser.objects.create_user(email="org@example.com", password="testpass123", role="organization", username="org1")
+        OrganizationProfile.objects.create(user=self.org_user, name="OrgName")
+        Profile.objects.create(user=self.user)
+
+        self.category = Category.objects.create(name="Music", organizer=self.org_user)
+        self.hashtag = Hashtag.objects.create(name="fun")
+
+        self.factory = APIRequestFactory()
+
+    def _create_events(self, count):
+        events = []
+        for i in range(count):
+            event = make_event(self.org_user, f"Event {i}")
+            event.category.add(self.category)
+            event.hashtags.add(self.hashtag)
+            event.likes.add(self.other)
+            if i % 2 == 0:
+                event.likes.add(self.user)
+                Bookmark.objects.create(user=self.user, event=event)
+                Rating.objects.create(user=self.user, event=event, value=4.0)
+            Rating.objects.create(user=self.other, event=event, value=3.0)
+            ticket = Ticket.objects.create(event=event, name="VIP", price=500)
+            UserTicket.objects.create(user=self.user, ticket=ticket, used=(i % 3 == 0))
+            events.append(event)
+        return events
+
+    def _request(self, user):
+        request = self.factory.get('/')
+        request.user = user
+        return request
+
+    def _page_queries(self, events, user):
+        request = self._request(user)
+        with CaptureQueriesContext(connection) as ctx:
+            EventSerializer(events, many=True, context={'request': request}).data
+        return [q['sql'] for q in ctx.captured_queries]
+
+    def test_list_output_matches_single_serialization(self):
+        events = self._create_events(4)
+        for user in (self.user, self.org_user, AnonymousUser()):
+            request = self._request(user)
+            listed = EventSerializer(events, many=True, context={'request': request}).data
+            single = [EventSerializer(event, context={'request': request}).data for event in events]
+            self.assertEqual(json.loads(json.dumps(listed, default=str)), json.loads(json.dumps(single, default=str)))
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        events = self._create_events(6)
+        small = self._page_queries(Event.objects.filter(id__in=[e.id for e in events[:2]]), self.user)
+        large = self._page_queries(Event.objects.filter(id__in=[e.id for e in events]), self.user)
+        self.assertEqual(len(small), len(large))
+
+    def test_sparse_fieldset_skips_omitted_lookups(self):
+        events = self._create_events(2)
+        request = self._request(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            data = EventSerializer(events, many=True, context={'request': request}, fields=['compact']).data
+        self.assertEqual(
+            set(data[0]),
+            {'id', 'title', 'cover_image_url', 'start_date', 'start_time', 'end_date', 'location', 'likes_count'}
+        )
+        self.assertEqual(data[0]['likes_count'], 2)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        data = EventSerializer(events, many=True, context={'request': request}, omit=['organizer', 'rating', 'rated']).data
+        self.assertNotIn('organizer', data[0])
+        self.assertNotIn('rating', data[0])
+        self.assertIn('liked', data[0])
+
+    def test_organizer_block_uses_prefetched_profile_and_follow_set(self):
+        events = self._create_events(3)
+        Follow.objects.create(follower=self.user, followed=self.org_user, followed_role='organization')
+        queries = self._page_queries(Event.objects.filter(id__in=[e.id for e in events]), self.user)
+        self.assertEqual(sum('"user_follow"' in sql for sql in queries), 1)
+        self.assertFalse(any(sql.startswith('INSERT') for sql in queries))
+
+        request = self._request(self.user)
+        data = EventSerializer(events, many=True, context={'request': request}).data
+        self.assertTrue(all(item['organizer']['profile']['is_following'] for item in data))
+
+class EventStatsTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="user@example.com", password="testpass123", role="user", is_verified=True, username="user1")
+        self.org_user = CustomUser.objects.create_user(email="org@example.com", password="testpass123", role="organization", is_verified=True, username='user2')
+        OrganizationProfile.objects.create(user=self.org_user, name="OrgName")
+
+        self.user_client = APIClient()
+        self.user_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+        self.event = make_event(self.org_user, "Concert")
+
+    def _stats(self):
+        return EventStats.objects.get(event=self.event)
+
+    def test_stats_row_created_with_event(self):
+        self.assertEqual(self._stats().like_count, 0)
+
+    def test_like_and_bookmark_update_counters(self):
+        self.user_client.post(reverse('event-like', kwargs={"id": self.event.id}))
+        self.user_client.post(reverse('event-bookmark', kwargs={"id": self.event.id}))
+        stats = self._stats()
+        self.assertEqual((stats.like_count, stats.bookmark_count), (1, 1))
+
+        self.user_client.post(reverse('event-like', kwargs={"id": self.event.id}))
+        self.assertEqual(self._stats().like_count, 0)
+
+    def test_toggles_lock_the_event_and_apply_the_rows_changed(self):
+        url = reverse('event-bookmark', kwargs={"id": self.event.id})
+        with CaptureQueriesContext(connection) as queries:
+            self.user_client.post(reverse('event-like', kwargs={"id": self.event.id}))
+            self.user_client.post(url)
+        self.assertEqual(sum('FOR UPDATE' in query['sql'] for query in queries.captured_queries), 2)
+
+        # A duplicate, as two racing requests could leave before the lock.
+        Bookmark.objects.create(user=self.user, event=self.event)
+        rebuild_event_stats([self.event.id])
+        self.assertEqual(self._stats().bookmark_count, 2)
+        self.user_client.post(url)
+        self.assertEqual(self._stats().bookmark_count, 0)
+        self.assertFalse(Bookmark.objects.filter(event=self.event).exists())
+
+    def test_rating_updates_sum_and_average(self):
+        url = reverse('event-rating-list', kwargs={"event_id": self.event.id})
+        self.user_client.post(url, {"value": 4.0})
+        self.user_client.post(url, {"value": 2.0})
+        stats = self._stats()
+        self.assertEqual((stats.rating_count, stats.rating_sum, stats.rating_average), (1, 2.0, 2.0))
+
+        self.user_client.delete(reverse('event-rating-me', kwargs={"event_id": self.event.id}))
+        stats = self._stats()
+        self.assertEqual((stats.rating_count, stats.rating_average), (0, None))
+
+    def test_rating_writes_lock_the_event_and_reread_the_rating(self):
+        url = reverse('event-rating-list', kwargs={"event_id": self.event.id})
+        me = reverse('event-rating-me', kwargs={"event_id": self.event.id})
+        with CaptureQueriesContext(connection) as queries:
+            self.user_client.post(url, {"value": 4.0})
+            self.user_client.patch(me, {"value": 3.0})
+        self.assertEqual(sum('FOR UPDATE' in query['sql'] for query in queries.captured_queries), 2)
+
+        # Another request changed the rating after this one loaded it.
+        stale = Rating.objects.get(event=self.event, user=self.user)
+        Rating.objects.filter(pk=stale.pk).update(value=1.0)
+        rebuild_event_stats([self.event.id])
+        with patch('apps.event.rating.views.RatingViewSet.get_rating', return_value=stale):
+            self.user_client.patch(me, {"value": 5.0})
+        self.assertEqual((self._stats().rating_count, self._stats().rating_sum), (1, 5.0))
+
+        Rating.objects.filter(pk=stale.pk).update(value=2.0)
+        rebuild_event_stats([self.event.id])
+        with patch('apps.event.rating.views.RatingViewSet.get_rating', return_value=stale):
+            self.user_client.delete(me)
+        self.assertEqual((self._stats().rating_count, self._stats().rating_sum), (0, 0.0))
+
+    def test_rebuild_command_recomputes_from_source(self):
+        self.event.likes.add(self.user)
+        Rating.objects.create(user=self.user, event=self.event, value=5.0)
+        ticket = Ticket.objects.create(event=self.event, name="VIP", price=500)
+        UserTicket.objects.create(user=self.user, ticket=ticket, used=True)
+
+        call_command('rebuild_event_stats', stdout=StringIO())
+        stats = self._stats()
+        self.assertEqual(
+            (stats.like_count, stats.rating_count, stats.rating_average, stats.attendee_count),
+            (1, 1, 5.0, 1)
+        )
+
+    def test_popularity_follows_interactions_and_matches_refresh(self):
+        base = self._stats().popularity
+        self.assertGreater(base, 0)
+        self.user_client.post(reverse('event-like', kwargs={"id": self.event.id}))
+        self.user_client.post(reverse('event-rating-list', kwargs={"event_id": self.event.id}), {"value": 5.0})
+        incremental = self._stats().popularity
+        self.assertGreater(incremental, base)
+
+        refresh_popularity()
+        self.assertAlmostEqual(self._stats().popularity, incremental, places=6)
+
+    def test_popular_orders_by_score_and_decays_past_events(self):
+        liked = make_event(self.org_user, "Liked", days=2)
+        rated_once = make_event(self.org_user, "Rated once", days=2)
+        past = make_event(self.org_user, "Past", days=-60)
+        for n in range(5):
+            fan = CustomUser.objects.create_user(email=f"fan{n}@example.com", password="x", username=f"fan{n}")
+            liked.likes.add(fan)
+            past.likes.add(fan)
+        Rating.objects.create(user=self.user, event=rated_once, value=5.0)
+        call_command('rebuild_event_stats', stdout=StringIO())
+
+        response = self.client.get(reverse('event-popular'))
+        titles = [e['title'] for e in response.data['results']]
+        self.assertEqual(titles[:2], ["Liked", "Rated once"])
+        self.assertEqual(titles[-1], "Past")
+
+    def test_popular_lists_events_without_stats_last(self):
+        for n in range(10):
+            make_event(self.org_user, f"Event {n}")
+        self._stats().delete()
+
+        first = self.client.get(reverse('event-popular'), {'cursor': ''})
+        self.assertNotIn("Concert", [e['title'] for e in first.data['results']])
+        second = self.client.get(first.data['next'])
+        self.assertEqual([e['title'] for e in second.data['results']], ["Concert"])
+
+        response = self.client.get(reverse('event-popular'))
+        self.assertEqual(response.data['count'], 11)
+        self.assertEqual(self.client.get(reverse('event-popular'), {'page': 2}).data['results'][0]['title'], "Concert")
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class EventFragmentCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email="user@example.com", password="testpass123", role="user", username="user1")
+        self.other = CustomUser.objects.create_user(email="other@example.com", password="testpass123", role="user", username="user2")
+        self.org_user = CustomUser.objects.create_user(email="org@example.com", password="testpass123", role="organization", username="org1")
+        OrganizationProfile.objects.create(user=self.org_user, name="OrgName")
+        self.event = make_event(self.org_user, "Concert")
+        self.factory = APIRequestFactory()
+
+    def _serialize(self, user):
+        request = self.factory.get('/')
+        request.user = user
+        return EventSerializer(Event.objects.filter(id=self.event.id), many=True, context={'request': request}).data[0]
+
+    def test_cached_fragment_gets_per_user_overlay(self):
+        self.event.likes.add(self.user)
+        self._serialize(self.other)
+
+        with CaptureQueriesContext(connection) as ctx:
+            rep = self._serialize(self.user)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+        self.assertTrue(rep['liked'])
+        self.assertEqual(rep['likes_count'], 1)
+        self.assertFalse(self._serialize(self.other)['liked'])
+
+    def test_changes_invalidate_cached_fragment(self):
+        self._serialize(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.likes.add(self.other)
+        self.assertEqual(self._serialize(self.user)['likes_count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Rating.objects.create(user=self.other, event=self.event, value=3.0)
+        self.assertEqual(self._serialize(self.user)['average_rating'], 3.0)
+
+    def test_owner_sees_total_revenue_on_cached_fragment(self):
+        self._serialize(self.user)
+        rep = self._serialize(self.org_user)
+        self.assertEqual(rep['total_revenue'], 0)
+        self.assertNotIn('total_revenue', self._serialize(self.user))
+
+
+class EventSearchTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="searcher@example.com", password="pass", role="user", username="searcher")
+        self.org_user = CustomUser.objects.create_user(email="org@example.com", password="pass", role="organization", username="searchorg")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('event-search')
+
+    def _search(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [event['title'] for event in response.data['results']]
+
+    def test_title_match_ranks_above_description_match(self):
+        make_event(self.org_user, "Book fair", description="Come for the jazz band between readings")
+        make_event(self.org_user, "Jazz night")
+        make_event(self.org_user, "Football")
+        self.assertEqual(self._search("jazz"), ["Jazz night", "Book fair"])
+
+    def test_matches_prefixes_stems_and_any_word(self):
+        make_event(self.org_user, "Comedy festivals")
+        make_event(self.org_user, "Poetry", location="Bole")
+        self.assertEqual(self._search("festival"), ["Comedy festivals"])
+        self.assertEqual(self._search("comed"), ["Comedy festivals"])
+        self.assertCountEqual(self._search("bole comedy"), ["Comedy festivals", "Poetry"])
+
+    def test_vector_follows_hashtags_and_categories(self):
+        event = make_event(self.org_user, "Evening")
+        hashtag = Hashtag.objects.create(name="ethiojazz")
+        event.hashtags.add(hashtag)
+        self.assertEqual(self._search("ethiojazz"), ["Evening"])
+
+        hashtag.name = "afrobeat"
+        hashtag.save()
+        self.assertEqual(self._search("ethiojazz"), [])
+        self.assertEqual(self._search("afrobeat"), ["Evening"])
+
+        event.category.add(Category.objects.create(name="Theatre"))
+        self.assertEqual(self._search("theatre"), ["Evening"])
+        event.category.clear()
+        self.assertEqual(self._search("theatre"), [])
+
+    def test_falls_back_to_fuzzy_matching_for_typos(self):
+        make_event(self.org_user, "Jazz night", location="Piassa")
+        make_event(self.org_user, "Book fair", location="Megenagna")
+        OrganizationProfile.objects.create(user=self.org_user, name="Fendika Cultural Center")
+
+        response = self.client.get(self.url, {'q': 'gazz nigth'})
+        self.assertEqual(response['X-Search-Mode'], 'fuzzy')
+        self.assertEqual(response.data['results'][0]['title'], "Jazz night")
+        self.assertEqual(self._search("megenaga"), ["Book fair"])
+        self.assertCountEqual(self._search("fendka"), ["Jazz night", "Book fair"])
+        self.assertEqual(self._search("zzzzqqq"), [])
+
+    @override_settings(EVENT_SEARCH_FUZZY_THRESHOLD=0.9)
+    def test_fuzzy_threshold_is_tunable(self):
+        make_event(self.org_user, "Jazz night")
+        self.assertEqual(self._search("gazz nigth"), [])
+
+    def test_enough_full_text_matches_skip_fuzzy(self):
+        for n in range(3):
+            make_event(self.org_user, f"Jazz night {n}")
+        response = self.client.get(self.url, {'q': 'jazz'})
+        self.assertEqual(response['X-Search-Mode'], 'full-text')
+        self.assertEqual(response.data['count'], 3)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_facet_counts_in_one_query(self):
+        music = Category.objects.create(name="Music")
+        jazz = Hashtag.objects.create(name="jazz")
+        tonight = make_event(self.org_user, "Jazz tonight", days=0)
+        tonight.end_date = timezone.now() + timedelta(hours=2)
+        tonight.save()
+        tonight.category.add(music)
+        tonight.hashtags.add(jazz)
+        Ticket.objects.create(event=tonight, name="Regular", price=200)
+        later = make_event(self.org_user, "Jazz next month")
+        later.start_date = later.end_date = timezone.now() + timedelta(days=60)
+        later.save()
+        later.hashtags.add(jazz)
+        Ticket.objects.create(event=later, name="Free entry", price=0)
+        make_event(self.org_user, "Jazz before").hashtags.add(Hashtag.objects.create(name="vintage"))
+        Event.objects.filter(title="Jazz before").update(end_date=timezone.now() - timedelta(days=1))
+        make_event(self.org_user, "Football")
+
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'q': 'jazz', 'facets': 'true'})
+        self.assertEqual(sum('UNION ALL' in q['sql'] for q in ctx.captured_queries), 1)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['facets'], {
+            'categories': [{'name': "Music", 'count': 1}],
+            'hashtags': [{'name': "jazz", 'count': 2}, {'name': "vintage", 'count': 1}],
+            'dates': {'past': 1, 'today': 1, 'this_week': 0, 'this_month': 0, 'later': 1},
+            'price': {'free': 2, 'paid': 1},
+        })
+
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(self.url, {'q': ' JAZZ ', 'facets': '1'})
+        self.assertFalse(any('UNION ALL' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(cached.data['facets'], response.data['facets'])
+        self.assertNotIn('facets', self.client.get(self.url, {'q': 'jazz'}).data)
+
+    def test_without_words_lists_filtered_events(self):
+        event = make_event(self.org_user, "Evening")
+        event.category.add(Category.objects.create(name="Music"))
+        make_event(self.org_user, "Morning")
+        self.assertEqual(self._search("", category="Music"), ["Evening"])
+
+
+class EventSuggestTest(APITestCase):
+    def setUp(self):
+        self.index = suggestion_index
+        self.index.reset()
+        self.addCleanup(self.index.reset)
+
+        self.user = CustomUser.objects.create_user(email="suggest@example.com", password="pass", role="user", username="suggest")
+        self.org_user = CustomUser.objects.create_user(email="fendika@example.com", password="pass", role="organization", username="fendika")
+        OrganizationProfile.objects.create(user=self.org_user, name="Fendika Cultural Center")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('event-suggest')
+
+        self.event = make_event(self.org_user, "Ethio-jazz night")
+        make_event(self.org_user, "Private jam", is_public=False)
+        self.event.hashtags.add(Hashtag.objects.create(name="ethiojazz"))
+        self.event.category.add(Category.objects.create(name="Jazz & Blues", organizer=self.org_user))
+
+    def test_suggests_every_kind_by_word_prefix(self):
+        response = self.client.get(self.url, {'prefix': 'ja'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['events'], [{'id': self.event.id, 'title': "Ethio-jazz night"}])
+        self.assertEqual(response.data['categories'], ["Jazz & Blues"])
+        self.assertEqual(response.data['hashtags'], [])
+
+        response = self.client.get(self.url, {'prefix': 'eth'})
+        self.assertEqual(response.data['hashtags'], ["ethiojazz"])
+        response = self.client.get(self.url, {'prefix': 'cultural'})
+        self.assertEqual(response.data['organizers'], [{'id': self.org_user.id, 'name': "Fendika Cultural Center"}])
+
+    def test_lookups_do_not_query_the_database(self):
+        self.index.lookup('ja')
+        with self.assertNumQueries(0):
+            self.index.lookup('jazz n')
+
+    def test_index_follows_changes(self):
+        self.index.lookup('ja')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.title = "Afrobeat night"
+            self.event.save()
+            Hashtag.objects.create(name="afro")
+        self.assertEqual(self.index.lookup('ja')['events'], [])
+        self.assertEqual(self.index.lookup('afro')['events'], [{'id': self.event.id, 'title': "Afrobeat night"}])
+        self.assertEqual(self.index.lookup('afro')['hashtags'], ["afro"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.delete()
+        self.assertEqual(self.index.lookup('afro')['events'], [])
+
+    @override_settings(SUGGEST_REFRESH_INTERVAL=-1)
+    def test_stale_index_is_rebuilt_in_background(self):
+        self.index.lookup('ja')
+        with patch('threading.Thread') as thread:
+            self.index.lookup('ja')
+        thread.return_value.start.assert_called_once()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ResponseCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.org_user = CustomUser.objects.create_user(email="org@example.com", password="pass", role="organization", username="cacheorg")
+        self.event = make_event(self.org_user, "Concert")
+        self.url = reverse('event-popular')
+
+    def test_anonymous_responses_are_shared(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertIn('public', first['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(self.client.get(self.url, {'page': 2}).status_code, status.HTTP_404_NOT_FOUND)
+
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.client.get(self.url)
+        self.client.force_authenticate(user=self.org_user)
+        response = self.client.get(self.url)
+        self.assertNotIn('X-Cache', response)
+
+    def test_stale_entry_is_served_while_refreshing_once(self):
+        self.client.get(reverse('event-recent'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.title = "Renamed"
+            self.event.save()
+
+        with patch('commons.cache.time.time', return_value=time.time() + 60), \
+                patch('commons.cache.threading.Thread') as thread:
+            stale = self.client.get(reverse('event-recent'))
+            self.client.get(reverse('event-recent'))
+        self.assertEqual(stale['X-Cache'], 'STALE')
+        self.assertEqual(stale.data['results'][0]['title'], "Concert")
+        thread.assert_called_once()
+
+        with patch('commons.cache.connection'):
+            thread.call_args.kwargs['target']()
+        self.assertEqual(self.client.get(reverse('event-recent')).data['results'][0]['title'], "Renamed")
+
+    def test_counters_exposed_to_staff(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        staff = CustomUser.objects.create_user(email="staff@example.com", password="pass", username="staff", is_staff=True)
+        self.client.force_authenticate(user=staff)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.data['response_cache']['misses'], 1)
+        self.assertEqual(response.data['response_cache']['hits'], 1)
+
+        self.client.force_authenticate(user=self.org_user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class KeysetPaginationTest(APITestCase):
+    def setUp(self):
+        self.org_user = CustomUser.objects.create_user(email="org@example.com", password="pass", role="organization", username="keysetorg")
+        OrganizationProfile.objects.create(user=self.org_user, name="OrgName")
+        now = timezone.now()
+        self.events = [make_event(self.org_user, f"Event {i}") for i in range(25)]
+        # Ties on created_at must be broken by id.
+        Event.objects.filter(id__in=[event.id for event in self.events[5:15]]).update(created_at=now)
+        self.client.force_authenticate(user=self.org_user)
+        self.url = reverse('event-recent')
+
+    def test_walks_every_event_once_in_order(self):
+        response = self.client.get(self.url, {'cursor': ''})
+        self.assertNotIn('count', response.data)
+        ids = []
+        while True:
+            ids += [event['id'] for event in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        expected = list(Event.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_deep_pages_do_not_use_offset(self):
+        first = self.client.get(self.url, {'cursor': ''})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first.data['next'])
+        self.assertFalse(any('OFFSET' in query['sql'] for query in queries.captured_queries))
+
+    def test_page_numbers_still_work(self):
+        response = self.client.get(self.url, {'page': 2})
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-a-cursor', 'WyJ4Il0=', 'WyJ4IiwgMV0='):
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_follower_lists(self):
+        for i in range(12):
+            follower = CustomUser.objects.create_user(email=f"f{i}@example.com", password="pass", username=f"follower{i}")
+            Follow.objects.create(follower=follower, followed=self.org_user, followed_role="organization")
+        response = self.client.get(reverse('organization-followers', kwargs={'id': self.org_user.id}), {'cursor': ''})
+        next_page = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']) + len(next_page.data['results']), 12)
+        self.assertIsNone(next_page.data['next'])
+
+    def test_follower_counts_are_capped(self):
+        for i in range(12):
+            follower = CustomUser.objects.create_user(email=f"f{i}@example.com", password="pass", username=f"follower{i}")
+            Follow.objects.create(follower=follower, followed=self.org_user, followed_role="organization")
+        url = reverse('organization-followers', kwargs={'id': self.org_user.id})
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 12)
+        self.assertFalse(response.data['approximate'])
+
+        with patch.object(ApproximateCountPagination, 'count_cap', 5):
+            response = self.client.get(url)
+        self.assertTrue(response.data['approximate'])
+        self.assertGreater(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 10)
+
+
+class NearbyEventsTest(APITestCase):
+    def setUp(self):
+        self.org_user = CustomUser.objects.create_user(email="org@example.com", password="pass", role="organization", username="nearbyorg")
+        self.client.force_authenticate(user=self.org_user)
+        self.url = reverse('event-nearby')
+
+    def test_nearest_first_within_radius(self):
+        here = make_event(self.org_user, "Here", latitude=8.9806, longitude=38.7578)
+        close = make_event(self.org_user, "Close", latitude=9.0000, longitude=38.7578)
+        make_event(self.org_user, "Far", latitude=9.5000, longitude=38.7578)
+        make_event(self.org_user, "Nowhere", latitude=None, longitude=None)
+
+        response = self.client.get(self.url, {'lat': 8.9806, 'lng': 38.7578, 'radius': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([event['id'] for event in response.data['results']], [here.id, close.id])
+
+    def test_crosses_antimeridian(self):
+        east = make_event(self.org_user, "East", latitude=0, longitude=179.99)
+        west = make_event(self.org_user, "West", latitude=0, longitude=-179.99)
+        response = self.client.get(self.url, {'lat': 0, 'lng': 179.995, 'radius': 5})
+        self.assertEqual({event['id'] for event in response.data['results']}, {east.id, west.id})
+
+    def test_pages_by_distance(self):
+        events = [make_event(self.org_user, f"Event {i}", latitude=8.98 + i / 1000, longitude=38.75) for i in range(15)]
+        response = self.client.get(self.url, {'lat': 8.98, 'lng': 38.75, 'radius': 10})
+        self.assertEqual(len(response.data['results']), 10)
+        next_page = self.client.get(response.data['next'])
+        ids = [event['id'] for event in response.data['results'] + next_page.data['results']]
+        self.assertEqual(ids, [event.id for event in events])
+        self.assertIsNone(next_page.data['next'])
+
+    def test_start_filters(self):
+        make_event(self.org_user, "Past", latitude=8.98, longitude=38.75, days=-2)
+        later = make_event(self.org_user, "Later", latitude=8.98, longitude=38.75, days=10)
+        params = {'lat': 8.98, 'lng': 38.75, 'radius': 1}
+        response = self.client.get(self.url, {**params, 'upcoming_only': 'true'})
+        self.assertEqual([event['id'] for event in response.data['results']], [later.id])
+        response = self.client.get(self.url, {**params, 'start_after': (timezone.now() + timedelta(days=5)).isoformat()})
+        self.assertEqual([event['id'] for event in response.data['results']], [later.id])
+
+    def test_invalid_parameters(self):
+        for params in (
+            {'lat': 8.98, 'lng': 38.75},
+            {'lat': 91, 'lng': 38.75, 'radius': 1},
+            {'lat': 8.98, 'lng': 38.75, 'radius': 'nan'},
+            {'lat': 8.98, 'lng': 38.75, 'radius': 1, 'start_after': 'soon'},
+        ):
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SpatialIndexTest(APITestCase):
+    def setUp(self):
+        self.index = spatial_index
+        self.index.reset()
+        cache.clear()
+        self.org_user = CustomUser.objects.create_user(email="org@example.com", password="pass", role="organization", username="spatialorg")
+        self.client.force_authenticate(user=self.org_user)
+
+    def test_matches_database_lookup(self):
+        events = [make_event(self.org_user, f"Event {i}", latitude=8.9 + i * 0.013, longitude=38.7 + i * 0.011) for i in range(30)]
+        make_event(self.org_user, "Past", latitude=8.9, longitude=38.7, days=-2)
+        make_event(self.org_user, "Private", latitude=8.9, longitude=38.7, is_public=False)
+        make_event(self.org_user, "Nowhere", latitude=None, longitude=None)
+        ids, distances = self.index.within(8.95, 38.75, 15)
+        expected = nearby_events(Event.objects.filter(id__in=[event.id for event in events]), 8.95, 38.75, 15)
+        self.assertEqual(ids, [event.id for event in expected])
+        self.assertAlmostEqual(distances[0], expected[0].distance, places=6)
+
+        ids, _ = self.index.nearest(8.95, 38.75, 3)
+        self.assertEqual(ids, [event.id for event in expected[:3]])
+
+    def test_kept_fresh_by_signals(self):
+        self.index.within(0, 0, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            event = make_event(self.org_user, "New", latitude=8.98, longitude=38.75)
+        self.assertEqual(self.index.within(8.98, 38.75, 1)[0], [event.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            event.latitude = 9.5
+            event.save()
+        self.assertEqual(self.index.within(8.98, 38.75, 1)[0], [])
+        self.assertEqual(self.index.within(9.5, 38.75, 1)[0], [event.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            event.delete()
+        self.assertEqual(self.index.within(9.5, 38.75, 1)[0], [])
+        self.assertEqual(self.index.stats()['updates_since_build'], 3)
+
+    def test_rebuild_command_is_picked_up(self):
+        self.index.within(0, 0, 1)
+        call_command('rebuild_spatial_index', stdout=StringIO())
+        self.index.reset()
+        self.index.within(0, 0, 1)
+        with patch('apps.event.spatial.time.time', return_value=time.time() + 10), \
+                patch('apps.event.spatial.threading.Thread') as thread:
+            cache.set('spatial_index:rebuild_requested_at', time.time() + 5)
+            self.index.within(0, 0, 1)
+        self.assertTrue(self.index.stats()['rebuild_requested'])
+        thread.assert_called_once()
+
+    def test_map_nearby_endpoint(self):
+        near = make_event(self.org_user, "Near", latitude=8.98, longitude=38.75)
+        far = make_event(self.org_user, "Far", latitude=9.5, longitude=38.75)
+        url = reverse('event-map-nearby')
+        response = self.client.get(url, {'lat': 8.98, 'lng': 38.75, 'k': 2})
+        self.assertEqual([event['id'] for event in response.data], [near.id, far.id])
+        response = self.client.get(url, {'lat': 8.98, 'lng': 38.75, 'radius': 5})
+        self.assertEqual([event['id'] for event in response.data], [near.id])
+        self.assertEqual(self.client.get(url, {'lat': 8.98, 'lng': 38.75}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        staff = CustomUser.objects.create_user(email="staff@example.com", password="pass", username="staff", is_staff=True)
+        self.client.force_authenticate(user=staff)
+        self.assertEqual(self.client.get(reverse('metrics')).data['spatial_index']['events'], 2)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class MapClusterTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.org_user = CustomUser.objects.create_user(email="org@example.com", password="pass", role="organization", username="clusterorg")
+        self.client.force_authenticate(user=self.org_user)
+        self.url = reverse('event-map-clusters')
+        self.events = [
+            make_event(self.org_user, f"Event {i}", latitude=latitude, longitude=longitude)
+            for i, (latitude, longitude) in enumerate([(8.98, 38.75), (8.99, 38.76), (9.0, 38.77), (9.01, 38.78), (13.5, 39.47)])
+        ]
+        EventStats.objects.filter(event=self.events[2]).update(popularity=10)
+
+    def _clusters(self, bbox, zoom):
+        response = self.client.get(self.url, {'bbox': bbox, 'zoom': zoom})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['clusters']
+
+    def test_precomputed_levels_match_live_grouping(self):
+        refresh_map_cells()
+        clusters = self._clusters('33,3,48,15', 5)
+        self.assertEqual(sorted(cluster['count'] for cluster in clusters), [1, 4])
+        addis = max(clusters, key=lambda cluster: cluster['count'])
+        self.assertEqual(addis['event_ids'], [self.events[2].id, self.events[3].id, self.events[1].id])
+        self.assertAlmostEqual(addis['latitude'], 8.995)
+
+        live = self._clusters('38.74,8.97,38.79,9.02', 16)
+        self.assertEqual(sum(cluster['count'] for cluster in live), 4)
+
+    def test_view_is_capped(self):
+        boxes = view_boxes(-180, -85, 180, 85)
+        level = cluster_level(18, boxes)
+        self.assertLessEqual(sum(len(xs) * len(ys) for xs, ys in cell_ranges(boxes, level)), MAX_CLUSTERS)
+
+    def test_refreshed_only_after_changes(self):
+        self.assertGreater(refresh_event_map_cells(), 0)
+        self.assertEqual(refresh_event_map_cells(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.events[0].delete()
+        refresh_event_map_cells()
+        self.assertEqual(sum(cluster['count'] for cluster in self._clusters('33,3,48,15', 5)), 4)
+
+    def test_invalid_parameters(self):
+        for params in ({'bbox': '1,2,3', 'zoom': 3}, {'bbox': '0,10,5,5', 'zoom': 3}, {'bbox': '0,0,5,5', 'zoom': 30}):
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class RecommendationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = patch('apps.event.scoring._engine', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = CustomUser.objects.create_user(email="reader@example.com", password="pass", username="reader", last_login=timezone.now())
+        Profile.objects.create(user=self.user, interests={'categories': ['Music'], 'tags': []})
+        self.org = CustomUser.objects.create_user(email="org@example.com", password="pass", role="organization", username="recommendorg")
+        self.music = Category.objects.create(name="Music")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('event-recomendations')
+
+    def test_stored_list_ranks_matches_first(self):
+        concert = make_event(self.org, "Concert")
+        concert.category.add(self.music)
+        popular = make_event(self.org, "Popular")
+        EventStats.objects.filter(event=popular).update(popularity=10)
+        ended = make_event(self.org, "Ended", days=-2)
+        ended.category.add(self.music)
+        purchased = make_event(self.org, "Purchased")
+        purchased.category.add(self.music)
+        UserTicket.objects.create(user=self.user, ticket=Ticket.objects.create(event=purchased, name="Regular", price=10))
+
+        self.assertEqual(refresh_recommendations(), 1)
+        self.assertEqual(get_recommendations(self.user.id), [concert.id, popular.id])
+        self.assertEqual(recommendation_stats()['users'], 1)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([event['title'] for event in response.data['results']], ["Concert", "Popular"])
+
+    def test_scores_cover_the_live_filter(self):
+        rock = Hashtag.objects.create(name="rock")
+        Profile.objects.filter(user=self.user).update(interests={'categories': ['Music'], 'tags': ['rock']})
+        other = CustomUser.objects.create_user(email="other@example.com", password="pass", role="organization", username="otherorg")
+        self.user.follow(other)
+        events = [make_event(self.org, f"Event {i}") for i in range(6)]
+        events[0].category.add(self.music)
+        events[1].hashtags.add(rock)
+        events[2].organizer = other
+        events[2].save()
+        events[3].category.add(self.music)
+        events[3].hashtags.add(rock)
+        liked = make_event(self.org, "Liked by the user")
+        liked.organizer = CustomUser.objects.create_user(email="liked@example.com", password="pass", role="organization", username="likedorg")
+        liked.save()
+        liked.likes.add(self.user)
+
+        followed = self.user.following.values_list('followed', flat=True)
+        expected = set(
+            Event.objects.filter(Q(category=self.music) | Q(hashtags=rock) | Q(organizer__in=followed))
+            .filter(is_public=True, end_date__gte=timezone.now()).values_list('id', flat=True)
+        )
+        engine = ScoringEngine.build()
+        preferences, purchased = engine.preferences([self.user.id])
+        scored = engine.top_events(preferences, len(engine.event_ids), purchased)[0]
+        # Matching both interests beats matching one; the like only adds weight.
+        self.assertEqual(scored[0], events[3].id)
+        self.assertEqual(set(scored) - {liked.id}, expected)
+        self.assertEqual(len(engine.top_events(preferences, 2, purchased)[0]), 2)
+
+    def test_new_user_gets_live_list_and_is_scheduled(self):
+        make_event(self.org, "Concert").category.add(self.music)
+        with patch('apps.event.tasks.refresh_user_recommendations.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.get(self.url)
+                # Reading again before the list is stored does not queue another job.
+                self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([event['title'] for event in response.data['results']], ["Concert"])
+        apply_async.assert_called_once_with((self.user.id,), retry=False)
+
+    def test_follow_change_drops_stored_list(self):
+        refresh_recommendations([self.user.id])
+        self.assertIsNotNone(get_recommendations(self.user.id))
+        with patch('apps.event.tasks.refresh_user_recommendations.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.follow(self.org)
+        self.assertIsNone(get_recommendations(self.user.id))
+        apply_async.assert_called_once_with((self.user.id,), retry=False)
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class HomeTimelineTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email="fan@example.com", password="pass", username="fan")
+        self.orgs = [
+            CustomUser.objects.create_user(email=f"org{i}@example.com", password="pass", role="organization", username=f"timelineorg{i}")
+            for i in range(2)
+        ]
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('event-following')
+
+    def _publish(self, organizer, title):
+        # Run the fan-out task scheduled on commit in-process.
+        with patch('apps.event.tasks.notify_followers_of_event.apply_async', side_effect=lambda args, **kwargs: notify_followers(*args)):
+            with self.captureOnCommitCallbacks(execute=True):
+                return make_event(organizer, title)
+
+    def _feed(self):
+        response = self.client.get(self.url, {'cursor': ''})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [event['title'] for event in response.data['results']]
+
+    def test_cold_timeline_is_built_on_read(self):
+        self.user.follow(self.orgs[0])
+        self._publish(self.orgs[0], "First")
+        self._publish(self.orgs[1], "Unfollowed")
+        self.assertEqual(self._feed(), ["First"])
+        self.assertTrue(HomeTimeline.objects.filter(user=self.user).exists())
+        self.assertEqual(TimelineEntry.objects.filter(user=self.user).count(), 1)
+
+    def test_fan_out_follow_and_unfollow(self):
+        self.user.follow(self.orgs[0])
+        self._publish(self.orgs[1], "Older")
+        self._feed()
+        self._publish(self.orgs[0], "Published")
+        self.assertEqual(self._feed(), ["Published"])
+
+        self.user.follow(self.orgs[1])
+        self.assertEqual(self._feed(), ["Published", "Older"])
+
+        self.user.unfollow(self.orgs[0])
+        self.assertEqual(self._feed(), ["Older"])
+
+    def test_trim_keeps_newest_entries(self):
+        self.user.follow(self.orgs[0])
+        self._feed()
+        events = [self._publish(self.orgs[0], f"Event {i}") for i in range(3)]
+        with patch('apps.event.timeline.TIMELINE_SIZE', 2):
+            self.assertEqual(trim_timelines(), 1)
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(user=self.user).values_list('event_id', flat=True)),
+            {events[1].id, events[2].id},
+        )
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SimilarEventsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = CustomUser.objects.create_user(email="org@example.com", password="pass", role="organization", username="similarorg")
+        self.users = [
+            CustomUser.objects.create_user(email=f"fan{i}@example.com", password="pass", username=f"fan{i}")
+            for i in range(3)
+        ]
+        self.concert, self.festival, self.gig, self.talk = [make_event(self.org, title) for title in ("Concert", "Festival", "Gig", "Talk")]
+        self.ended = make_event(self.org, "Ended", days=-2)
+        first, second, third = self.users
+        UserTicket.objects.create(user=first, ticket=Ticket.objects.create(event=self.concert, name="Regular", price=10))
+        self.festival.likes.add(first, second)
+        self.ended.likes.add(first, second)
+        Bookmark.objects.create(user=second, event=self.concert)
+        Rating.objects.create(user=second, event=self.gig, value=4)
+        self.talk.likes.add(third)
+        self.client.force_authenticate(user=third)
+
+    def test_neighbors_rank_co_interacted_upcoming_events(self):
+        self.assertEqual(refresh_similar_events(), 5)
+        neighbors = EventNeighbors.objects.get(event=self.concert)
+        self.assertEqual(neighbors.neighbor_ids, [self.festival.id, self.gig.id])
+        self.assertGreater(neighbors.scores[0], neighbors.scores[1])
+        self.assertEqual(EventNeighbors.objects.get(event=self.talk).neighbor_ids, [])
+        self.assertEqual(EventNeighbors.objects.get(event=self.ended).neighbor_ids, [self.festival.id, self.concert.id, self.gig.id])
+
+    def test_incremental_refresh_only_recomputes_touched_events(self):
+        refresh_similar_events()
+        self.assertEqual(refresh_similar_events(), 0)
+
+        self.gig.likes.add(self.users[2])
+        self.assertEqual(refresh_similar_events(), 2)
+        self.assertEqual(EventNeighbors.objects.get(event=self.talk).neighbor_ids, [self.gig.id])
+        self.assertEqual(EventNeighbors.objects.get(event=self.gig).neighbor_ids[0], self.talk.id)
+
+    def test_removed_and_rerated_interactions_are_picked_up_incrementally(self):
+        refresh_similar_events()
+        Rating.objects.filter(event=self.gig).delete()
+        self.assertTrue(EventNeighbors.objects.get(event=self.gig).stale)
+        # The lists of concert, festival and ended held the gig.
+        self.assertEqual(refresh_similar_events(), 3)
+        self.assertEqual(EventNeighbors.objects.get(event=self.concert).neighbor_ids, [self.festival.id])
+        self.assertFalse(EventNeighbors.objects.filter(event=self.gig).exists())
+
+        # A low rating is not shared taste, until it is raised.
+        rating = Rating.objects.create(user=self.users[2], event=self.festival, value=1)
+        refresh_similar_events()
+        self.assertEqual(EventNeighbors.objects.get(event=self.talk).neighbor_ids, [])
+        rating.value = 5
+        rating.save()
+        refresh_similar_events()
+        self.assertEqual(EventNeighbors.objects.get(event=self.talk).neighbor_ids, [self.festival.id])
+
+        self.talk.likes.remove(self.users[2])
+        refresh_similar_events()
+        self.assertNotIn(self.talk.id, EventNeighbors.objects.get(event=self.festival).neighbor_ids)
+        self.assertFalse(EventNeighbors.objects.filter(stale=True).exists())
+
+    def test_similar_endpoint_keeps_rank_and_hides_ended_events(self):
+        refresh_similar_events()
+        response = self.client.get(reverse('event-similar', kwargs={'id': self.ended.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([event['title'] for event in response.data], ["Festival", "Concert", "Gig"])
+
+        Event.objects.filter(id=self.festival.id).update(end_date=timezone.now() - timedelta(days=1))
+        response = self.client.get(reverse('event-similar', kwargs={'id': self.ended.id}))
+        self.assertEqual([event['title'] for event in response.data], ["Concert", "Gig"])
+
+        response = self.client.get(reverse('event-similar', kwargs={'id': self.talk.id}))
+        self.assertEqual(response.data, [])
+
+    def test_recommendations_blend_in_similar_events(self):
+        self.assertEqual(_blend([1, 2, 3, 4, 5], [9, 2]), [1, 2, 3, 9, 4, 5])
+        self.assertEqual(_blend([], [9, 8]), [9, 8])
+
+        refresh_similar_events()
+        engine = ScoringEngine.build()
+        # Bought the concert and liked the festival: the gig comes from the second fan.
+        self.assertEqual(engine.collaborative(engine.engagements([self.users[0].id]), 10), [[self.gig.id]])
+        with patch('apps.event.scoring._engine', None):
+            refresh_recommendations([self.users[0].id])
+        self.assertIn(self.gig.id, get_recommendations(self.users[0].id))
+        self.assertNotIn(self.concert.id, get_recommendations(self.users[0].id))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class FollowerNotificationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = CustomUser.objects.create_user(email="org@example.com", password="pass", role="organization", username="fanoutorg")
+        OrganizationProfile.objects.create(user=self.org, name="Fanout Org")
+        self.followers = [
+            CustomUser.objects.create_user(email=f"follower{i}@example.com", password="pass", username=f"follower{i}")
+            for i in range(5)
+        ]
+        for follower in self.followers:
+            follower.follow(self.org)
+
+    def test_event_creation_schedules_the_fan_out_after_commit(self):
+        HomeTimeline.objects.create(user=self.followers[0])
+        with patch('apps.event.tasks.notify_followers_of_event.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                event = make_event(self.org, "Launch")
+                self.assertFalse(apply_async.called)
+        apply_async.assert_called_once_with((event.id,), retry=False)
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_fan_out_notifies_every_follower_in_chunks(self):
+        event = make_event(self.org, "Launch")
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f"org_{self.org.id}_followers", channel)
+
+        progress = []
+        with patch('apps.event.notify.FANOUT_CHUNK_SIZE', 2):
+            self.assertEqual(notify_followers(event.id, progress=lambda done, total: progress.append((done, total))), 5)
+        self.assertEqual(progress, [(2, 5), (4, 5), (5, 5)])
+        self.assertEqual(
+            sorted(Notification.objects.filter(event=event).values_list('user_id', flat=True)),
+            sorted(follower.id for follower in self.followers),
+        )
+        self.assertEqual(Notification.objects.first().message, "Fanout Org has created a new event: Launch")
+
+        message = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(message['content']['event_id'], event.id)
+        self.assertEqual(message['content']['organizer'], "Fanout Org")
+        self.assertEqual(fanout_stats()['followers'], 5)
+
+    def test_fan_out_of_a_deleted_event_is_a_no_op(self):
+        self.assertEqual(notify_followers(0), 0)
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class NotificationSocketTest(TransactionTestCase):
+    # The consumer's queries run through database_sync_to_async, which closes
+    # the connection a TestCase transaction would need.
+    def setUp(self):
+        self.org = CustomUser.objects.create_user(email="org@example.com", password="pass", role="organization", username="socketorg")
+        self.followers = [CustomUser.objects.create_user(email="follower@example.com", password="pass", username="socketfollower")]
+        self.followers[0].follow(self.org)
+
+    async def _connect(self, user):
+        scope = {"type": "websocket", "path": "/ws/notifications/", "query_string": b"", "headers": [], "subprotocols": [], "user": user}
+        communicator = ApplicationCommunicator(NotificationConsumer.as_asgi(), scope)
+        await communicator.send_input({"type": "websocket.connect"})
+        self.assertEqual((await communicator.receive_output())["type"], "websocket.accept")
+        return communicator
+
+    async def _frame(self, communicator):
+        return json.loads((await communicator.receive_output())["text"])
+
+    async def test_sockets_join_the_followers_groups_of_followed_organizers(self):
+        other = await sync_to_async(CustomUser.objects.create_user)(email="other@example.com", password="pass", username="notfollowing")
+        follower = await self._connect(self.followers[0])
+        stranger = await self._connect(other)
+
+        await get_channel_layer().group_send(f"org_{self.org.id}_followers", {"type": "notify", "content": {"event_id": 1}})
+        self.assertEqual(await self._frame(follower), {"event_id": 1})
+        self.assertTrue(await stranger.receive_nothing())
+        for socket in (follower, stranger):
+            await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+            await socket.wait()
+
+    async def test_follow_and_unfollow_update_connected_sockets(self):
+        other = await sync_to_async(CustomUser.objects.create_user)(email="other@example.com", password="pass", username="latefollower")
+        socket = await self._connect(other)
+        group = f"org_{self.org.id}_followers"
+
+        await sync_to_async(other.follow)(self.org)
+        self.assertTrue(await socket.receive_nothing())
+        await get_channel_layer().group_send(group, {"type": "notify", "content": {"event_id": 2}})
+        self.assertEqual(await self._frame(socket), {"event_id": 2})
+
+        await sync_to_async(other.unfollow)(self.org)
+        self.assertTrue(await socket.receive_nothing())
+        await get_channel_layer().group_send(group, {"type": "notify", "content": {"event_id": 3}})
+        self.assertTrue(await socket.receive_nothing())
+        await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+        await socket.wait()
+
+
+class OrjsonRendererTest(TestCase):
+    def test_matches_json_renderer_output(self):
+        data = {
+            'title': 'Ethio-jazz — live night',
+            'start_time': timezone.now(),
+            'start_date': timezone.now().date(),
+            'total_revenue': Decimal('1250.50'),
+            'reference': uuid.uuid4(),
+            'latitude': 8.980603,
+            'rating': None,
+            'hashtags': [{'name': 'jazz'}],
+        }
+        self.assertEqual(OrjsonRenderer().render(data), JSONRenderer().render(data))
+
+    def test_parser_reads_and_rejects_bodies(self):
+        parser = OrjsonParser()
+        self.assertEqual(parser.parse(BytesIO('{"title": "Café", "value": 4.5}'.encode())), {'title': 'Café', 'value': 4.5})
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"title": '))
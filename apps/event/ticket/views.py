@@ -10,6 +10,7 @@ from apps.community.models import UserCommunity
 from apps.payment.models import Payment, PaymentItem
 from apps.payment.serializers import OnsitePaymentserializer
 from apps.event.ticket.serializers import TicketSerializer
+from apps.event.stats import update_revenue_stats
 from commons.permisions import IsOrganization
 from commons.utils import ResponsePagination
 from drf_spectacular.utils import extend_schema,OpenApiResponse,inline_serializer
@@ -94,6 +95,8 @@ class TicketViewSet(viewsets.ModelViewSet):
       for _ in range(item['quantity']):
         UserTicket.objects.create(user=payment.user, ticket=paymentItem.ticket)
     
+    update_revenue_stats(payment)
+    
     if hasattr(event, 'community') and add_to_community:
       UserCommunity.objects.get_or_create(user=payment.user, community=event.community)
 
@@ -0,0 +1,139 @@
+import logging
+from django.db import connection, transaction
+from django.db.models import Subquery
+from apps.event.models import Event, HomeTimeline, TimelineEntry
+from apps.user.models import Follow
+
+logger = logging.getLogger('django')
+
+# Entries kept per user; the `filter/following` feed of a warm timeline lists
+# the newest TIMELINE_SIZE events of the followed organizers.
+TIMELINE_SIZE = 500
+
+ENTRY_TABLE = TimelineEntry._meta.db_table
+TIMELINE_TABLE = HomeTimeline._meta.db_table
+EVENT_TABLE = Event._meta.db_table
+FOLLOW_TABLE = Follow._meta.db_table
+
+
+def following_feed(user, queryset):
+  """
+  Events of `queryset` by the organizers `user` follows, newest first.
+
+  The timeline is read as one range of the (user, created_at) index of
+  TimelineEntry, whatever the number of followed organizers. A cold
+  timeline is built first; if that fails, the feed falls back to filtering
+  the events on the followed organizers.
+  """
+  if not HomeTimeline.objects.filter(user=user).exists():
+    try:
+      build_timeline(user)
+    except Exception as e:
+      logger.error(f"Failed to build the timeline of user {user.pk}: {e}")
+      followed_organizer_ids = user.following.values_list('followed_id', flat=True)
+      return queryset.filter(organizer__id__in=followed_organizer_ids).order_by('-created_at', '-id')
+
+  entries = (
+    TimelineEntry.objects.filter(user=user)
+    .order_by('-created_at', '-event_id')
+    .values('event_id')[:TIMELINE_SIZE]
+  )
+  return queryset.filter(id__in=Subquery(entries)).order_by('-created_at', '-id')
+
+
+def build_timeline(user):
+  """
+  Fill the timeline of `user` with the newest events of the organizers they
+  follow and mark it warm. Each organizer contributes at most TIMELINE_SIZE
+  events from its (organizer, created_at) index before they are merged.
+  """
+  with transaction.atomic():
+    _, created = HomeTimeline.objects.get_or_create(user=user)
+    if not created:
+      return 0
+    with connection.cursor() as cursor:
+      cursor.execute(
+        f"""
+        INSERT INTO {ENTRY_TABLE} (user_id, event_id, created_at)
+        SELECT f.follower_id, e.id, e.created_at
+        FROM {FOLLOW_TABLE} f
+        CROSS JOIN LATERAL (
+          SELECT id, created_at FROM {EVENT_TABLE}
+          WHERE organizer_id = f.followed_id
+          ORDER BY created_at DESC, id DESC
+          LIMIT %s
+        ) e
+        WHERE f.follower_id = %s
+        ORDER BY e.created_at DESC, e.id DESC
+        LIMIT %s
+        ON CONFLICT DO NOTHING
+        """,
+        [TIMELINE_SIZE, user.pk, TIMELINE_SIZE],
+      )
+      return cursor.rowcount
+
+
+def fan_out_event(event):
+  """Add a new event to the warm timelines of its organizer's followers, in one statement."""
+  with connection.cursor() as cursor:
+    cursor.execute(
+      f"""
+      INSERT INTO {ENTRY_TABLE} (user_id, event_id, created_at)
+      SELECT f.follower_id, %s, %s
+      FROM {FOLLOW_TABLE} f
+      JOIN {TIMELINE_TABLE} t ON t.user_id = f.follower_id
+      WHERE f.followed_id = %s
+      ON CONFLICT DO NOTHING
+      """,
+      [event.pk, event.created_at, event.organizer_id],
+    )
+    return cursor.rowcount
+
+
+def backfill_organizer(follower_id, organizer_id):
+  """Add the newest events of a newly followed organizer to a warm timeline of the follower."""
+  with connection.cursor() as cursor:
+    cursor.execute(
+      f"""
+      INSERT INTO {ENTRY_TABLE} (user_id, event_id, created_at)
+      SELECT t.user_id, e.id, e.created_at
+      FROM {TIMELINE_TABLE} t
+      JOIN LATERAL (
+        SELECT id, created_at FROM {EVENT_TABLE}
+        WHERE organizer_id = %s
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s
+      ) e ON true
+      WHERE t.user_id = %s
+      ON CONFLICT DO NOTHING
+      """,
+      [organizer_id, TIMELINE_SIZE, follower_id],
+    )
+    return cursor.rowcount
+
+
+def prune_organizer(follower_id, organizer_id):
+  """Remove the events of an unfollowed organizer from the follower's timeline."""
+  deleted, _ = TimelineEntry.objects.filter(user_id=follower_id, event__organizer_id=organizer_id).delete()
+  return deleted
+
+
+def trim_timelines():
+  """Drop the entries of every timeline past its newest TIMELINE_SIZE. Returns the number deleted."""
+  with connection.cursor() as cursor:
+    cursor.execute(
+      f"""
+      DELETE FROM {ENTRY_TABLE} WHERE id IN (
+        SELECT id FROM (
+          SELECT id, row_number() OVER (PARTITION BY user_id ORDER BY created_at DESC, event_id DESC) AS position
+          FROM {ENTRY_TABLE}
+          WHERE user_id IN (
+            SELECT user_id FROM {ENTRY_TABLE} GROUP BY user_id HAVING count(*) > %s
+          )
+        ) ranked
+        WHERE position > %s
+      )
+      """,
+      [TIMELINE_SIZE, TIMELINE_SIZE],
+    )
+    return cursor.rowcount
@@ -4,6 +4,7 @@ from apps.event.event.views import EventViewSet
 from apps.event.category.views import CategoryViewSet
 from apps.event.ticket.views import TicketViewSet
 from apps.event.rating.views import RatingViewSet
+from apps.event.metrics.views import MetricsView
 from rest_framework_nested.routers import NestedDefaultRouter
 
 router = DefaultRouter()
@@ -16,6 +17,7 @@ event_router.register(r'rating', RatingViewSet, basename='event-rating')
 
 urlpatterns = [
   path('', include(event_router.urls)),
+  path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
 
 urlpatterns += router.urls
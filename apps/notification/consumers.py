@@ -1,5 +1,22 @@
-import json
+from commons.renderers import dumps
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from apps.user.models import Follow
+
+
+def user_group(user_id):
+    return f"user_{user_id}"
+
+
+def followers_group(organizer_id):
+    """Sockets of everyone following an organizer, so that a broadcast is one send whatever the follower count."""
+    return f"org_{organizer_id}_followers"
+
+
+@database_sync_to_async
+def followed_organizer_ids(user):
+    return list(Follow.objects.filter(follower=user).values_list('followed_id', flat=True))
+
 
 class NotificationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -7,12 +24,32 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             await self.close()
         else:
             self.user = self.scope["user"]
-            self.group_name = f"user_{self.user.id}"
+            self.group_name = user_group(self.user.id)
             await self.channel_layer.group_add(self.group_name, self.channel_name)
+            self.organizer_ids = set(await followed_organizer_ids(self.user))
+            for organizer_id in self.organizer_ids:
+                await self.channel_layer.group_add(followers_group(organizer_id), self.channel_name)
             await self.accept()
 
     async def disconnect(self, close_code):
+        if not hasattr(self, 'group_name'):
+            return
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        for organizer_id in self.organizer_ids:
+            await self.channel_layer.group_discard(followers_group(organizer_id), self.channel_name)
 
     async def notify(self, event):
-        await self.send(text_data=json.dumps(event["content"]))
+        await self.send(text_data=dumps(event["content"]).decode())
+
+    async def notifications_read(self, event):
+        """Notifications were marked read, possibly from another device of the user."""
+        await self.send(text_data=dumps(event["content"]).decode())
+
+    async def followers_join(self, event):
+        """The user followed an organizer from another connection; nothing is sent to the client."""
+        self.organizer_ids.add(event["organizer_id"])
+        await self.channel_layer.group_add(followers_group(event["organizer_id"]), self.channel_name)
+
+    async def followers_leave(self, event):
+        self.organizer_ids.discard(event["organizer_id"])
+        await self.channel_layer.group_discard(followers_group(event["organizer_id"]), self.channel_name)
@@ -9,3 +9,8 @@ class Notification(models.Model):
     read = models.BooleanField(default=False)
     sent_at = models.DateTimeField(auto_now_add=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'read', '-created_at', '-id'], name='notification_user_created_idx'),
+        ]
@@ -1,19 +1,38 @@
 from rest_framework import serializers
 from .models import Notification
-from apps.event.serializers import EventSerializer
+from apps.event.models import Event
 from drf_spectacular.utils import extend_schema_field
 
+class NotificationEventSerializer(serializers.ModelSerializer):
+  """What an inbox row shows of its event; the full event is one request away."""
+  organizer = serializers.SerializerMethodField()
+  cover_image_url = serializers.SerializerMethodField()
+  class Meta:
+    model = Event
+    fields = ['id', 'title', 'start_date', 'end_date', 'location', 'cover_image_url', 'organizer']
+
+  @extend_schema_field(serializers.CharField())
+  def get_organizer(self, obj):
+    return obj.organizer.profile.name
+
+  @extend_schema_field(serializers.URLField(allow_null=True))
+  def get_cover_image_url(self, obj):
+    return obj.cover_image_url[0] if obj.cover_image_url else None
+
+
 class NotificationSerializer(serializers.ModelSerializer):
-  event = serializers.SerializerMethodField()
+  event = NotificationEventSerializer(read_only=True)
   class Meta:
     model = Notification
     fields= ['id','user','event', 'message','read','sent_at', 'created_at']
     read_only_fields = ['id','user','read','sent_at', 'created_at']
-    
-  @extend_schema_field(EventSerializer)
-  def get_event(self, obj):
-    request = self.context.get('request')
-    return EventSerializer(obj.event, context={'request':request}).data
-  
-  
-  
\ No newline at end of file
+
+
+class MarkReadSerializer(serializers.Serializer):
+  ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False, max_length=1000)
+  up_to = serializers.IntegerField(required=False, help_text="Mark every notification up to this id read, e.g. the newest one shown.")
+
+  def validate(self, attrs):
+    if ('ids' in attrs) == ('up_to' in attrs):
+      raise serializers.ValidationError("Pass either ids or up_to.")
+    return attrs
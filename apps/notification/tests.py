@@ -1,3 +1,152 @@
-from django.test import TestCase
+import time
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from apps.event.notify import notify_followers
+from apps.event.testing import make_event
+from apps.user.models import CustomUser, OrganizationProfile
+from .models import Notification
+from .unread import ADJUST_UNREAD_SCRIPT, UNREAD_COUNT_MAX_AGE, adjust_unread_counts
 
-# Create your tests here.
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class NotificationInboxTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email="reader@example.com", password="pass", username="inboxreader")
+        self.org = CustomUser.objects.create_user(email="org@example.com", password="pass", role="organization", username="inboxorg")
+        OrganizationProfile.objects.create(user=self.org, name="Inbox Org")
+        self.client.force_authenticate(user=self.user)
+
+    def _notify(self, count):
+        return [
+            Notification.objects.create(user=self.user, message=f"Event {i}", event=make_event(self.org, f"Event {i}", cover_image_url=["https://example.com/cover.jpg"]))
+            for i in range(count)
+        ]
+
+    def test_inbox_is_cursor_paginated_with_compact_events(self):
+        notifications = self._notify(12)
+        Notification.objects.filter(id=notifications[0].id).update(read=True)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('notification-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 10)
+        first = response.data['results'][0]
+        self.assertEqual(first['id'], notifications[-1].id)
+        self.assertEqual(first['event'], {
+            'id': notifications[-1].event_id,
+            'title': "Event 11",
+            'start_date': first['event']['start_date'],
+            'end_date': first['event']['end_date'],
+            'location': "Addis Ababa",
+            'cover_image_url': "https://example.com/cover.jpg",
+            'organizer': "Inbox Org",
+        })
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['message'] for row in response.data['results']], ["Event 1"])
+        self.assertIsNone(response.data['next'])
+
+    def test_unread_count_follows_fan_out_and_reads(self):
+        notifications = self._notify(2)
+        url = reverse('notification-unread-count')
+        self.assertEqual(self.client.get(url).data, {"unread": 2})
+
+        self.user.follow(self.org)
+        notify_followers(make_event(self.org, "Launch").id)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data, {"unread": 3})
+
+        read_url = reverse('notification-read', kwargs={'id': notifications[0].id})
+        self.client.post(read_url)
+        self.client.post(read_url)
+        self.assertEqual(self.client.get(url).data, {"unread": 2})
+
+    def test_unread_count_is_recounted_once_old(self):
+        self._notify(1)
+        url = reverse('notification-unread-count')
+        self.assertEqual(self.client.get(url).data, {"unread": 1})
+        # Written without adjusting the counter, as a failed update would leave it.
+        Notification.objects.update(read=True)
+        self.assertEqual(self.client.get(url).data, {"unread": 1})
+
+        later = time.time() + UNREAD_COUNT_MAX_AGE + 1
+        with patch('apps.notification.unread.time.time', return_value=later):
+            self.assertEqual(self.client.get(url).data, {"unread": 0})
+
+    def test_unread_counter_adjustments_do_not_overwrite_each_other(self):
+        self._notify(1)
+        url = reverse('notification-unread-count')
+        self.assertEqual(self.client.get(url).data, {"unread": 1})
+        # A read between another adjustment's read and write of the counter.
+        get_many = cache.get_many
+        def interleaved(keys):
+            found = get_many(keys)
+            cache.incr(f"notifications:unread:{self.user.id}", 1)
+            return found
+        with patch('apps.notification.unread.cache.get_many', side_effect=interleaved):
+            adjust_unread_counts([self.user.id], 1)
+        self.assertEqual(self.client.get(url).data, {"unread": 3})
+
+        adjust_unread_counts([self.user.id], -5)
+        self.assertIsNone(cache.get(f"notifications:unread:{self.user.id}"))
+        self.assertEqual(self.client.get(url).data, {"unread": 1})
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/1', 'KEY_PREFIX': 'test',
+    }})
+    def test_unread_counters_are_adjusted_in_one_redis_call(self):
+        with patch('django.core.cache.backends.redis.RedisCacheClient.get_client') as get_client:
+            adjust_unread_counts([1, 2, 3], 1)
+        script = get_client.return_value.register_script
+        self.assertEqual(script.call_args.args[0], ADJUST_UNREAD_SCRIPT)
+        script.return_value.assert_called_once_with(
+            keys=[f"test:1:notifications:unread:{user_id}" for user_id in (1, 2, 3)], args=[1]
+        )
+
+    def _socket(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f"user_{self.user.id}", channel)
+        return lambda: async_to_sync(channel_layer.receive)(channel)
+
+    def test_read_by_ids_and_up_to_in_one_update(self):
+        notifications = self._notify(5)
+        other = CustomUser.objects.create_user(email="other@example.com", password="pass", username="otherreader")
+        foreign = Notification.objects.create(user=other, message="Not yours", event=notifications[0].event)
+        self.assertEqual(self.client.get(reverse('notification-unread-count')).data, {"unread": 5})
+        receive = self._socket()
+        url = reverse('notification-read-many')
+
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+            response = self.client.post(url, {"ids": [notifications[0].id, foreign.id]}, format='json')
+        self.assertEqual(response.data, {"updated": 1, "unread": 4})
+        self.assertEqual(receive()['content'], {"type": "read", "unread": 4, "ids": [notifications[0].id, foreign.id]})
+        self.assertFalse(Notification.objects.get(id=foreign.id).read)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {"up_to": notifications[2].id}, format='json')
+        self.assertEqual(response.data, {"updated": 2, "unread": 2})
+        self.assertEqual(receive()['content'], {"type": "read", "unread": 2, "up_to": notifications[2].id})
+
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(url, {"ids": [1], "up_to": 1}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_read_all(self):
+        self._notify(3)
+        receive = self._socket()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('notification-read-all'))
+        self.assertEqual(response.data, {"updated": 3, "unread": 0})
+        self.assertEqual(receive()['content'], {"type": "read", "unread": 0, "all": True})
+        self.assertEqual(self.client.post(reverse('notification-read-all')).data, {"updated": 0, "unread": 0})
+        self.assertFalse(Notification.objects.filter(read=False).exists())
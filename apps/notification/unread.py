@@ -0,0 +1,133 @@
+import logging
+import time
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+from .consumers import user_group
+from .models import Notification
+
+logger = logging.getLogger('django')
+
+# A cached count is recounted from the database once it is this old, so that
+# drift from failed or racing updates does not last.
+UNREAD_COUNT_MAX_AGE = 10 * 60
+# Counters of users who stop polling are dropped after this long.
+UNREAD_COUNT_TIMEOUT = 24 * 60 * 60
+
+# Adds ARGV[1] to every counter of KEYS that exists, dropping those that go
+# negative, in one round trip however many followers a fan-out chunk has.
+ADJUST_UNREAD_SCRIPT = """
+for _, key in ipairs(KEYS) do
+  if redis.call('EXISTS', key) == 1 and redis.call('INCRBY', key, ARGV[1]) < 0 then
+    redis.call('DEL', key)
+  end
+end
+"""
+
+
+def _key(user_id):
+  return f"notifications:unread:{user_id}"
+
+
+def _counted_at_key(user_id):
+  return f"notifications:unread:{user_id}:counted_at"
+
+
+def unread_count(user_id):
+  """
+  The number of unread notifications of a user, from the cached counter
+  while it is younger than UNREAD_COUNT_MAX_AGE, otherwise counted again.
+  """
+  try:
+    entries = cache.get_many([_key(user_id), _counted_at_key(user_id)])
+  except Exception as e:
+    logger.warning(f"Unread counter cache unavailable: {e}")
+    entries = {}
+  count, counted_at = entries.get(_key(user_id)), entries.get(_counted_at_key(user_id))
+  if count is not None and counted_at is not None and time.time() - counted_at < UNREAD_COUNT_MAX_AGE:
+    return count
+
+  count = Notification.objects.filter(user_id=user_id, read=False).count()
+  try:
+    cache.set_many({_key(user_id): count, _counted_at_key(user_id): time.time()}, timeout=UNREAD_COUNT_TIMEOUT)
+  except Exception as e:
+    logger.warning(f"Unread counter cache unavailable: {e}")
+  return count
+
+
+def adjust_unread_counts(user_ids, delta):
+  """
+  Add `delta` to the cached counters of `user_ids` with atomic increments,
+  so that concurrent fan-outs and reads do not overwrite each other. Only
+  counters that exist are touched; users without one are counted on their
+  next read. A counter that would go negative has drifted and is dropped.
+  On Redis this is one script call; other backends read the counters with
+  one call and increment them one by one.
+  """
+  if not user_ids:
+    return
+  backend = caches['default']
+  if isinstance(backend, RedisCache):
+    keys = [backend.make_and_validate_key(_key(user_id)) for user_id in user_ids]
+    try:
+      client = backend._cache.get_client(write=True)
+      client.register_script(ADJUST_UNREAD_SCRIPT)(keys=keys, args=[delta])
+    except Exception as e:
+      logger.warning(f"Unread counter cache unavailable: {e}")
+    return
+
+  try:
+    present = cache.get_many([_key(user_id) for user_id in user_ids])
+  except Exception as e:
+    logger.warning(f"Unread counter cache unavailable: {e}")
+    return
+  for key in present:
+    try:
+      if cache.incr(key, delta) < 0:
+        cache.delete(key)
+    except ValueError:
+      # Expired since it was read; the next read counts again.
+      pass
+    except Exception as e:
+      logger.warning(f"Unread counter cache unavailable: {e}")
+      return
+
+
+def mark_read(user_id, ids=None, up_to=None):
+  """
+  Mark unread notifications of a user read with one UPDATE: those in `ids`,
+  those up to the id `up_to`, or all of them when neither is given. Keeps
+  the counter in step and tells the user's connected devices once the
+  transaction commits. Returns the number of notifications marked.
+  """
+  notifications = Notification.objects.filter(user_id=user_id, read=False)
+  if ids is not None:
+    notifications = notifications.filter(id__in=ids)
+  if up_to is not None:
+    notifications = notifications.filter(id__lte=up_to)
+  updated = notifications.update(read=True)
+  if not updated:
+    return 0
+
+  adjust_unread_counts([user_id], -updated)
+  content = {"type": "read", "unread": unread_count(user_id)}
+  if ids is not None:
+    content["ids"] = list(ids)
+  elif up_to is not None:
+    content["up_to"] = up_to
+  else:
+    content["all"] = True
+  transaction.on_commit(lambda: _send_read_state(user_id, content))
+  return updated
+
+
+def _send_read_state(user_id, content):
+  channel_layer = get_channel_layer()
+  if channel_layer is None:
+    return
+  try:
+    async_to_sync(channel_layer.group_send)(user_group(user_id), {"type": "notifications.read", "content": content})
+  except Exception as e:
+    logger.warning(f"Could not send the read state of user {user_id}: {e}")
@@ -1,7 +1,7 @@
 from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
-from .serializers import NotificationSerializer
+from .serializers import NotificationSerializer, MarkReadSerializer
 from rest_framework.response import Response
 from rest_framework import(
   viewsets,
@@ -11,6 +11,8 @@ from rest_framework import(
 )
 from .models import Notification
 from commons.permisions import IsOrganization
+from commons.utils import KeysetPagination
+from .unread import unread_count, mark_read
 from drf_spectacular.utils import extend_schema, OpenApiResponse, inline_serializer
 from rest_framework.decorators import action
 
@@ -23,15 +25,38 @@ class NotificationViewSet(viewsets.ModelViewSet):
     return Notification.objects.all()
   
   def get_permissions(self):
-    if self.action in ['list','read']:
+    if self.action in ['list', 'read', 'read_many', 'read_all', 'unread_count']:
       return [permissions.IsAuthenticated()]
     return [permissions.IsAuthenticated(), IsOrganization()]
   
+  @extend_schema(
+    description="Unread notifications of the authenticated user, newest first, in cursor pages. "
+                "Follow `next` for the following page.",
+    responses={200: NotificationSerializer(many=True)}
+  )
   def list(self, request):
-    user = request.user
-    notifications = user.notifications.filter(read=False)
-    serializer = self.serializer_class(notifications, many=True, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    notifications = (
+      request.user.notifications.filter(read=False)
+      .select_related('event__organizer___organization_profile', 'event__organizer___user_profile')
+      .order_by('-created_at', '-id')
+    )
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(notifications, request)
+    serializer = self.serializer_class(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
+
+  @extend_schema(
+    description="Number of unread notifications of the authenticated user, for the app badge.",
+    request=None,
+    responses={
+      200: OpenApiResponse(
+        inline_serializer(name="UnreadCountResponse", fields={"unread": serializers.IntegerField()})
+      )
+    }
+  )
+  @action(detail=False, methods=['get'], url_path='unread_count')
+  def unread_count(self, request):
+    return Response({"unread": unread_count(request.user.id)}, status=status.HTTP_200_OK)
   
   @extend_schema(
     description="set the read property of notification to True for the authenticated user",
@@ -49,13 +74,44 @@ class NotificationViewSet(viewsets.ModelViewSet):
   def read(self, request, id=None):
     notification = self.get_object()
     if notification.user == request.user:
-      notification.read = True
-      notification.save()
+      mark_read(request.user.id, ids=[notification.id])
       return Response({"detail":"read operation success "}, status=status.HTTP_200_OK)
     else:
       return Response({"detail":" this notification is not yours!"}, status=status.HTTP_400_BAD_REQUEST)      
   
   
+  @extend_schema(
+    description="Mark the given notifications, or all those up to an id, of the authenticated user read. "
+                "Their other connected devices get a `read` frame with the new unread count.",
+    operation_id="markNotificationsRead",
+    request=MarkReadSerializer,
+    responses={
+      200: OpenApiResponse(
+        inline_serializer(name="MarkReadResponse", fields={"updated": serializers.IntegerField(), "unread": serializers.IntegerField()})
+      )
+    }
+  )
+  @action(detail=False, methods=['post'], url_path='read')
+  def read_many(self, request):
+    serializer = MarkReadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    updated = mark_read(request.user.id, **serializer.validated_data)
+    return Response({"updated": updated, "unread": unread_count(request.user.id)}, status=status.HTTP_200_OK)
+
+  @extend_schema(
+    description="Mark every notification of the authenticated user read.",
+    request=None,
+    responses={
+      200: OpenApiResponse(
+        inline_serializer(name="MarkAllReadResponse", fields={"updated": serializers.IntegerField(), "unread": serializers.IntegerField()})
+      )
+    }
+  )
+  @action(detail=False, methods=['post'], url_path='read_all')
+  def read_all(self, request):
+    updated = mark_read(request.user.id)
+    return Response({"updated": updated, "unread": unread_count(request.user.id)}, status=status.HTTP_200_OK)
+  
   @extend_schema(exclude=True)
   def create(self, request):
       return Response({'detail': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
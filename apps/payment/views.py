@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from django.conf import settings
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 
@@ -19,6 +20,7 @@ from .serializers import (
 )
 from apps.event.models import Ticket, UserTicket
 from apps.community.models import Community, UserCommunity
+from apps.event.stats import update_revenue_stats
 from drf_spectacular.utils import extend_schema
 from django.http import HttpResponse
 
@@ -123,15 +125,17 @@ class VerifyPaymentView(APIView):
     
     
     if payment.status != "success":
-      payment.status = "success"
-      payment.save()
-      for item in payment.items.all():
-        for _ in range(item.quantity):
-            UserTicket.objects.create(user=payment.user, ticket=item.ticket)
+      with transaction.atomic():
+        payment.status = "success"
+        payment.save()
+        for item in payment.items.all():
+          for _ in range(item.quantity):
+              UserTicket.objects.create(user=payment.user, ticket=item.ticket)
 
-        event = item.ticket.event
-        if hasattr(event, 'community'):
-            UserCommunity.objects.get_or_create(user=payment.user, community=event.community)
+          event = item.ticket.event
+          if hasattr(event, 'community'):
+              UserCommunity.objects.get_or_create(user=payment.user, community=event.community)
+        update_revenue_stats(payment)
 
     return Response(chapa_data)
   
@@ -176,15 +180,17 @@ class ChapaWebhookView(APIView):
                 return Response({"detail": "Webhook received but payment not found"}, status=200)
 
             if payment.status != "success":
-                payment.status = "success"
-                payment.save()
-                for item in payment.items.all():
-                  for _ in range(item.quantity):
-                      UserTicket.objects.create(user=payment.user, ticket=item.ticket)
-
-                  event = item.ticket.event
-                  if hasattr(event, 'community'):
-                      UserCommunity.objects.get_or_create(user=payment.user, community=event.community)
+                with transaction.atomic():
+                    payment.status = "success"
+                    payment.save()
+                    for item in payment.items.all():
+                      for _ in range(item.quantity):
+                          UserTicket.objects.create(user=payment.user, ticket=item.ticket)
+
+                      event = item.ticket.event
+                      if hasattr(event, 'community'):
+                          UserCommunity.objects.get_or_create(user=payment.user, community=event.community)
+                    update_revenue_stats(payment)
 
         else:
             logger.info(f"Ignoring non-successful payment event: {event}")
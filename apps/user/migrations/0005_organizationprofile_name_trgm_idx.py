@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 12:54
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0004_organizationprofile_verification_id_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='organizationprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='orgprofile_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser,Group, Permission
+from django.contrib.postgres.indexes import GinIndex
 from django.core.validators import MinLengthValidator
 from django.utils import timezone
 
@@ -19,9 +20,20 @@ class CustomUser(AbstractUser):
   
   @property
   def profile(self):
+      """
+      The organization or user profile, read through the (select_related/prefetch
+      cacheable) reverse relation. A user without a profile row gets an unsaved
+      one instead of a write on the read path.
+      """
       if self.role == 'organization':
-          return getattr(self, '_organization_profile', OrganizationProfile.objects.get_or_create(user=self)[0])
-      return getattr(self, '_user_profile', Profile.objects.get_or_create(user=self)[0])
+          try:
+              return self._organization_profile
+          except OrganizationProfile.DoesNotExist:
+              return OrganizationProfile(user=self)
+      try:
+          return self._user_profile
+      except Profile.DoesNotExist:
+          return Profile(user=self)
 
   def __str__(self):
       return self.email
@@ -87,6 +99,11 @@ class OrganizationProfile(models.Model):
   created_at = models.DateTimeField(auto_now_add=True)
   updated_at = models.DateTimeField(auto_now=True)
 
+  class Meta:
+    indexes = [
+      GinIndex(fields=['name'], name='orgprofile_name_trgm_idx', opclasses=['gin_trgm_ops']),
+    ]
+
   def __str__(self):
       return self.name
       
@@ -99,6 +116,10 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ('follower', 'followed')
+        indexes = [
+            models.Index(fields=['followed', '-created_at', '-id'], name='follow_followed_created_idx'),
+            models.Index(fields=['follower', '-created_at', '-id'], name='follow_follower_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.follower.email} follows {self.followed.email}'
@@ -2,6 +2,7 @@ from django.utils import timezone
 from django.db.models.functions import TruncMonth
 from django.db.models import Count
 from collections import OrderedDict
+from django.db import transaction
 
 from datetime import timedelta
 from django.db.models import Sum, F
@@ -23,11 +24,15 @@ from apps.user.serializers import UserSerializer, OrganizationProfileSerializer
 from apps.event.serializers import EventSerializer, CategorySerializer
 from ..serializers import UserWithAnyProfileDocSerializer, UserWithOrganizationProfileDocSerializer
 from .serializers import ScanSerializer
+from apps.event.stats import update_event_stats
+from apps.event.cache import invalidate_events
 from apps.community.serializers import CommunitySerializer
 
 from ..utils import ResponsePagination
 from drf_spectacular.utils import extend_schema, OpenApiResponse, inline_serializer, OpenApiParameter
 from commons.permisions import IsOrganization
+from commons.serializers import sparse_fieldset
+from commons.utils import ApproximateCountPagination
 
 
 @extend_schema(tags=["Organization Management"])
@@ -107,6 +112,7 @@ class OrganizationViewSet(viewsets.ModelViewSet):
                   name="PaginatedFollowersResponse",
                   fields={
                       "count": serializers.IntegerField(),
+                      "approximate": serializers.BooleanField(),
                       "next": serializers.URLField(allow_null=True),
                       "previous": serializers.URLField(allow_null=True),
                       "results": UserWithAnyProfileDocSerializer(many=True),
@@ -118,7 +124,7 @@ class OrganizationViewSet(viewsets.ModelViewSet):
   )
   @action(detail=True,methods=['get'])
   def followers(self, request,id=None):
-    paginator = ResponsePagination()
+    paginator = ApproximateCountPagination()
     org = self.get_object()
     followers = org.followers.all().order_by('-created_at')
     paginated_followers = paginator.paginate_queryset(followers, request)
@@ -137,6 +143,7 @@ class OrganizationViewSet(viewsets.ModelViewSet):
                 name="PaginatedFollowersResponse",
                 fields={
                     "count": serializers.IntegerField(),
+                    "approximate": serializers.BooleanField(),
                     "next": serializers.URLField(allow_null=True),
                     "previous": serializers.URLField(allow_null=True),
                     "results": UserWithAnyProfileDocSerializer(many=True),
@@ -148,7 +155,7 @@ class OrganizationViewSet(viewsets.ModelViewSet):
   )
   @action(detail=False,methods=['get'], url_path='me/followers')
   def org_followers(self, request,id=None):
-    paginator = ResponsePagination()
+    paginator = ApproximateCountPagination()
     org = request.user
     followers = org.followers.all().order_by('-created_at')
     paginated_followers = paginator.paginate_queryset(followers, request)
@@ -164,10 +171,10 @@ class OrganizationViewSet(viewsets.ModelViewSet):
   )
   @action(detail=False,methods=['get'])
   def events(self, request):
-    events = Event.objects.filter(organizer=self.request.user)
+    events = Event.objects.filter(organizer=self.request.user).select_related('organizer___organization_profile')
     paginator = ResponsePagination()
     paginated_events = paginator.paginate_queryset(events, request)
-    serialized_events = EventSerializer(paginated_events, many=True,context={'request':request})
+    serialized_events = EventSerializer(paginated_events, many=True,context={'request':request}, **sparse_fieldset(request))
     
     return paginator.get_paginated_response(  
       serialized_events.data
@@ -180,11 +187,11 @@ class OrganizationViewSet(viewsets.ModelViewSet):
   @action(detail=True, methods=['get'], url_path='events')
   def organizer_events(self, request, id=None):
     org = self.get_object()
-    events = Event.objects.filter(organizer=org)
+    events = Event.objects.filter(organizer=org).select_related('organizer___organization_profile')
     
     paginator = ResponsePagination()
     paginated_events = paginator.paginate_queryset(events, request)
-    serialized_events = EventSerializer(paginated_events, many=True, context={'request':request})
+    serialized_events = EventSerializer(paginated_events, many=True, context={'request':request}, **sparse_fieldset(request))
     
     return paginator.get_paginated_response(  
       serialized_events.data
@@ -281,8 +288,12 @@ class OrganizationViewSet(viewsets.ModelViewSet):
     user_ticket = serializer.validated_data['user_ticket']
     event = serializer.validated_data['event']
 
-    user_ticket.used = True
-    user_ticket.save()
+    with transaction.atomic():
+      scanned = UserTicket.objects.filter(id=user_ticket.id, used=False).update(used=True)
+      if not scanned:
+        return Response({"detail": "Invalid or already used ticket."}, status=status.HTTP_400_BAD_REQUEST)
+      update_event_stats(event.id, attendees=1)
+      transaction.on_commit(lambda: invalidate_events([event.id]))
 
     return Response({
         "detail": "Ticket scanned successfully.",
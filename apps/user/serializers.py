@@ -1,10 +1,19 @@
 from rest_framework import serializers
-from .models import Profile, OrganizationProfile, CustomUser
+from .models import Profile, OrganizationProfile, CustomUser, Follow
 from drf_spectacular.utils import extend_schema_field
 from drf_spectacular.types import OpenApiTypes
 from rest_framework.exceptions import ValidationError 
 
 
+def get_following_ids(request):
+  """Ids of the users the requesting user follows, loaded once per request."""
+  if not hasattr(request, '_following_ids'):
+    request._following_ids = set(
+      Follow.objects.filter(follower=request.user).values_list('followed_id', flat=True)
+    )
+  return request._following_ids
+
+
 class ProfileSerializer(serializers.ModelSerializer):
   first_name = serializers.CharField(required=False, write_only=True)
   last_name = serializers.CharField(required=False, write_only=True)
@@ -46,7 +55,7 @@ class OrganizationProfileSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         user = request.user if request else None
         if user and user.is_authenticated:
-            return user.is_following(obj.user)
+            return obj.user_id in get_following_ids(request)
         return False
       
 
@@ -14,6 +14,7 @@ from ..serializers import UserWithOrganizationProfileDocSerializer
 from apps.event.models import Bookmark, Rating
 from apps.event.serializers import EventSerializer
 from apps.event.rating.serializers import UserRatingSerializer
+from commons.serializers import sparse_fieldset
 @extend_schema(tags=["user management"])
 class UserViewSet(viewsets.ModelViewSet):
   serializer_class = UserSerializer
@@ -31,7 +32,7 @@ class UserViewSet(viewsets.ModelViewSet):
   @action(detail=False,methods=['get'],url_path='me/following')
   def following(self, request):
     paginator = ResponsePagination()
-    followings = request.user.following.all()
+    followings = request.user.following.select_related('followed').order_by('-created_at')
     paginated_followings = paginator.paginate_queryset(followings, request)
     serialized_followings = UserSerializer([f.followed for f in paginated_followings], many=True, context={'request': request})
     
@@ -47,10 +48,10 @@ class UserViewSet(viewsets.ModelViewSet):
   @action(detail=False,methods=['get'],url_path="me/bookmarks")
   def bookmarks(self, request):
     user = request.user
-    bookmarks = Bookmark.objects.filter(user=user)
+    bookmarks = Bookmark.objects.filter(user=user).select_related('event__organizer___organization_profile')
     paginator = ResponsePagination()
     paginated_bookmarks = paginator.paginate_queryset(bookmarks, request)
-    serialized_bookmarks = EventSerializer([bookmark.event for bookmark in paginated_bookmarks], context={'request':request}, many=True)
+    serialized_bookmarks = EventSerializer([bookmark.event for bookmark in paginated_bookmarks], context={'request':request}, many=True, **sparse_fieldset(request))
     
     return paginator.get_paginated_response(
       serialized_bookmarks.data
@@ -5,7 +5,7 @@ from django.conf import settings
 from celery import shared_task
 from rest_framework_simplejwt.tokens import RefreshToken
 import logging
-from rest_framework.pagination import PageNumberPagination
+from commons.utils import ResponsePagination
 
 logger = logging.getLogger(__name__)
   
@@ -62,7 +62,3 @@ def get_tokens_for_user(user):
         'refresh': str(refresh),
         'access': str(refresh.access_token),
     }
-    
-
-class ResponsePagination(PageNumberPagination):
-  page_size = 10
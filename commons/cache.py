@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import threading
+import time
+from functools import wraps
+from django.core.cache import cache
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+from commons.renderers import dumps
+
+logger = logging.getLogger('django')
+
+COUNTERS = ('hits', 'stale_hits', 'misses', 'coalesced', 'refreshes')
+LOCK_TIMEOUT = 30
+# How long a miss waits for another worker that is already filling the entry.
+FILL_WAIT = 2.0
+FILL_POLL_INTERVAL = 0.05
+
+
+def _safe(method, *args, default=None, **kwargs):
+  try:
+    return getattr(cache, method)(*args, **kwargs)
+  except Exception as e:
+    logger.warning(f"Response cache unavailable: {e}")
+    return default
+
+
+def count(name):
+  key = f"response_cache:count:{name}"
+  _safe('add', key, 0, timeout=None)
+  _safe('incr', key)
+
+
+def response_cache_stats():
+  """Hit/miss counters of the shared response cache, across all processes."""
+  found = _safe('get_many', [f"response_cache:count:{name}" for name in COUNTERS], default={})
+  return {name: found.get(f"response_cache:count:{name}", 0) for name in COUNTERS}
+
+
+def response_cache_key(request):
+  params = sorted((key, value) for key, values in request.query_params.lists() for value in values)
+  digest = hashlib.sha1(repr(params).encode()).hexdigest()
+  return f"response:{request.path}:{digest}"
+
+
+def cached_response(timeout=30, stale_timeout=300):
+  """
+  Cache the response of a viewset action for anonymous GET requests, keyed by
+  path and query parameters (including the page).
+
+  Entries are fresh for `timeout` seconds and then served stale for up to
+  `stale_timeout` more while one background thread recomputes them. A lock
+  in the cache makes sure only one worker recomputes an entry, and misses
+  wait briefly for that worker instead of all querying the database.
+  Responses carry an ETag and a public Cache-Control header so that a
+  reverse proxy can cache them too. Authenticated requests, whose responses
+  are personalized, bypass the cache.
+  """
+  def decorator(view_method):
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+      if request.method != 'GET' or request.user.is_authenticated:
+        return view_method(self, request, *args, **kwargs)
+
+      key = response_cache_key(request)
+      fill = lambda: _fill(key, view_method(self, request, *args, **kwargs), timeout, stale_timeout)
+
+      entry = _safe('get', key)
+      if entry is None:
+        entry, state = _fill_once(key, fill)
+        if isinstance(entry, Response):
+          return entry
+      elif entry['fresh_until'] < time.time():
+        state = 'stale_hits'
+        _refresh_in_background(key, fill)
+      else:
+        state = 'hits'
+      count(state)
+      return _respond(request, entry, state, timeout, stale_timeout)
+    return wrapper
+  return decorator
+
+
+def _fill(key, response, timeout, stale_timeout):
+  """Store a successful response; other responses are returned as they are."""
+  if response.status_code != status.HTTP_200_OK:
+    return response
+  entry = {
+    'data': response.data,
+    'etag': hashlib.sha1(dumps(response.data)).hexdigest(),
+    'fresh_until': time.time() + timeout,
+  }
+  _safe('set', key, entry, timeout=timeout + stale_timeout)
+  return entry
+
+
+def _fill_once(key, fill):
+  lock_key = f"{key}:lock"
+  if _safe('add', lock_key, 1, timeout=LOCK_TIMEOUT, default=True):
+    try:
+      return fill(), 'misses'
+    finally:
+      _safe('delete', lock_key)
+
+  deadline = time.monotonic() + FILL_WAIT
+  while time.monotonic() < deadline:
+    time.sleep(FILL_POLL_INTERVAL)
+    entry = _safe('get', key)
+    if entry is not None:
+      return entry, 'coalesced'
+  return fill(), 'misses'
+
+
+def _refresh_in_background(key, fill):
+  lock_key = f"{key}:lock"
+  if not _safe('add', lock_key, 1, timeout=LOCK_TIMEOUT):
+    return
+
+  def refresh():
+    try:
+      fill()
+      count('refreshes')
+    except Exception as e:
+      logger.error(f"Failed to refresh cached response {key}: {e}")
+    finally:
+      _safe('delete', lock_key)
+      connection.close()
+
+  threading.Thread(target=refresh, daemon=True).start()
+
+
+def _respond(request, entry, state, timeout, stale_timeout):
+  etag = f'"{entry["etag"]}"'
+  if etag in request.headers.get('If-None-Match', ''):
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+  else:
+    response = Response(entry['data'])
+  response['ETag'] = etag
+  response['Cache-Control'] = f"public, max-age={timeout}, stale-while-revalidate={stale_timeout}"
+  patch_vary_headers(response, ['Authorization'])
+  response['X-Cache'] = {'hits': 'HIT', 'stale_hits': 'STALE'}.get(state, 'MISS')
+  return response
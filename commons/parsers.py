@@ -0,0 +1,35 @@
+import json
+import orjson
+from rest_framework.utils.json import strict_constant
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from commons.renderers import OrjsonRenderer
+
+
+class OrjsonParser(JSONParser):
+  """
+  JSONParser that decodes UTF-8 request bodies with orjson, falling back to the
+  standard library for bodies orjson rejects but json accepts (e.g. integers
+  wider than 64 bits).
+  """
+  renderer_class = OrjsonRenderer
+
+  def parse(self, stream, media_type=None, parser_context=None):
+    parser_context = parser_context or {}
+    encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+    if encoding.lower().replace('-', '') != 'utf8':
+      return super().parse(stream, media_type, parser_context)
+
+    body = stream.read()
+    try:
+      return orjson.loads(body)
+    except orjson.JSONDecodeError:
+      pass
+
+    try:
+      parse_constant = strict_constant if self.strict else None
+      return json.loads(body.decode(encoding), parse_constant=parse_constant)
+    except ValueError as exc:
+      raise ParseError('JSON parse error - %s' % str(exc))
+
@@ -0,0 +1,44 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+
+_encoder = JSONEncoder()
+
+# orjson writes U+2028/U+2029 as raw UTF-8; JSONRenderer escapes them so the
+# output stays a strict JavaScript subset.
+_LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+def dumps(data):
+  """
+  Encode `data` to JSON bytes with orjson. datetime/date/time, Decimal, UUID and
+  lazy strings go through DRF's JSONEncoder so the output matches JSONRenderer.
+  """
+  ret = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+  if b'\xe2\x80' in ret:
+    for raw, escaped in _LINE_SEPARATORS:
+      ret = ret.replace(raw, escaped)
+  return ret
+
+
+class OrjsonRenderer(JSONRenderer):
+  """
+  JSONRenderer that encodes compact responses with orjson. Indented output
+  (browsable API, `; indent=` media type parameter) and anything orjson
+  refuses, such as integers wider than 64 bits, fall back to JSONRenderer.
+  """
+
+  def render(self, data, accepted_media_type=None, renderer_context=None):
+    if data is None:
+      return b''
+
+    renderer_context = renderer_context or {}
+    if not self.compact or self.ensure_ascii or self.get_indent(accepted_media_type, renderer_context) is not None:
+      return super().render(data, accepted_media_type, renderer_context)
+
+    try:
+      return dumps(data)
+    except orjson.JSONEncodeError:
+      return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,50 @@
+class SparseFieldsetMixin:
+  """
+  Serializer mixin for sparse fieldsets.
+
+  Accepts `fields` and `omit` keyword arguments (lists of field names) and drops
+  every other readable field, so the work behind a dropped field (e.g. a
+  SerializerMethodField query) never runs. Names listed in `Meta.field_presets`
+  expand to their preset fields.
+  """
+
+  def __init__(self, *args, **kwargs):
+    fields = kwargs.pop('fields', None)
+    omit = kwargs.pop('omit', None)
+    super().__init__(*args, **kwargs)
+
+    self.requested_fields = self._expand_presets(fields) if fields else None
+    self.omitted_fields = self._expand_presets(omit) if omit else set()
+
+    for name in list(self.fields):
+      if self.fields[name].write_only:
+        continue
+      if not self.wants_field(name):
+        self.fields.pop(name)
+
+  def _expand_presets(self, names):
+    presets = getattr(self.Meta, 'field_presets', {})
+    expanded = set()
+    for name in names:
+      expanded.update(presets.get(name, [name]))
+    return expanded
+
+  def wants_field(self, name):
+    """Whether `name` (a field, or extra key added in to_representation) was asked for."""
+    if name in self.omitted_fields:
+      return False
+    return self.requested_fields is None or name in self.requested_fields
+
+  @property
+  def is_sparse(self):
+    return self.requested_fields is not None or bool(self.omitted_fields)
+
+
+def sparse_fieldset(request):
+  """Read the `fields` / `omit` query parameters into SparseFieldsetMixin kwargs."""
+  kwargs = {}
+  for param in ('fields', 'omit'):
+    value = request.query_params.get(param) if request else None
+    if value:
+      kwargs[param] = [name.strip() for name in value.split(',') if name.strip()]
+  return kwargs
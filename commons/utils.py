@@ -1,4 +1,204 @@
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def keyset_ordering(queryset):
+  """
+  The ordering of `queryset` as field names, with the primary key appended
+  so that every row has a distinct sort key.
+  """
+  ordering = list(queryset.query.order_by or (queryset.query.default_ordering and queryset.model._meta.ordering) or [])
+  if not all(isinstance(field, str) and field != '?' for field in ordering):
+    raise ValueError("Keyset pagination needs a queryset ordered by field names.")
+  if not ordering or ordering[-1].lstrip('-') not in ('pk', queryset.model._meta.pk.name):
+    ordering.append('-pk' if ordering and ordering[-1].startswith('-') else 'pk')
+  return ordering
+
+
+def keyset_filter(ordering, values):
+  """
+  Rows sorting after `values` in `ordering`: (a, b) > (x, y) as
+  a > x OR (a = x AND b > y), with the directions of the ordering. The
+  redundant a >= x lets Postgres bound the index scan on the leading column.
+  """
+  condition = None
+  for field, value in reversed(list(zip(ordering, values))):
+    name = field.lstrip('-')
+    after = Q(**{f"{name}__{'lt' if field.startswith('-') else 'gt'}": value})
+    condition = after if condition is None else after | (Q(**{name: value}) & condition)
+  name = ordering[0].lstrip('-')
+  return Q(**{f"{name}__{'lte' if ordering[0].startswith('-') else 'gte'}": values[0]}) & condition
+
 
 class ResponsePagination(PageNumberPagination):
+  """
+  Page number pagination, or keyset pagination when the request has a
+  `cursor` query parameter (empty for the first page).
+
+  A keyset page filters on the sort key of the last row of the previous page
+  instead of skipping rows with OFFSET, so deep pages cost as much as the
+  first one. The queryset must be ordered by non-null model fields; the
+  primary key is appended as a tie-breaker. Keyset responses have no count,
+  only a `next` link carrying the cursor of the following page.
+  """
   page_size = 10
+  cursor_query_param = 'cursor'
+  invalid_cursor_message = 'Invalid cursor.'
+  keyset_by_default = False
+
+  def paginate_queryset(self, queryset, request, view=None):
+    self.keyset = self.keyset_by_default or self.cursor_query_param in request.query_params
+    if not self.keyset:
+      return super().paginate_queryset(queryset, request, view)
+
+    self.request = request
+    self.ordering = keyset_ordering(queryset)
+    cursor = request.query_params.get(self.cursor_query_param, '')
+    if cursor:
+      values = self.decode_cursor(cursor)
+      try:
+        queryset = queryset.filter(keyset_filter(self.ordering, values))
+      except (ValidationError, ValueError, TypeError):
+        raise NotFound(self.invalid_cursor_message)
+
+    page_size = self.get_page_size(request)
+    rows = list(queryset.order_by(*self.ordering)[:page_size + 1])
+    self.next_cursor = self.encode_cursor(self.sort_key(rows[page_size - 1])) if len(rows) > page_size else None
+    return rows[:page_size]
+
+  def sort_key(self, row):
+    values = []
+    for field in self.ordering:
+      value = row
+      for name in field.lstrip('-').split('__'):
+        value = getattr(value, name)
+      values.append(value)
+    return values
+
+  def encode_cursor(self, values):
+    return base64.urlsafe_b64encode(json.dumps(values, cls=JSONEncoder).encode()).decode()
+
+  def decode_cursor(self, cursor):
+    try:
+      values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, ValueError):
+      raise NotFound(self.invalid_cursor_message)
+    if not isinstance(values, list) or len(values) != len(self.ordering) or None in values:
+      raise NotFound(self.invalid_cursor_message)
+    return values
+
+  def get_next_link(self):
+    if not self.keyset:
+      return super().get_next_link()
+    if self.next_cursor is None:
+      return None
+    url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+    return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+  def get_paginated_response(self, data):
+    if not self.keyset:
+      return super().get_paginated_response(data)
+    return Response({
+      'next': self.get_next_link(),
+      'results': data,
+    })
+
+
+class KeysetPagination(ResponsePagination):
+  """ResponsePagination that always returns keyset pages; a request without `cursor` gets the first one."""
+  keyset_by_default = True
+
+
+class ApproximatePage(Page):
+  def __init__(self, object_list, number, paginator, has_more):
+    super().__init__(object_list, number, paginator)
+    self.has_more = has_more
+
+  def has_next(self):
+    return self.has_more
+
+
+class ApproximatePaginator(Paginator):
+  """
+  Paginator that counts at most `count_cap` rows. Past that it takes the
+  planner's row estimate instead of counting every row, and flags the count
+  as approximate. Pages of an approximate count are not bounded by it: they
+  fetch one extra row to know whether there is a next page.
+  """
+
+  def __init__(self, *args, count_cap=1000, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.count_cap = count_cap
+    self.approximate = False
+
+  @cached_property
+  def count(self):
+    queryset = self.object_list.order_by()
+    capped = queryset[:self.count_cap + 1].count()
+    if capped <= self.count_cap:
+      return capped
+    self.approximate = True
+    return max(estimate_count(queryset), capped)
+
+  def validate_number(self, number):
+    if self.count <= self.count_cap:
+      return super().validate_number(number)
+    try:
+      number = int(number)
+    except (TypeError, ValueError):
+      raise PageNotAnInteger(self.error_messages['invalid_page'])
+    if number < 1:
+      raise EmptyPage(self.error_messages['min_page'])
+    return number
+
+  def page(self, number):
+    number = self.validate_number(number)
+    if not self.approximate:
+      return super().page(number)
+    bottom = (number - 1) * self.per_page
+    rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+    return ApproximatePage(rows[:self.per_page], number, self, has_more=len(rows) > self.per_page)
+
+
+def estimate_count(queryset):
+  """The number of rows Postgres expects `queryset` to return, from EXPLAIN."""
+  sql, params = queryset.query.sql_with_params()
+  with connection.cursor() as cursor:
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+    plan = cursor.fetchone()[0]
+  if isinstance(plan, str):
+    plan = json.loads(plan)
+  return int(plan[0]['Plan']['Plan Rows'])
+
+
+class ApproximateCountPagination(ResponsePagination):
+  """
+  Page number pagination for large lists, whose `count` is exact up to
+  `count_cap` rows and a planner estimate above it, with `approximate` set.
+  """
+  count_cap = 1000
+
+  def django_paginator_class(self, *args, **kwargs):
+    return ApproximatePaginator(*args, count_cap=self.count_cap, **kwargs)
+
+  def get_paginated_response(self, data):
+    if self.keyset:
+      return super().get_paginated_response(data)
+    return Response({
+      'count': self.page.paginator.count,
+      'approximate': self.page.paginator.approximate,
+      'next': self.get_next_link(),
+      'previous': self.get_previous_link(),
+      'results': data,
+    })
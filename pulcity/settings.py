@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # third party apps
     'corsheaders',
@@ -165,7 +166,15 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated', 
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-
+    'DEFAULT_RENDERER_CLASSES': [
+        'commons.renderers.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'commons.parsers.OrjsonParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 
@@ -184,18 +193,6 @@ CORS_ALLOW_METHODS = [
     'OPTIONS',
 ]
 
-DEFAULT_RENDERER_CLASSES = [
-    'rest_framework.renderers.JSONRenderer',
-    'rest_framework.renderers.BrowsableAPIRenderer',
-]
-
-DEFAULT_PARSER_CLASSES = [
-    'rest_framework.parsers.JSONParser',
-    'rest_framework.parsers.FormParser',
-    'rest_framework.parsers.MultiPartParser',
-]
-
-
 EMAIL_BACKEND = config('EMAIL_BACKEND')
 EMAIL_HOST = config('EMAIL_HOST')  
 EMAIL_PORT = config('EMAIL_PORT')  
@@ -205,6 +202,35 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND')
 CELERY_BROKER_URL = config("REDIS_URL", default="redis://redis:6379/0")
+CELERY_BEAT_SCHEDULE = {
+    "refresh-event-popularity": {
+        "task": "apps.event.tasks.refresh_event_popularity",
+        "schedule": 60 * 60,
+    },
+    "refresh-event-map-cells": {
+        "task": "apps.event.tasks.refresh_event_map_cells",
+        "schedule": 60,
+    },
+    "trim-home-timelines": {
+        "task": "apps.event.tasks.trim_home_timelines",
+        "schedule": 60 * 60,
+    },
+    # Within RECOMMENDATIONS_TIMEOUT, so stored lists do not lapse.
+    "refresh-all-recommendations": {
+        "task": "apps.event.tasks.refresh_all_recommendations",
+        "schedule": 3 * 60 * 60,
+    },
+    "refresh-event-neighbors": {
+        "task": "apps.event.tasks.refresh_event_neighbors",
+        "schedule": 15 * 60,
+    },
+    # Incremental runs leave the lists of untouched events slightly stale.
+    "rebuild-event-neighbors": {
+        "task": "apps.event.tasks.refresh_event_neighbors",
+        "schedule": 24 * 60 * 60,
+        "kwargs": {"full": True},
+    },
+}
 
 
 LOGGING = {
@@ -270,6 +296,25 @@ else:
   
 REDIS_PORT = int(config("REDIS_PORT", 6379))
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": config("CACHE_REDIS_URL", default=f"redis://{REDIS_HOST}:{REDIS_PORT}/1"),
+        "KEY_PREFIX": "pulcity",
+    },
+}
+
+# Event search falls back to trigram matching when full-text search finds fewer
+# than EVENT_SEARCH_FUZZY_MIN_RESULTS events; matches need at least this word similarity.
+EVENT_SEARCH_FUZZY_THRESHOLD = config("EVENT_SEARCH_FUZZY_THRESHOLD", default=0.4, cast=float)
+EVENT_SEARCH_FUZZY_MIN_RESULTS = config("EVENT_SEARCH_FUZZY_MIN_RESULTS", default=3, cast=int)
+
+# Seconds after which each process reloads its events/suggest prefix index from the database.
+SUGGEST_REFRESH_INTERVAL = config("SUGGEST_REFRESH_INTERVAL", default=300, cast=int)
+
+# Seconds after which each process reloads its events/map/nearby grid of event coordinates.
+SPATIAL_INDEX_REFRESH_INTERVAL = config("SPATIAL_INDEX_REFRESH_INTERVAL", default=300, cast=int)
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",